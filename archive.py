@@ -0,0 +1,438 @@
+import os, sys, time, sqlite3, datetime as dt
+from typing import Iterable, List, Optional
+import metrics
+
+ARCHIVE_PATH = os.getenv("ARCHIVE_PATH", os.path.join("data", "archive.db"))
+
+# 실행마다 정규화/요약한 항목을 SQLite(FTS5) 보관소에 쌓을지 여부
+ARCHIVE = os.getenv("ARCHIVE", "true").lower() == "true"
+
+# 한 트랜잭션에 넣는 항목 수
+ARCHIVE_BATCH = int(os.getenv("ARCHIVE_BATCH", "1000"))
+
+# 검색 순위 가중치 (bm25: 제목, 초록, 한국어 요약)
+_WEIGHTS = (10.0, 1.0, 5.0)
+
+# 검색 기간이 보관 기간의 이 비율 이하면 FTS 검색을 그 기간의 rowid 범위로 좁힌다
+_ROWID_RANGE_SPAN = 0.25
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL,
+    title TEXT NOT NULL,
+    link TEXT NOT NULL,
+    ts REAL,
+    summary TEXT NOT NULL,
+    summary_ko TEXT,
+    has_summary INTEGER NOT NULL DEFAULT 0,
+    rep TEXT,
+    mode TEXT,
+    archived REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_ts ON items(ts);
+CREATE INDEX IF NOT EXISTS items_source_ts ON items(source, ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    title, summary, summary_ko,
+    content='items', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts(rowid, title, summary, summary_ko)
+    VALUES (new.rowid, new.title, new.summary, coalesce(new.summary_ko, ''));
+END;
+CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, title, summary, summary_ko)
+    VALUES ('delete', old.rowid, old.title, old.summary, coalesce(old.summary_ko, ''));
+END;
+CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE OF title, summary, summary_ko ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, title, summary, summary_ko)
+    VALUES ('delete', old.rowid, old.title, old.summary, coalesce(old.summary_ko, ''));
+    INSERT INTO items_fts(rowid, title, summary, summary_ko)
+    VALUES (new.rowid, new.title, new.summary, coalesce(new.summary_ko, ''));
+END;
+"""
+
+# 이미 있는 항목(HOURLY_CHECK에서 보낸 항목을 DAILY_SUMMARY가 다시 처리하는 경우)은
+# 새 요약이 있을 때만 요약을 바꾼다 (요약 없이 처리된 실행이 기존 요약을 지우지 않게)
+_UPSERT = """
+INSERT INTO items (id, source, title, link, ts, summary, summary_ko, has_summary, rep, mode, archived)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    summary_ko = excluded.summary_ko,
+    has_summary = excluded.has_summary
+WHERE excluded.summary_ko IS NOT NULL AND excluded.summary_ko IS NOT items.summary_ko
+"""
+
+
+class NewsArchive:
+    def __init__(self, path: str = ARCHIVE_PATH, batch: int = ARCHIVE_BATCH):
+        """
+        처리한 뉴스 항목의 SQLite 보관소 (FTS5 전문 색인)
+
+        items 테이블에 항목을 쌓고, 외부 콘텐츠 FTS5 테이블(items_fts)이 제목/초록/한국어 요약을
+        트리거로 따라 색인한다. WAL 모드라 검색 CLI가 실행 중인 보관과 서로 막지 않는다.
+        같은 소식의 다른 소스 항목(NewsItem.duplicates)도 rep에 대표 항목 ID를 달아 같이 보관한다.
+        """
+        self.path = path
+        self.batch = batch
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL에서는 NORMAL이어도 커밋한 트랜잭션이 깨지지 않는다 (전원이 꺼지면 마지막 몇 개를 잃을 수 있음)
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, items: Iterable, mode: Optional[str] = None) -> int:
+        """
+        항목(NewsItem)과 그 duplicates를 ARCHIVE_BATCH개씩 한 트랜잭션으로 넣는다.
+
+        Returns:
+            넣거나 요약을 갱신한 항목 수
+        """
+        now = time.time()
+
+        def rows():
+            for e in items:
+                yield (e.id, e.source, e.title, e.link, e.ts, e.summary, e.summary_ko, int(e.has_summary),
+                       None, mode, now)
+                for d in e.duplicates:
+                    yield (d.id, d.source, d.title, d.link, d.ts, d.summary, d.summary_ko, int(d.has_summary),
+                           e.id, mode, now)
+
+        changed = 0
+        chunk = []
+        for row in rows():
+            chunk.append(row)
+            if len(chunk) >= self.batch:
+                changed += self._write(chunk)
+                chunk = []
+        if chunk:
+            changed += self._write(chunk)
+        return changed
+
+    def _write(self, rows: List[tuple]) -> int:
+        self.conn.execute("BEGIN")
+        try:
+            # rowcount에는 트리거가 FTS에 쓴 행은 들어가지 않는다
+            changed = self.conn.executemany(_UPSERT, rows).rowcount
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return changed
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT count(*) FROM items").fetchone()[0]
+
+    def _filters(self, since, until, source):
+        clauses, args = [], []
+        if since is not None:
+            clauses.append("items.ts >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("items.ts < ?")
+            args.append(until)
+        if source:
+            clauses.append("items.source = ? COLLATE NOCASE")
+            args.append(source)
+        return clauses, args
+
+    def _rowid_range(self, since, until):
+        """
+        발행 시각 범위에 든 항목의 (최소, 최대) rowid
+
+        항목은 발행 직후에 보관되므로 rowid가 발행 시각 순서와 거의 같다. 범위가 보관 기간의 일부일 때
+        이 rowid 범위를 FTS 조건에 더하면 흔한 단어도 범위 밖 문서에 점수를 매기지 않는다.
+        범위가 넓으면 (ts 색인을 훑는 비용이 더 커서) None.
+        """
+        # min과 max를 한 문장에 쓰면 색인 끝만 보는 최적화를 쓰지 않는다
+        first = self.conn.execute("SELECT min(ts) FROM items").fetchone()[0]
+        last = self.conn.execute("SELECT max(ts) FROM items").fetchone()[0]
+        if first is None or last <= first:
+            return None
+        lo = first if since is None else max(since, first)
+        hi = last if until is None else min(until, last)
+        if hi - lo > _ROWID_RANGE_SPAN * (last - first):
+            return None
+        clauses, args = self._filters(since, until, None)
+        return self.conn.execute("SELECT min(rowid), max(rowid) FROM items WHERE "
+                                 + " AND ".join(clauses), args).fetchone()
+
+    def search(self, query: str, since: Optional[float] = None, until: Optional[float] = None,
+               source: Optional[str] = None, limit: int = 20) -> List[sqlite3.Row]:
+        """
+        검색어와 맞는 항목을 관련도(bm25, 제목 > 한국어 요약 > 초록) 순으로
+
+        query는 FTS5 문법을 그대로 쓴다 (llama AND meta, "open source", 라마*).
+        한국어는 띄어쓰기 단위로 색인하므로 조사가 붙은 말은 접두어 검색(라마*)으로 찾는다.
+        문법에 맞지 않는 검색어는 단어마다 따옴표로 감싸 다시 검색한다.
+
+        Args:
+            since, until: 발행 시각 범위 (epoch 초, [since, until))
+            source: 피드 이름 (대소문자 무시)
+        """
+        clauses, args = self._filters(since, until, source)
+        bounds = self._rowid_range(since, until) if since is not None or until is not None else None
+        if bounds is not None:
+            if bounds[0] is None:
+                return []
+            clauses.append("items_fts.rowid BETWEEN ? AND ?")
+            args.extend(bounds)
+        if clauses:
+            sql = ("SELECT items.*, bm25(items_fts, ?, ?, ?) AS score FROM items_fts "
+                   "JOIN items ON items.rowid = items_fts.rowid WHERE items_fts MATCH ?"
+                   + "".join(" AND " + c for c in clauses) + " ORDER BY score LIMIT ?")
+        else:
+            # 조건이 없으면 상위 limit개를 먼저 고른 뒤에만 items를 읽는다
+            sql = ("SELECT items.*, f.score FROM (SELECT rowid, bm25(items_fts, ?, ?, ?) AS score FROM items_fts "
+                   "WHERE items_fts MATCH ? ORDER BY score LIMIT ?) AS f "
+                   "JOIN items ON items.rowid = f.rowid ORDER BY f.score")
+
+        def run(match):
+            return self.conn.execute(sql, (*_WEIGHTS, match, *args, limit)).fetchall()
+
+        self.conn.row_factory = sqlite3.Row
+        try:
+            return run(query)
+        except sqlite3.OperationalError:
+            quoted = " ".join('"' + w.replace('"', '""') + '"' for w in query.split())
+            if not quoted or quoted == query:
+                raise
+            return run(quoted)
+        finally:
+            self.conn.row_factory = None
+
+    def digest(self, since: Optional[float] = None, until: Optional[float] = None,
+               source: Optional[str] = None, limit: int = 200, include_duplicates: bool = False) -> List[sqlite3.Row]:
+        """기간/소스 안의 항목을 최신순으로 (기본은 대표 항목만)"""
+        clauses, args = self._filters(since, until, source)
+        if not include_duplicates:
+            clauses.append("items.rep IS NULL")
+        sql = ("SELECT items.* FROM items" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+               + " ORDER BY items.ts DESC LIMIT ?")
+        self.conn.row_factory = sqlite3.Row
+        try:
+            return self.conn.execute(sql, (*args, limit)).fetchall()
+        finally:
+            self.conn.row_factory = None
+
+    def optimize(self):
+        """FTS 세그먼트를 합친다 (검색이 느려졌을 때, 수 초 걸릴 수 있음)"""
+        self.conn.execute("INSERT INTO items_fts(items_fts) VALUES ('optimize')")
+
+
+def archive_items(items, mode: Optional[str] = None, path: str = ARCHIVE_PATH):
+    """실행에서 처리한 항목을 보관소에 넣는다 (실패해도 실행은 계속한다)"""
+    try:
+        with metrics.span("archive"), NewsArchive(path) as archive:
+            changed = archive.add(items, mode)
+        metrics.count("archived_items", changed)
+        print(f"[INFO] Archived {changed} items to {path}")
+    except sqlite3.Error as e:
+        print(f"[WARN] Failed to archive items to {path}: {e}")
+
+
+def _format_row(row) -> str:
+    """검색/요약 결과 한 줄 (main.format_line과 비슷한 모양)"""
+    from newsitem import TZ
+    date_str = dt.datetime.fromtimestamp(row["ts"], TZ).strftime("%Y-%m-%d %H:%M") if row["ts"] is not None else "-"
+    line = f"• {date_str} [{row['source']}] {row['title']}"
+    if row["summary_ko"] and row["summary_ko"] != row["title"]:
+        line += f"\n  {row['summary_ko']}"
+    return line + f"\n  {row['link']}"
+
+
+def _day_start(text: str) -> float:
+    """YYYY-MM-DD (KST) → 그날 00:00의 epoch 초"""
+    from newsitem import TZ
+    return TZ.localize(dt.datetime.strptime(text, "%Y-%m-%d")).timestamp()
+
+
+def _synthetic_items(n: int, days: int = 365 * 3, seed: int = 0):
+    """days일에 걸친 항목 n개 (Zipf 어휘, 60개 소스, 20%는 다른 소스의 같은 소식)"""
+    import random
+    from newsitem import NewsItem
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(30000)]
+    cum, total = [], 0.0
+    for i in range(len(vocab)):
+        total += 1.0 / (i + 1)
+        cum.append(total)
+    topics = ["llama", "gemini", "claude", "gpt", "mistral", "robotics", "agent", "diffusion", "benchmark", "openai"]
+    start = time.time() - days * 86400
+    items = []
+    for i in range(n):
+        title = [rng.choice(topics)] + rng.choices(vocab, cum_weights=cum, k=8)
+        body = rng.choices(vocab, cum_weights=cum, k=rng.randint(40, 160))
+        e = NewsItem(f"Source {i % 60}", " ".join(title), f"https://s{i % 60}.example/{i}",
+                     ts=start + i * days * 86400 / n, summary=" ".join(body), id=f"{i:016x}")
+        e.summary_ko = "요약: " + " ".join(title[:4]) + " 모델 발표"
+        e.has_summary = True
+        if items and rng.random() < 0.2:
+            items[-1].duplicates = list(items[-1].duplicates) + [e]
+        else:
+            items.append(e)
+    return items
+
+
+def test_archive():
+    """넣기/다시 넣기(요약 갱신)/검색/기간·소스 조건/요약 목록 확인"""
+    import tempfile
+    from newsitem import NewsItem
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "archive.db")
+        base = _day_start("2026-09-01")
+        a = NewsItem("Meta AI", "Meta releases Llama 4 with open weights", "https://ai.meta.com/llama4",
+                     ts=base + 3600, summary="<p>Llama 4 comes in three sizes.</p>")
+        b = NewsItem("The Verge", "Meta's Llama 4 is here", "https://verge.example/llama4",
+                     ts=base + 7200, summary="The new Llama models ...")
+        c = NewsItem("DeepMind", "Gemini robotics update", "https://deepmind.example/robotics",
+                     ts=base + 86400 * 40, summary="Robots fold laundry.")
+        a.duplicates = [b]
+        with NewsArchive(path, batch=2) as archive:
+            assert archive.add([a, c], "HOURLY_CHECK") == 3
+            # DAILY_SUMMARY가 같은 항목을 요약과 함께 다시 넣는다
+            a.summary_ko, a.has_summary = "메타가 라마 4를 공개했다", True
+            assert archive.add([a, c], "DAILY_SUMMARY") == 1
+            assert archive.count() == 3
+
+            hits = archive.search("llama")
+            assert {h["id"] for h in hits} == {a.id, b.id}
+            assert [h["id"] for h in archive.search("라마*")] == [a.id]
+            assert archive.search("llama", source="the verge")[0]["rep"] == a.id
+            assert not archive.search("llama", since=base + 86400)
+            # 보관 기간의 일부만 보는 검색은 rowid 범위로 좁혀도 결과가 같다
+            assert len(archive.search("llama", since=base, until=base + 86400)) == 2
+            assert not archive.search("robot*", since=base, until=base + 86400)
+            assert [h["id"] for h in archive.search("robot*")] == [c.id]
+            # 문법에 맞지 않는 검색어는 단어 검색으로
+            assert len(archive.search('llama "4')) == 2
+            assert [r["id"] for r in archive.digest(since=base, until=base + 86400)] == [a.id]
+            assert len(archive.digest(include_duplicates=True)) == 3
+        assert not os.path.exists(path + "-wal"), "WAL should be checkpointed on close"
+    print("[INFO] Archive test passed")
+
+
+def benchmark_archive(n: int = 200_000, sample: int = 20_000, queries: int = 200):
+    """
+    넣기 처리량: sample개 항목을 SQLite 기본값(롤백 저널, 항목마다 커밋)/WAL + 항목마다 커밋/
+    WAL + ARCHIVE_BATCH개씩 커밋으로 비교하고, 3년치 n개 항목 보관소에서 검색/목록 응답 시간을 잰다.
+    """
+    import tempfile, random
+    items = _synthetic_items(n)
+    for e in items:
+        # 초록 정리(NewsItem.summary)는 실행 중에 이미 끝났으므로 넣기 시간에서 뺀다
+        e.summary
+        for d in e.duplicates:
+            d.summary
+    print(f"[BENCH] {n} items ({len(items)} stories) over 3 years")
+
+    def ingest(path, part, batch, wal=True):
+        rows = len(part) + sum(len(e.duplicates) for e in part)
+        with NewsArchive(path, batch=batch) as archive:
+            if not wal:
+                archive.conn.execute("PRAGMA journal_mode=DELETE")
+                archive.conn.execute("PRAGMA synchronous=FULL")
+            t0 = time.perf_counter()
+            archive.add(part, "DAILY_SUMMARY")
+            elapsed = time.perf_counter() - t0
+        return rows, elapsed
+
+    with tempfile.TemporaryDirectory() as tmp:
+        part = items[:int(sample * len(items) / n)]
+        for name, batch, wal in (("rollback journal, commit per item", 1, False),
+                                 ("WAL, commit per item", 1, True),
+                                 (f"WAL, batch {ARCHIVE_BATCH}", ARCHIVE_BATCH, True)):
+            rows, elapsed = ingest(os.path.join(tmp, f"sample-{batch}-{wal}.db"), part, batch, wal)
+            print(f"[BENCH] ingest ({name:<34}): {rows / elapsed:7.0f} items/s")
+
+        path = os.path.join(tmp, "archive.db")
+        rows, elapsed = ingest(path, items, ARCHIVE_BATCH)
+        size = os.path.getsize(path)
+        print(f"[BENCH] ingest full archive: {rows} items in {elapsed:.1f}s ({rows / elapsed:.0f} items/s), "
+              f"{size / 1e6:.0f} MB ({size / rows:.0f} B/item)")
+
+        rng = random.Random(1)
+        with NewsArchive(path) as archive:
+            end = time.time()
+
+            def month(fn):
+                lo = end - rng.randint(30, 1000) * 86400
+                return fn(lo, lo + 30 * 86400)
+
+            cases = {
+                # 합성 말뭉치의 주제어는 항목 10%에 들어 있다 (실제 검색어보다 훨씬 흔함)
+                "common word, all time": lambda: archive.search(rng.choice(["llama", "gemini", "robotics", "claude"])),
+                "common word, 1 month": lambda: month(lambda lo, hi: archive.search("llama OR gpt", lo, hi)),
+                "rare word, all time": lambda: archive.search(f"w{rng.randint(5000, 29999)}"),
+                "prefix, all time": lambda: archive.search(f"w{rng.randint(100, 999)}*"),
+                "digest, source+month": lambda: month(
+                    lambda lo, hi: archive.digest(lo, hi, source=f"Source {rng.randint(0, 59)}")),
+            }
+            for name, fn in cases.items():
+                times = []
+                for _ in range(queries):
+                    t0 = time.perf_counter()
+                    fn()
+                    times.append(time.perf_counter() - t0)
+                times.sort()
+                print(f"[BENCH] {name:<22}: p50 {times[len(times) // 2] * 1e3:6.2f} ms, "
+                      f"p95 {times[int(len(times) * 0.95)] * 1e3:6.2f} ms")
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="뉴스 보관소 검색")
+    parser.add_argument("--db", default=ARCHIVE_PATH, help="보관소 경로")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("search", "검색어로 찾기 (관련도 순)"), ("digest", "기간/소스의 항목 목록 (최신순)")):
+        p = commands.add_parser(name, help=help_text)
+        if name == "search":
+            p.add_argument("query", help='FTS5 검색어 (예: llama, "open source", 라마*, llama AND meta)')
+        p.add_argument("--since", help="이 날부터 (YYYY-MM-DD, KST)")
+        p.add_argument("--until", help="이 날 전까지 (YYYY-MM-DD, KST)")
+        p.add_argument("--source", help="피드 이름")
+        p.add_argument("--limit", type=int, default=20 if name == "search" else 200)
+    commands.add_parser("optimize", help="FTS 색인 세그먼트 합치기")
+    commands.add_parser("test", help="자체 테스트와 넣기/검색 벤치마크")
+    args = parser.parse_args(argv)
+
+    if args.command == "test":
+        test_archive()
+        benchmark_archive()
+        return 0
+    if not os.path.exists(args.db):
+        print(f"[ERROR] No archive at {args.db}")
+        return 1
+    with NewsArchive(args.db) as archive:
+        if args.command == "optimize":
+            archive.optimize()
+            return 0
+        since = _day_start(args.since) if args.since else None
+        until = _day_start(args.until) if args.until else None
+        t0 = time.perf_counter()
+        if args.command == "search":
+            rows = archive.search(args.query, since, until, args.source, args.limit)
+        else:
+            rows = archive.digest(since, until, args.source, args.limit)
+        elapsed = time.perf_counter() - t0
+        for row in rows:
+            print(_format_row(row))
+        print(f"[INFO] {len(rows)} items ({elapsed * 1e3:.1f} ms, {archive.count()} archived)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
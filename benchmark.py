@@ -0,0 +1,840 @@
+import os, re, sys, glob, json, time, random, hashlib, shutil, tempfile, threading, subprocess, datetime as dt
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import yaml
+
+# 오프라인 벤치마크: 녹화(또는 합성)한 피드를 로컬 HTTP 서버로 다시 내보내고
+# Gemini/Slack을 지연과 오류율을 정할 수 있는 가짜로 바꿔 main.main을 처음부터 끝까지 실행한다.
+#
+#   python benchmark.py                     # 실행 후 benchmarks/baseline.json과 비교 (회귀가 있으면 종료 코드 1)
+#   python benchmark.py --update-baseline   # 현재 결과를 기준선으로 저장
+#   python benchmark.py record              # feeds.yaml의 실제 피드를 benchmarks/fixtures/에 녹화
+#   python benchmark.py crash               # 실행을 무작위 지점에서 죽이고 이어서 실행 - 정확히 한 번 전송 확인
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(HERE, "benchmarks")
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+FIXTURE_MANIFEST = os.path.join(FIXTURE_DIR, "manifest.json")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+# 합성 피드의 기준 시각 (녹화한 피드는 녹화 시각을 쓴다). 실행 중 now_kst()가 이 시각을 돌려준다
+BENCH_NOW = os.getenv("BENCH_NOW", "2025-01-07T10:00:00+09:00")
+
+# 가짜 서비스 설정: 응답 지연(초)과 오류율 (오류율 0.1 = 10번째 요청마다 429)
+BENCH_FEED_LATENCY = float(os.getenv("BENCH_FEED_LATENCY", "0.1"))  # 피드마다 0.5~1.5배
+BENCH_GEMINI_LATENCY = float(os.getenv("BENCH_GEMINI_LATENCY", "0.2"))
+BENCH_GEMINI_ERROR_RATE = float(os.getenv("BENCH_GEMINI_ERROR_RATE", "0.05"))
+BENCH_SLACK_LATENCY = float(os.getenv("BENCH_SLACK_LATENCY", "0.05"))
+BENCH_SLACK_ERROR_RATE = float(os.getenv("BENCH_SLACK_ERROR_RATE", "0.1"))
+
+# 기준선 대비 회귀로 볼 증가 폭 (Gemini 호출 수/바이트는 시간과 같은 폭)
+# 시간은 BENCH_TIME_FLOOR초보다 작은 차이는 무시한다 (짧은 단계의 측정 잡음)
+BENCH_TIME_TOLERANCE = float(os.getenv("BENCH_TIME_TOLERANCE", "0.25"))
+BENCH_TIME_FLOOR = float(os.getenv("BENCH_TIME_FLOOR", "0.05"))
+BENCH_RSS_TOLERANCE = float(os.getenv("BENCH_RSS_TOLERANCE", "0.15"))
+BENCH_TRAFFIC_TOLERANCE = float(os.getenv("BENCH_TRAFFIC_TOLERANCE", "0.05"))
+
+# (이름, MODE, 상태 디렉터리) - 같은 상태 디렉터리의 실행은 앞 실행의 data/를 이어 쓴다
+SCENARIOS = [
+    ("daily", "DAILY_SUMMARY", "daily"),
+    ("hourly_cold", "HOURLY_CHECK", "hourly"),
+    ("hourly_warm", "HOURLY_CHECK", "hourly"),
+]
+
+
+def _slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def load_feeds(path=os.path.join(HERE, "feeds.yaml")):
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)["feeds"]
+
+
+# ------------------------------------------------------------
+# 피드 fixture
+# ------------------------------------------------------------
+
+_WORDS = ("model language agent reasoning benchmark scaling inference dataset transformer attention "
+          "alignment policy reward evaluation retrieval latency throughput multimodal open weights "
+          "robotics vision speech safety compute chip training release research startup funding").split()
+_COMPANIES = ["OpenAI", "Google", "DeepMind", "Anthropic", "Meta", "NVIDIA", "Microsoft", "Mistral", "Hugging Face"]
+
+
+def _vocabulary(n=5000, seed=0):
+    """자주 쓰는 AI 용어 + 음절을 이어 만든 드문 단어 (Zipf 누적 가중치와 함께)"""
+    rng = random.Random(seed)
+    syllables = "ka ro mi tes lan vor ix den pa qua zel tor ni fu gra on be sy".split()
+    words = list(_WORDS)
+    while len(words) < n:
+        words.append("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    cum, total = [], 0.0
+    for i in range(len(words)):
+        total += 1.0 / (i + 1)
+        cum.append(total)
+    return words, cum
+
+
+_VOCAB, _VOCAB_CUM = _vocabulary()
+
+
+def _phrase(rng, k):
+    return " ".join(rng.choices(_VOCAB, cum_weights=_VOCAB_CUM, k=k))
+
+
+def _shared_stories(n=60, seed=0):
+    """여러 소스가 함께 다루는 소식 (소스 간 중복 묶기 경로를 태운다)"""
+    rng = random.Random(seed)
+    return [f"{rng.choice(_COMPANIES)} {_phrase(rng, 7)}" for _ in range(n)]
+
+
+def _abstract(rng, long_html):
+    def sentence(k=16):
+        return _phrase(rng, k).capitalize() + "."
+
+    if not long_html:
+        # arXiv 스타일: 긴 평문 초록 + 참조
+        return " ".join(sentence() + rng.choice([" Error &lt; 5% &amp; faster.", ""]) for _ in range(12))
+    paras = []
+    for j in range(rng.randint(3, 40)):
+        paras.append(f"<p>{sentence()} <a href=\"https://example.com/{j}\">more&hellip;</a> "
+                     f"&ldquo;{sentence(6)}&rdquo; &mdash; {sentence(8)}</p>")
+        if j % 15 == 0:
+            paras.append("<script>window.dataLayer = window.dataLayer || [];</script>")
+    return "".join(paras)
+
+
+def synthesize_feed(feed, index, now, stories):
+    """
+    feeds.yaml의 피드 하나를 흉내 낸 RSS 2.0 / Atom 본문 (이름과 순번으로 결정되는 고정 내용)
+
+    - arXiv 계열은 항목 200개 + 긴 평문 초록, 나머지는 20~60개 + HTML 본문
+    - 발행 시각은 now 기준 최근 72시간에 흩어 두어 DAILY(어제)와 HOURLY(오늘) 창이 모두 찬다
+    - 일부 피드는 날짜순이 아니고, 일부는 날짜 없는 항목이 섞여 있다
+    """
+    rng = random.Random(f"{feed['name']}|{index}")
+    big = "arxiv" in feed["name"].lower()
+    n = 200 if big else rng.randint(20, 60)
+    atom = index % 3 == 1
+    site = f"https://{_slug(feed['name'])}.example"
+
+    entries = []
+    for i in range(n):
+        if rng.random() < 0.2:
+            title = rng.choice(stories) + rng.choice(["", " (update)", " — report"])
+        else:
+            title = _phrase(rng, rng.randint(5, 10)).capitalize()
+        published = now - dt.timedelta(seconds=rng.uniform(0, 72 * 3600))
+        if index % 7 == 3 and rng.random() < 0.1:
+            published = None
+        entries.append((title, f"{site}/{i}", published, _abstract(rng, not big)))
+
+    oldest = now - dt.timedelta(days=365)
+    entries.sort(key=lambda e: e[2] or oldest, reverse=True)
+    if index % 4 == 3:
+        rng.shuffle(entries)
+
+    out = []
+    if atom:
+        out.append('<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+                   f"<title>{escape(feed['name'])}</title><id>{site}/</id>")
+        for title, link, published, summary in entries:
+            out.append(f"<entry><title>{escape(title)}</title><link href=\"{link}\"/><id>{link}</id>")
+            if published:
+                out.append(f"<updated>{published.isoformat()}</updated>")
+            out.append(f"<summary type=\"html\">{escape(summary)}</summary></entry>")
+        out.append("</feed>")
+    else:
+        out.append('<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel>'
+                   f"<title>{escape(feed['name'])}</title><link>{site}/</link>")
+        for title, link, published, summary in entries:
+            out.append(f"<item><title>{escape(title)}</title><link>{link}</link><guid>{link}</guid>")
+            if published:
+                out.append(f"<pubDate>{format_datetime(published.astimezone(dt.timezone.utc))}</pubDate>")
+            out.append(f"<description>{escape(summary)}</description></item>")
+        out.append("</channel></rss>")
+    return "".join(out).encode("utf-8")
+
+
+def load_fixtures(feeds, synthetic=False):
+    """
+    피드 이름 → 본문 bytes와 기준 시각
+
+    benchmarks/fixtures/에 녹화한 피드가 있으면 그것을 쓰고 (기준 시각 = 녹화 시각),
+    녹화하지 않았거나 synthetic이면 합성한다.
+
+    Returns:
+        (bodies, now, "recorded" | "synthetic" | "mixed")
+    """
+    recorded = {}
+    now = dt.datetime.fromisoformat(BENCH_NOW)
+    if not synthetic and os.path.exists(FIXTURE_MANIFEST):
+        with open(FIXTURE_MANIFEST, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        now = dt.datetime.fromisoformat(manifest["recorded_at"])
+        recorded = manifest["feeds"]
+
+    stories = _shared_stories()
+    bodies = {}
+    for i, feed in enumerate(feeds):
+        path = recorded.get(feed["name"])
+        if path:
+            with open(os.path.join(FIXTURE_DIR, path), "rb") as f:
+                bodies[feed["name"]] = f.read()
+        else:
+            bodies[feed["name"]] = synthesize_feed(feed, i, now, stories)
+
+    hits = sum(1 for f in feeds if f["name"] in recorded)
+    kind = "synthetic" if hits == 0 else "recorded" if hits == len(feeds) else "mixed"
+    return bodies, now, kind
+
+
+def record():
+    """feeds.yaml의 실제 피드를 받아 fixture로 저장한다 (네트워크 필요)"""
+    from fetcher import FeedFetcher
+    from utils import now_kst
+
+    feeds = load_feeds()
+    recorded_at = now_kst()
+    fetcher = FeedFetcher()
+    try:
+        results = fetcher.fetch(feeds)
+    finally:
+        fetcher.close()
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    saved = {}
+    for res in results:
+        name = res["feed"]["name"]
+        if res["error"] or not res["content"]:
+            print(f"[WARN] Not recorded: {name} ({res['error'] or 'empty body'}) - will be synthesized")
+            continue
+        filename = _slug(name) + ".xml"
+        with open(os.path.join(FIXTURE_DIR, filename), "wb") as f:
+            f.write(res["content"])
+        saved[name] = filename
+        print(f"[INFO] Recorded {name}: {len(res['content']) / 1024:.1f} KB")
+
+    with open(FIXTURE_MANIFEST, "w", encoding="utf-8") as f:
+        json.dump({"recorded_at": recorded_at.isoformat(), "feeds": saved}, f, ensure_ascii=False, indent=2)
+    print(f"[INFO] Recorded {len(saved)}/{len(feeds)} feeds at {recorded_at.isoformat()}")
+
+
+# ------------------------------------------------------------
+# 가짜 서비스
+# ------------------------------------------------------------
+
+class _Server(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # 크래시 테스트가 요청 도중에 죽인 실행의 연결은 조용히 닫는다
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class FakeServices:
+    def __init__(self, bodies, feed_latency=BENCH_FEED_LATENCY,
+                 slack_latency=BENCH_SLACK_LATENCY, slack_error_rate=BENCH_SLACK_ERROR_RATE):
+        """
+        피드 fixture와 Slack Webhook을 흉내 내는 로컬 HTTP 서버
+
+        - GET /feeds/<slug>.xml: fixture 본문 (ETag/Last-Modified 지원, If-None-Match가 맞으면 304)
+        - POST /slack: slack_latency만큼 기다린 뒤 200, 1/slack_error_rate번째 요청마다 429 (Retry-After: 0)
+
+        경로 종류(feed/slack)별 요청 수와 주고받은 바이트를 센다.
+        200으로 받은 Slack 메시지는 (경로, 본문)으로 posts에 남긴다 (크래시 테스트용).
+        """
+        rng = random.Random(1)
+        self.routes = {}
+        for name, body in bodies.items():
+            etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+            self.routes[f"/feeds/{_slug(name)}.xml"] = (body, etag, feed_latency * (0.5 + rng.random()))
+        self.slack_latency = slack_latency
+        self.slack_error_every = round(1 / slack_error_rate) if slack_error_rate else 0
+        self._lock = threading.Lock()
+        self._slack_posts = 0
+        self.posts = []
+        self.reset()
+
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                route = services.routes.get(self.path)
+                if route is None:
+                    self._reply(404, b"", "feed")
+                    return
+                body, etag, latency = route
+                time.sleep(latency)
+                if self.headers.get("If-None-Match") == etag:
+                    self._reply(304, b"", "feed", {"ETag": etag})
+                    return
+                self._reply(200, body, "feed", {
+                    "Content-Type": "application/xml", "ETag": etag,
+                    "Last-Modified": "Mon, 06 Jan 2025 00:00:00 GMT",
+                })
+
+            def do_POST(self):
+                data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(services.slack_latency)
+                with services._lock:
+                    services._slack_posts += 1
+                    fail = bool(services.slack_error_every) and services._slack_posts % services.slack_error_every == 0
+                services._count("slack", len(data), 0)
+                if fail:
+                    self._reply(429, b"rate_limited", None, {"Retry-After": "0"})
+                else:
+                    try:
+                        text = json.loads(data)["text"]
+                    except ValueError:
+                        # 보내던 프로세스가 죽어 잘린 요청
+                        text = None
+                    if text is not None:
+                        with services._lock:
+                            services.posts.append((self.path, text))
+                    self._reply(200, b"ok", None)
+
+            def _reply(self, status, body, kind, headers=None):
+                self.send_response(status)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                if kind:
+                    services._count(kind, 0, len(body), status)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _Server(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _count(self, kind, bytes_in, bytes_out, status=None):
+        with self._lock:
+            s = self.stats.setdefault(kind, {"calls": 0, "bytes": 0, "not_modified": 0})
+            s["calls"] += 1
+            s["bytes"] += bytes_in + bytes_out
+            if status == 304:
+                s["not_modified"] += 1
+
+    def reset(self):
+        """지금까지 센 값을 돌려주고 0부터 다시 센다"""
+        with self._lock:
+            stats, self.stats = getattr(self, "stats", {}), {}
+        return stats
+
+    def feed_url(self, name):
+        return f"{self.base}/feeds/{_slug(name)}.xml"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+_CRASH_EXIT = 137
+
+
+class _CrashPoints:
+    def __init__(self, at, requests_log):
+        """
+        크래시 테스트의 자식 실행: 상태를 디스크에 남기는 지점마다 번호를 매겨 at번째 지점에서
+        프로세스를 바로 죽인다 (os._exit - finally/atexit도 실행되지 않는다). at=0이면 지점 수만 센다.
+
+        지점: journal/Slack 스풀 기록 직후, Slack ack 직후, seen/피드 상태/보관소 저장 직후, Gemini 요청 직전
+        (여러 스레드에서 불리므로 다른 스레드의 Gemini/Slack 요청이 오가는 도중에도 죽는다).
+        requests_log에는 Gemini에 요청하는 항목의 요약 캐시 키({"req": [...]})와
+        요약을 받아 캐시에 넣은 항목의 키({"done": ...})를 한 줄씩 남긴다.
+        """
+        self.at = at
+        self.count = 0
+        self._lock = threading.Lock()
+        self._log = open(requests_log, "a", encoding="utf-8")
+        self._local = threading.local()
+
+    def hit(self):
+        with self._lock:
+            self.count += 1
+            if self.count == self.at:
+                sys.stdout.flush()
+                os._exit(_CRASH_EXIT)
+
+    def after(self, owner, name):
+        fn = getattr(owner, name)
+
+        def wrapper(*args, **kwargs):
+            result = fn(*args, **kwargs)
+            self.hit()
+            return result
+        setattr(owner, name, wrapper)
+
+    def _write(self, rec):
+        with self._lock:
+            self._log.write(json.dumps(rec) + "\n")
+            self._log.flush()
+
+    def log_requests(self, owner, name, many):
+        fn = getattr(owner, name)
+        local = self._local
+
+        def wrapper(summarizer, arg):
+            # 묶음 요청이 항목 하나짜리 요청을 부르는 경우는 바깥 호출에서만 센다
+            if getattr(local, "busy", False):
+                return fn(summarizer, arg)
+            self._write({"req": [summarizer._cache_key(item) for item in (arg if many else [arg])]})
+            local.busy = True
+            try:
+                return fn(summarizer, arg)
+            finally:
+                local.busy = False
+        setattr(owner, name, wrapper)
+
+    def log_done(self, owner, name):
+        fn = getattr(owner, name)
+
+        def wrapper(summarizer, item):
+            fn(summarizer, item)
+            self._write({"done": summarizer._cache_key(item)})
+        setattr(owner, name, wrapper)
+
+
+def _child():
+    """
+    벤치마크 실행 하나 (별도 프로세스 - 최대 RSS와 모듈 상수를 실행마다 새로 잡는다)
+
+    시계를 BENCH_CLOCK으로 고정하고 요약기를 가짜 Gemini 모델로 바꾼 뒤 main.main을 실행해
+    결과를 BENCH_RESULT 경로에 JSON으로 쓴다.
+    """
+    import resource
+    random.seed(0)
+    now = dt.datetime.fromisoformat(os.environ["BENCH_CLOCK"])
+
+    import utils, state, main
+    from gemini_summarizer import GeminiSummarizer, _FakeModel
+    from summary_cache import SummaryCache
+
+    def clock():
+        return now.astimezone(utils.TZ)
+    utils.now_kst = state.now_kst = main.now_kst = clock
+
+    class CountingModel(_FakeModel):
+        """가짜 Gemini 모델 + 주고받은 바이트"""
+        bytes = 0
+
+        def generate_content(self, prompt):
+            response = super().generate_content(prompt)
+            with self._lock:
+                self.bytes += len(prompt.encode("utf-8")) + len(response.text.encode("utf-8"))
+            return response
+
+    model = CountingModel(float(os.environ["BENCH_GEMINI_LATENCY"]), float(os.environ["BENCH_GEMINI_ERROR_RATE"]))
+    main.make_summarizer = lambda: GeminiSummarizer(model=model, cache=SummaryCache())
+
+    crash = None
+    if "BENCH_CRASH_AT" in os.environ:
+        import journal, notifier
+        crash = _CrashPoints(int(os.environ["BENCH_CRASH_AT"]), os.environ["BENCH_GEMINI_LOG"])
+        for owner, name in ((journal.RunJournal, "_append"), (notifier.SlackDelivery, "_append_spool"),
+                            (notifier.SlackDelivery, "_ack"), (main, "save_seen"), (main, "save_feed_cache"),
+                            (main, "save_feed_cursors"), (main, "archive_items")):
+            crash.after(owner, name)
+        crash.log_requests(GeminiSummarizer, "_summarize_group", True)
+        crash.log_requests(GeminiSummarizer, "_summarize_uncached", False)
+        crash.log_done(GeminiSummarizer, "_to_cache")
+        generate = model.generate_content
+
+        def generate_or_crash(prompt):
+            crash.hit()
+            return generate(prompt)
+        model.generate_content = generate_or_crash
+
+    flush_time = [0.0]
+    flush_slack = main.flush_slack
+
+    def timed_flush():
+        t0 = time.perf_counter()
+        try:
+            return flush_slack()
+        finally:
+            flush_time[0] = time.perf_counter() - t0
+    main.flush_slack = timed_flush
+
+    t0 = time.perf_counter()
+    pipe = main.main()
+    wall = time.perf_counter() - t0
+
+    metrics = {"wall_s": wall, "stage.slack_flush_s": flush_time[0]}
+    for name, seconds in (pipe.timings.items() if pipe else ()):
+        metrics[f"stage.{name}_s"] = seconds
+    for name, count in (pipe.counts.items() if pipe else ()):
+        metrics[f"items.{name}"] = count
+    metrics["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    metrics["gemini.calls"] = model.calls
+    metrics["gemini.bytes"] = model.bytes
+    if crash is not None:
+        metrics["crash_points"] = crash.count
+    with open(os.environ["BENCH_RESULT"], "w", encoding="utf-8") as f:
+        json.dump(metrics, f)
+
+
+# ------------------------------------------------------------
+# 실행과 비교
+# ------------------------------------------------------------
+
+def _run_scenario(workdir, name, mode, now, services, extra_env=None, allow_crash=False):
+    """
+    시나리오 하나를 자식 프로세스로 실행하고 지표를 돌려준다.
+    allow_crash면 크래시 테스트가 죽인 실행(종료 코드 _CRASH_EXIT)에 None을 돌려준다.
+    """
+    result_path = os.path.join(workdir, f"{name}.json")
+    log_path = os.path.join(workdir, f"{name}.log")
+    env = dict(os.environ)
+    env.update({
+        "MODE": mode,
+        "SLACK_WEBHOOK": services.base + "/slack",
+        "GEMINI_API_KEY": "benchmark",
+        "USE_GEMINI": "true",
+        # 모든 피드가 같은 로컬 호스트라 호스트당 제한이 실제보다 강하게 걸리지 않도록
+        "FETCH_PER_HOST": env.get("FETCH_PER_HOST", "64"),
+        # 분당 한도 대기는 항목이 도착한 타이밍에 따라 크게 흔들리므로 기본은 풀어 둔다
+        # (Gemini 비용은 호출 수와 가짜 지연으로 본다. 한도까지 재려면 GEMINI_RPM을 지정)
+        "GEMINI_RPM": env.get("GEMINI_RPM", "6000"),
+        # hourly_warm은 같은 시각에 다시 돌려 조건부 요청 경로를 재므로 피드 스케줄은 끈다
+        "FEED_SCHEDULE": env.get("FEED_SCHEDULE", "false"),
+        "BENCH_CLOCK": now.isoformat(),
+        "BENCH_RESULT": result_path,
+        "BENCH_GEMINI_LATENCY": str(BENCH_GEMINI_LATENCY),
+        "BENCH_GEMINI_ERROR_RATE": str(BENCH_GEMINI_ERROR_RATE),
+    })
+    env.update(extra_env or {})
+    services.reset()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "_child"],
+                              cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    if proc.returncode == _CRASH_EXIT and allow_crash:
+        services.reset()
+        return None
+    if proc.returncode != 0:
+        with open(log_path, "r", encoding="utf-8") as f:
+            print(f.read()[-3000:])
+        raise RuntimeError(f"Benchmark run {name} failed (exit {proc.returncode})")
+
+    with open(result_path, "r", encoding="utf-8") as f:
+        metrics = json.load(f)
+    for kind, s in services.reset().items():
+        metrics[f"{kind}.calls"] = s["calls"]
+        metrics[f"{kind}.bytes"] = s["bytes"]
+        if kind == "feed":
+            metrics["feed.not_modified"] = s["not_modified"]
+    return metrics
+
+
+def run_suite(repeat=1, synthetic=False, keep=None):
+    """
+    모든 시나리오를 repeat번 실행해 시나리오별 지표를 모은다 (각 지표는 repeat번 중 최솟값).
+
+    Args:
+        keep: 주어지면 마지막 반복의 작업 디렉터리(data/, 실행 로그)를 이 경로에 복사한다
+    """
+    feeds = load_feeds()
+    bodies, now, kind = load_fixtures(feeds, synthetic)
+    print(f"[BENCH] {len(feeds)} feeds ({kind} fixtures, {sum(map(len, bodies.values())) / 1024:.0f} KB), "
+          f"clock {now.isoformat()}")
+    services = FakeServices(bodies)
+    results = {}
+    try:
+        for r in range(repeat):
+            workdir = tempfile.mkdtemp(prefix="bench-")
+            try:
+                for key in {s[2] for s in SCENARIOS}:
+                    os.makedirs(os.path.join(workdir, key))
+                    local = [dict(f, url=services.feed_url(f["name"])) for f in feeds]
+                    with open(os.path.join(workdir, key, "feeds.yaml"), "w", encoding="utf-8") as f:
+                        yaml.safe_dump({"feeds": local}, f, allow_unicode=True)
+                for name, mode, key in SCENARIOS:
+                    metrics = _run_scenario(os.path.join(workdir, key), name, mode, now, services)
+                    best = results.setdefault(name, {})
+                    for metric, value in metrics.items():
+                        best[metric] = min(best.get(metric, value), value)
+                    print(f"[BENCH] run {r + 1}/{repeat} {name}: {metrics['wall_s']:.2f}s")
+                if keep and r == repeat - 1:
+                    shutil.copytree(workdir, keep, dirs_exist_ok=True)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        services.close()
+
+    config = {
+        "fixtures": kind, "clock": now.isoformat(), "feed_latency": BENCH_FEED_LATENCY,
+        "gemini_latency": BENCH_GEMINI_LATENCY, "gemini_error_rate": BENCH_GEMINI_ERROR_RATE,
+        "slack_latency": BENCH_SLACK_LATENCY, "slack_error_rate": BENCH_SLACK_ERROR_RATE,
+    }
+    return {"config": config, "scenarios": results}
+
+
+def _kind(metric):
+    if metric.endswith("_s"):
+        return "time"
+    if metric == "peak_rss_mb":
+        return "memory"
+    if metric.startswith("gemini."):
+        # 먼저 들어온 항목부터 요약하므로 묶음 수가 도착 순서에 따라 조금씩 달라진다
+        return "model"
+    if metric.endswith(".calls") or metric.endswith(".bytes"):
+        return "traffic"
+    return None
+
+
+def compare(current, baseline):
+    """
+    기준선보다 허용 폭 이상 늘어난 지표 목록 [(시나리오, 지표, 기준값, 현재값)]
+    항목 수(items.*) 같은 지표는 비교하지 않는다 (동작 변경이지 성능 회귀가 아님).
+    """
+    regressions = []
+    tolerance = {"time": BENCH_TIME_TOLERANCE, "memory": BENCH_RSS_TOLERANCE,
+                 "traffic": BENCH_TRAFFIC_TOLERANCE, "model": BENCH_TIME_TOLERANCE}
+    for name, metrics in current["scenarios"].items():
+        base = baseline["scenarios"].get(name, {})
+        for metric, value in metrics.items():
+            kind = _kind(metric)
+            if kind is None or metric not in base:
+                continue
+            limit = base[metric] * (1 + tolerance[kind])
+            if kind == "time":
+                limit = max(limit, base[metric] + BENCH_TIME_FLOOR)
+            if value > limit:
+                regressions.append((name, metric, base[metric], value))
+    return regressions
+
+
+def _fmt(metric, value):
+    if metric.endswith("_s"):
+        return f"{value:.2f}s"
+    if metric.endswith(".bytes"):
+        return f"{value / 1024:.1f}KB"
+    if metric == "peak_rss_mb":
+        return f"{value:.1f}MB"
+    return str(value)
+
+
+def report(current, baseline=None):
+    for name, m in current["scenarios"].items():
+        base = (baseline or {}).get("scenarios", {}).get(name, {})
+
+        def cell(metric):
+            text = _fmt(metric, m.get(metric, 0))
+            if metric in base and base[metric]:
+                text += f" ({(m.get(metric, 0) / base[metric] - 1) * 100:+.0f}%)"
+            return text
+
+        stages = ", ".join(f"{k[6:-2]}={v:.2f}s" for k, v in m.items() if k.startswith("stage."))
+        print(f"[BENCH] {name}: wall {cell('wall_s')}, peak RSS {cell('peak_rss_mb')}, "
+              f"items {m.get('items.fetch', 0)}")
+        print(f"[BENCH]   stages: {stages}")
+        print(f"[BENCH]   feeds {m.get('feed.calls', 0)} calls ({m.get('feed.not_modified', 0)} x 304) "
+              f"/ {cell('feed.bytes')}, gemini {m.get('gemini.calls', 0)} calls / {cell('gemini.bytes')}, "
+              f"slack {m.get('slack.calls', 0)} calls / {cell('slack.bytes')}")
+
+
+# ------------------------------------------------------------
+# 크래시 주입 테스트
+# ------------------------------------------------------------
+
+_LINK = re.compile(r"https://[a-z0-9-]+\.example/\d+")
+
+
+def _deliveries(posts):
+    """
+    경로별 (링크 → 서로 다른 메시지에 나온 횟수, 같은 메시지를 다시 받은 횟수)
+
+    같은 본문을 두 번 받은 것은 스풀 재전송이다: Slack이 200을 보낸 뒤 ack를 기록하기 전에 죽으면
+    다음 실행이 같은 메시지를 다시 보낸다 (Webhook에는 멱등 키가 없어 이 틈은 최소 한 번 전송이다).
+    """
+    by_path = {}
+    for path, text in posts:
+        by_path.setdefault(path, []).append(text)
+    result = {}
+    for path, texts in by_path.items():
+        links = {}
+        for text in set(texts):
+            for link in _LINK.findall(text):
+                links[link] = links.get(link, 0) + 1
+        result[path] = (links, len(texts) - len(set(texts)))
+    return result
+
+
+def crash_test(trials=10, seed=None, max_crashes=3):
+    """
+    실행을 무작위 지점에서 죽이고 (1~max_crashes번) 다시 실행해 끝까지 마친 뒤 확인한다:
+
+    - 정확히 한 번 전송: 기본 채널은 죽이지 않은 실행과 같은 항목을 받고, 어느 채널도
+      한 항목을 서로 다른 메시지로 두 번 받지 않는다 (주제별 라우트 채널 포함)
+    - Gemini 재요청 없음: 앞 실행이 요약을 받아 캐시에 넣은 항목을 다시 요청하지 않는다
+      (죽는 순간 오가던 요청은 결과를 받지 못했으므로 다시 요청한다 - 따로 센다)
+    - 끝까지 마친 뒤 journal과 Slack 스풀이 남지 않는다
+
+    Returns:
+        실패한 시도 수
+    """
+    seed = random.randrange(1 << 30) if seed is None else seed
+    rng = random.Random(seed)
+    feeds = load_feeds()
+    bodies, now, kind = load_fixtures(feeds, synthetic=True)
+    services = FakeServices(bodies)
+    print(f"[TEST] Crash test: {len(feeds)} feeds ({kind}), {trials} trials per mode, seed {seed}")
+
+    def prepare(workdir):
+        local = [dict(f, url=services.feed_url(f["name"])) for f in feeds]
+        routes = [{"name": "robotics", "webhook": services.base + "/slack/robotics",
+                   "keywords": ["robotics", "open weights"]}]
+        with open(os.path.join(workdir, "feeds.yaml"), "w", encoding="utf-8") as f:
+            yaml.safe_dump({"feeds": local, "routes": routes}, f, allow_unicode=True)
+
+    def run(workdir, mode, attempt, at):
+        env = {"BENCH_CRASH_AT": str(at), "BENCH_GEMINI_LOG": os.path.join(workdir, f"requests-{attempt}.jsonl")}
+        return _run_scenario(workdir, f"run-{attempt}", mode, now, services, env, allow_crash=True)
+
+    def requests_of(workdir, attempt):
+        """(요청한 키 목록, 요약을 받은 키 집합)"""
+        path = os.path.join(workdir, f"requests-{attempt}.jsonl")
+        requested, done = [], set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    requested.extend(rec.get("req", ()))
+                    if "done" in rec:
+                        done.add(rec["done"])
+        return requested, done
+
+    failures = 0
+    try:
+        for mode in ("DAILY_SUMMARY", "HOURLY_CHECK"):
+            workdir = tempfile.mkdtemp(prefix="crash-")
+            try:
+                prepare(workdir)
+                del services.posts[:]
+                points = run(workdir, mode, 0, 0)["crash_points"]
+                reference = {path: set(links) for path, (links, _) in _deliveries(services.posts).items()}
+                calls = len(requests_of(workdir, 0)[0])
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            print(f"[TEST] {mode}: uninterrupted run has {points} crash points, {calls} items summarized, "
+                  f"{len(reference.get('/slack', ()))} items delivered")
+
+            for trial in range(trials):
+                workdir = tempfile.mkdtemp(prefix="crash-")
+                try:
+                    prepare(workdir)
+                    del services.posts[:]
+                    crashes = rng.randint(1, max_crashes)
+                    killed_at, summarized, requested, repeated, in_flight = [], set(), set(), 0, 0
+                    for attempt in range(crashes + 1):
+                        at = rng.randint(1, points) if attempt < crashes else 0
+                        result = run(workdir, mode, attempt, at)
+                        keys, done = requests_of(workdir, attempt)
+                        repeated += sum(1 for k in keys if k in summarized) + len(keys) - len(set(keys))
+                        in_flight += sum(1 for k in set(keys) if k in requested and k not in summarized)
+                        requested.update(keys)
+                        summarized |= done
+                        if result is not None:
+                            break
+                        killed_at.append(at)
+
+                    delivered = _deliveries(services.posts)
+                    problems = []
+                    for path, (links, resent) in delivered.items():
+                        twice = [link for link, n in links.items() if n > 1]
+                        if twice:
+                            problems.append(f"{path}: {len(twice)} items in two messages")
+                    main_links = set(delivered.get("/slack", ({}, 0))[0])
+                    if main_links != reference.get("/slack", set()):
+                        problems.append(f"/slack: {len(reference.get('/slack', set()) - main_links)} missing, "
+                                        f"{len(main_links - reference.get('/slack', set()))} unexpected")
+                    if repeated:
+                        problems.append(f"{repeated} summaries requested again")
+                    left = glob.glob(os.path.join(workdir, "data", "run-journal-*")) + \
+                        glob.glob(os.path.join(workdir, "data", "slack-spool*"))
+                    if left:
+                        problems.append("left behind: " + ", ".join(os.path.basename(p) for p in left))
+                    resent = sum(r for _, r in delivered.values())
+
+                    status = "FAIL " + "; ".join(problems) if problems else "ok"
+                    print(f"[TEST] {mode} trial {trial + 1}: killed at {killed_at} of {points}, "
+                          f"{len(main_links)} items delivered once, {len(summarized)} summarized, "
+                          f"{in_flight} lost in flight, {resent} pages re-sent from spool - {status}")
+                    failures += bool(problems)
+                finally:
+                    shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        services.close()
+
+    if failures:
+        print(f"[ERROR] Crash test: {failures} trials failed (seed {seed})")
+    else:
+        print(f"[INFO] Crash test passed ({2 * trials} trials, seed {seed})")
+    return failures
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="오프라인 end-to-end 벤치마크")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "record", "crash", "_child"])
+    parser.add_argument("--repeat", type=int, default=3, help="시나리오 반복 횟수 (지표별 최솟값 사용)")
+    parser.add_argument("--synthetic", action="store_true", help="녹화한 피드가 있어도 합성 피드 사용")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="기준선 JSON 경로")
+    parser.add_argument("--update-baseline", action="store_true", help="현재 결과를 기준선으로 저장")
+    parser.add_argument("--keep", help="마지막 실행의 작업 디렉터리(data/, 로그)를 복사해 둘 경로")
+    parser.add_argument("--trials", type=int, default=10, help="crash: 모드별 시도 횟수")
+    parser.add_argument("--seed", type=int, help="crash: 죽일 지점을 고르는 난수 시드")
+    args = parser.parse_args(argv)
+
+    if args.command == "_child":
+        _child()
+        return 0
+    if args.command == "record":
+        record()
+        return 0
+    if args.command == "crash":
+        return 1 if crash_test(args.trials, args.seed) else 0
+
+    current = run_suite(args.repeat, args.synthetic, args.keep)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    report(current, baseline)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"[INFO] Baseline saved to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"[WARN] No baseline at {args.baseline} - run with --update-baseline to create one")
+        return 0
+    if baseline.get("config") != current["config"]:
+        print(f"[WARN] Baseline was recorded with a different setup: {baseline.get('config')}")
+
+    regressions = compare(current, baseline)
+    for name, metric, base, value in regressions:
+        print(f"[BENCH] REGRESSION {name} {metric}: {_fmt(metric, base)} → {_fmt(metric, value)} "
+              f"({(value / base - 1) * 100:+.0f}%)" if base else
+              f"[BENCH] REGRESSION {name} {metric}: {_fmt(metric, base)} → {_fmt(metric, value)}")
+    if regressions:
+        print(f"[ERROR] {len(regressions)} metrics regressed against the baseline")
+        return 1
+    print("[INFO] No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import os, math, mmap, struct
+
+# 장기 중복 제거용 Bloom 필터가 기억하는 기간 (일). 0이면 사용하지 않는다.
+SEEN_BLOOM_DAYS = int(os.getenv("SEEN_BLOOM_DAYS", "0"))
+
+# 전체 오탐률 목표 (새 항목을 이미 본 것으로 잘못 판단할 확률)
+SEEN_BLOOM_FP = float(os.getenv("SEEN_BLOOM_FP", "0.001"))
+
+# 하루에 새로 기록되는 ID 수 예상치 - 넘으면 오탐률이 올라간다
+SEEN_BLOOM_DAILY_CAPACITY = int(os.getenv("SEEN_BLOOM_DAILY_CAPACITY", "2000"))
+
+BLOOM_PATH = os.path.join("data", "seen-bloom.bin")
+
+# 파일 헤더: magic, 슬롯(일) 수, 슬롯당 비트 수, 해시 수
+_MAGIC = b"SBF1"
+_HEADER = struct.Struct("<4sIII")
+_DAY = struct.Struct("<I")
+
+
+def _params(days, fp, capacity):
+    """
+    하루 슬롯 하나의 비트 수와 해시 수.
+    조회 시 모든 슬롯을 확인하므로 전체 오탐률 ≈ 슬롯 수 × 슬롯 오탐률이 되도록 나눈다.
+    """
+    p = fp / days
+    bits = math.ceil(-capacity * math.log(p) / (math.log(2) ** 2))
+    bits = (bits + 7) // 8 * 8
+    k = max(1, round(bits / capacity * math.log(2)))
+    return bits, k
+
+
+class BloomRing:
+    def __init__(self, path: str = BLOOM_PATH, days: int = SEEN_BLOOM_DAYS,
+                 fp: float = SEEN_BLOOM_FP, capacity: int = SEEN_BLOOM_DAILY_CAPACITY):
+        """
+        하루 단위 슬롯을 링 버퍼로 돌리는 Bloom 필터 (mmap 파일)
+
+        슬롯 하나가 하루 동안 기록된 ID를 담고, 날짜가 바뀌면 가장 오래된 슬롯을 비워 재사용한다.
+        파일 크기가 기록 기간과 무관하게 고정되어 있고 mmap으로 열기만 하므로
+        기록이 쌓여도 시작 비용이 늘지 않는다.
+
+        Args:
+            path: 필터 파일 경로
+            days: 기억하는 기간 (슬롯 수)
+            fp: 전체 오탐률 목표
+            capacity: 슬롯(하루)당 예상 ID 수
+        """
+        self.path = path
+        self.days = max(1, days)
+        self.bits, self.k = _params(self.days, fp, capacity)
+        self.slot_bytes = self.bits // 8
+        self._days_offset = _HEADER.size
+        self._bits_offset = self._days_offset + self.days * _DAY.size
+        size = self._bits_offset + self.days * self.slot_bytes
+
+        self.created = not self._compatible(size)
+        if self.created:
+            self._create(size)
+
+        self._file = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        self._slot_days = [
+            _DAY.unpack_from(self._mm, self._days_offset + i * _DAY.size)[0]
+            for i in range(self.days)
+        ]
+
+    def _compatible(self, size):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) != size:
+            return False
+        with open(self.path, "rb") as f:
+            header = f.read(_HEADER.size)
+        return header == _HEADER.pack(_MAGIC, self.days, self.bits, self.k)
+
+    def _create(self, size):
+        if os.path.exists(self.path):
+            print(f"[WARN] Bloom filter settings changed - recreating {self.path}")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self.days, self.bits, self.k))
+            f.truncate(size)
+
+    def _positions(self, item):
+        # entry_id는 이미 SHA-256 기반 64비트 값 - 상/하위 32비트로 향상된 이중 해싱
+        h = int(item, 16)
+        a = h & 0xFFFFFFFF
+        b = h >> 32
+        positions = []
+        for i in range(self.k):
+            positions.append(a % self.bits)
+            a += b
+            b += i
+        return positions
+
+    def _live_slots(self, today):
+        start = today - self.days + 1
+        return [i for i, d in enumerate(self._slot_days) if start <= d <= today]
+
+    def _slot_for(self, day):
+        """해당 날짜의 슬롯 번호. 다른 날짜가 쓰던 슬롯이면 비우고 넘겨받는다."""
+        i = day % self.days
+        if self._slot_days[i] != day:
+            base = self._bits_offset + i * self.slot_bytes
+            self._mm[base:base + self.slot_bytes] = bytes(self.slot_bytes)
+            _DAY.pack_into(self._mm, self._days_offset + i * _DAY.size, day)
+            self._slot_days[i] = day
+        return i
+
+    def add(self, item, day):
+        """day(1970-01-01 기준 일수)에 본 ID로 기록한다"""
+        base = self._bits_offset + self._slot_for(day) * self.slot_bytes
+        mm = self._mm
+        for pos in self._positions(item):
+            idx = base + (pos >> 3)
+            mm[idx] |= 1 << (pos & 7)
+
+    def might_contain(self, item, today):
+        """최근 days일 안에 본 적이 있을 수 있으면 True (False면 확실히 처음 보는 ID)"""
+        positions = self._positions(item)
+        mm = self._mm
+        for i in self._live_slots(today):
+            base = self._bits_offset + i * self.slot_bytes
+            for pos in positions:
+                if not mm[base + (pos >> 3)] & (1 << (pos & 7)):
+                    break
+            else:
+                return True
+        return False
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+class LongHorizonSeen:
+    """
+    Bloom 필터(장기) + 정확한 최근 seen 집합을 묶은 seen 집합.
+
+    멤버십은 최근 집합을 먼저 확인한다 (add한 뒤 아직 필터에 기록하지 않은 ID도 있다).
+    없으면 Bloom 필터에서 확인하고, 있으면 보존 기간 밖에서 본 항목으로 간주한다.
+    main.py에서는 load_seen이 돌려준 일반 seen 집합과 같이 add / in / len으로 쓴다.
+    """
+
+    def __init__(self, exact, bloom, clock):
+        """
+        Args:
+            exact: 보존 기간 안의 seen 집합
+            bloom: BloomRing
+            clock: 오늘 날짜(1970-01-01 기준 일수)를 돌려주는 함수 - 상주 모드에서 자정이 지나면
+                   save_seen이 새 날짜 슬롯에 기록하므로 확인할 때마다 날짜를 다시 구한다
+        """
+        self.exact = exact
+        self.bloom = bloom
+        self.clock = clock
+        self.long_horizon_hits = 0
+
+    def __contains__(self, item):
+        if item in self.exact:
+            return True
+        if not self.bloom.might_contain(item, self.clock()):
+            return False
+        self.long_horizon_hits += 1
+        return True
+
+    def __len__(self):
+        return len(self.exact)
+
+    def __iter__(self):
+        return iter(self.exact)
+
+    def add(self, item):
+        self.exact.add(item)
+
+    def update(self, *iterables):
+        for it in iterables:
+            for item in it:
+                self.add(item)
+
+
+def test_bloom(days: int = 30, per_day: int = 2000, fp: float = 0.001, probes: int = 100_000):
+    """
+    오탐률이 목표 근처인지, 기록 기간이 늘어도 필터를 여는 시간이 일정한지 확인한다.
+    """
+    import random, tempfile, time
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bloom.bin")
+        ring = BloomRing(path, days=days, fp=fp, capacity=per_day)
+        inserted = set()
+        for day in range(1000, 1000 + days):
+            for _ in range(per_day):
+                x = f"{rng.getrandbits(64):016x}"
+                inserted.add(x)
+                ring.add(x, day)
+        today = 1000 + days - 1
+        assert all(ring.might_contain(x, today) for x in list(inserted)[:5000])
+
+        false_pos = 0
+        for _ in range(probes):
+            x = f"{rng.getrandbits(64):016x}"
+            if x not in inserted and ring.might_contain(x, today):
+                false_pos += 1
+        rate = false_pos / probes
+        ring.close()
+        print(f"[TEST] Bloom FP rate: {rate:.5f} (target {fp}, {days} days x {per_day} IDs, "
+              f"{os.path.getsize(path) / 1024:.0f} KB)")
+        assert rate <= fp * 2, rate
+
+        # 기록이 하루분일 때와 days일분일 때 여는 시간 비교
+        timings = []
+        for filled_days in (1, days):
+            p = os.path.join(tmp, f"bloom-{filled_days}.bin")
+            ring = BloomRing(p, days=days, fp=fp, capacity=per_day)
+            for day in range(filled_days):
+                for _ in range(200):
+                    ring.add(f"{rng.getrandbits(64):016x}", 2000 + day)
+            ring.close()
+            t0 = time.perf_counter()
+            BloomRing(p, days=days, fp=fp, capacity=per_day).close()
+            timings.append(time.perf_counter() - t0)
+        print(f"[TEST] Bloom open time: 1 day {timings[0] * 1000:.2f} ms, {days} days {timings[1] * 1000:.2f} ms")
+        assert timings[1] < 0.05
+
+
+if __name__ == "__main__":
+    test_bloom()
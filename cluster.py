@@ -0,0 +1,270 @@
+import os, re, time, hashlib
+from typing import Dict, List, Optional
+from textnorm import clean_html
+from newsitem import NewsItem
+
+# 같은 소식으로 볼 최소 유사도 (제목+초록 단어 집합의 Jaccard)
+CLUSTER_THRESHOLD = float(os.getenv("CLUSTER_THRESHOLD", "0.3"))
+
+# 초록에서 비교에 쓰는 앞부분 단어 수 (뒤쪽은 사이트별 안내 문구가 많음)
+CLUSTER_ABSTRACT_WORDS = 60
+
+# MinHash 서명 길이와 LSH 밴드 구성 (밴드 16개 × 행 2개)
+# Jaccard 0.5인 두 항목이 후보가 될 확률 1-(1-0.5²)^16 ≈ 0.99
+_BINS = 32
+_BANDS = 16
+_ROWS = _BINS // _BANDS
+_SHIFT = _BINS.bit_length() - 1
+_EMPTY = 1 << 64
+
+# 한 버킷의 최대 항목 수. 넘치면 흔한 단어가 만든 버킷이라 보고 더 이상 비교하지 않는다
+# (같은 소식은 드문 단어가 만든 다른 밴드에서 만난다)
+_MAX_BUCKET = 24
+
+_WORD_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+you your we our new how what why who after about into over than more just now can not but
+""".split())
+
+
+def _words(text: str, limit: Optional[int] = None) -> List[str]:
+    # 한 글자 단어는 버리되 숫자는 남긴다 ("GPT-4"와 "GPT-5"를 구분)
+    words = [w for w in _WORD_RE.findall(text.lower()) if (len(w) > 1 or w.isdigit()) and w not in _STOPWORDS]
+    return words[:limit] if limit is not None else words
+
+
+def features(title: str, summary: str = "", clean: bool = False) -> frozenset:
+    """
+    비교용 특징 집합: 정규화한 제목 단어 + 제목 바이그램 + 정리한 초록 앞부분 단어
+    제목 바이그램을 넣어 같은 단어를 쓴 다른 소식보다 같은 제목을 더 강하게 묶는다.
+    clean이면 summary가 이미 평문이라 HTML 정리를 건너뛴다.
+    """
+    title_words = _words(title or "")
+    feats = set(title_words)
+    feats.update(a + " " + b for a, b in zip(title_words, title_words[1:]))
+    if summary:
+        feats.update(_words(summary if clean else clean_html(summary), CLUSTER_ABSTRACT_WORDS))
+    return frozenset(feats)
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+class StoryClusterer:
+    def __init__(self, threshold: float = CLUSTER_THRESHOLD):
+        """
+        여러 소스에 올라온 같은 소식을 하나로 묶는 스트리밍 클러스터러
+
+        One Permutation MinHash(특징마다 해시 한 번, 32칸에 나눠 최솟값) + 빈 칸 회전 채우기로
+        서명을 만들고, 밴드 LSH로 후보를 찾은 뒤 실제 Jaccard로 확인한다.
+        항목당 비용이 특징 수에 비례하고 후보 수가 버킷 상한으로 묶이므로 전체가 거의 선형이다.
+
+        먼저 들어온 항목이 대표가 되고, 뒤에 들어온 같은 소식은 대표의 duplicates에 붙는다.
+        같은 소스의 항목끼리는 묶지 않는다 (한 사이트가 같은 소식을 두 번 올리는 일은 드물고,
+        사이트별 안내 문구 때문에 짧은 초록끼리 비슷해 보이는 경우가 더 많다).
+
+        Args:
+            threshold: 같은 소식으로 볼 최소 Jaccard 유사도
+        """
+        self.threshold = threshold
+        self.representatives = 0
+        self.duplicates = 0
+        self._buckets: Dict[tuple, List[int]] = {}
+        self._features: List[frozenset] = []
+        self._owner: List[NewsItem] = []
+        self._sources: List[str] = []
+        self._hash_cache: Dict[str, int] = {}
+
+    def _hash(self, feature: str) -> int:
+        h = self._hash_cache.get(feature)
+        if h is None:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+            self._hash_cache[feature] = h
+        return h
+
+    def signature(self, feats: frozenset) -> List[int]:
+        mins = [_EMPTY] * _BINS
+        for f in feats:
+            h = self._hash(f)
+            b = h & (_BINS - 1)
+            v = h >> _SHIFT
+            if v < mins[b]:
+                mins[b] = v
+        if _EMPTY in mins and len(feats) > 0:
+            # 빈 칸은 오른쪽으로 가장 가까운 채워진 칸의 값 + 거리로 채운다 (회전 채우기)
+            filled = list(mins)
+            for i in range(_BINS):
+                if mins[i] == _EMPTY:
+                    d = 1
+                    while mins[(i + d) % _BINS] == _EMPTY:
+                        d += 1
+                    filled[i] = mins[(i + d) % _BINS] + d * _EMPTY
+            mins = filled
+        return mins
+
+    def add(self, item: NewsItem) -> Optional[NewsItem]:
+        """
+        항목을 넣고, 이미 있는 소식이면 그 대표 항목을 (대표의 duplicates에 붙인 뒤) 반환한다.
+        새 소식이면 None.
+        """
+        feats = features(item.title, item.summary, True)
+        if not feats:
+            # 비교할 내용이 없는 항목은 항상 따로 둔다 (인덱스에도 넣지 않음)
+            self.representatives += 1
+            return None
+        sig = self.signature(feats)
+        keys = [(b,) + tuple(sig[b * _ROWS:(b + 1) * _ROWS]) for b in range(_BANDS)]
+
+        source = item.source
+        best, best_score = None, self.threshold
+        checked = set()
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if not bucket or len(bucket) > _MAX_BUCKET:
+                continue
+            for idx in bucket:
+                if idx in checked:
+                    continue
+                checked.add(idx)
+                if self._sources[idx] == source or self._owner[idx].source == source:
+                    continue
+                score = jaccard(feats, self._features[idx])
+                if score >= best_score:
+                    best, best_score = idx, score
+
+        idx = len(self._features)
+        self._features.append(feats)
+        self._sources.append(source)
+        for key in keys:
+            bucket = self._buckets.setdefault(key, [])
+            if len(bucket) <= _MAX_BUCKET:
+                bucket.append(idx)
+
+        if best is None:
+            self._owner.append(item)
+            self.representatives += 1
+            return None
+
+        rep = self._owner[best]
+        self._owner.append(rep)
+        if not rep.duplicates:
+            rep.duplicates = []
+        rep.duplicates.append(item)
+        self.duplicates += 1
+        return rep
+
+    def __call__(self, entries):
+        """파이프라인 단계: 각 소식의 대표 항목만 통과시킨다"""
+        for e in entries:
+            if self.add(e) is None:
+                yield e
+
+
+def _synthetic_corpus(n_stories: int, seed: int = 0):
+    """
+    소식 n_stories개와 그 사본(1~4개 소스)을 만든다.
+    사본은 제목 단어 일부 교체/순서 변경, 초록 문장 교체, 소스별 안내 문구를 넣어 흉내 낸다.
+    Zipf 분포 어휘라서 흔한 단어(회사명, "model" 등)를 공유하는 다른 소식이 많다.
+
+    Returns:
+        (항목 리스트, 항목별 정답 소식 번호)
+    """
+    import random
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(20000)]
+    cum, total = [], 0.0
+    for i in range(len(vocab)):
+        total += 1.0 / (i + 1)
+        cum.append(total)
+    topics = ["openai", "google", "anthropic", "meta", "nvidia", "model", "agent", "gpt", "gemini", "release"]
+    boiler = {
+        "OpenAI News": "",
+        "The Verge": "Read the full story at The Verge",
+        "VentureBeat": "Join our daily newsletters for the latest updates",
+        "404 Media": "Subscribe to 404 Media to read more",
+        "MIT Tech Review": "This story originally appeared in The Algorithm",
+    }
+    sources = list(boiler)
+
+    items, truth = [], []
+    for s in range(n_stories):
+        title = [rng.choice(topics)] + rng.choices(vocab, cum_weights=cum, k=7)
+        body = rng.choices(vocab, cum_weights=cum, k=50)
+        copies = rng.choices([1, 2, 3, 4], weights=[50, 25, 15, 10])[0]
+        for c, source in enumerate(rng.sample(sources, copies)):
+            t, b = list(title), list(body)
+            if c > 0:
+                for _ in range(rng.randint(1, 2)):
+                    t[rng.randrange(len(t))] = rng.choice(vocab)
+                if rng.random() < 0.5:
+                    i = rng.randrange(len(t) - 1)
+                    t[i], t[i + 1] = t[i + 1], t[i]
+                for _ in range(rng.randint(5, 15)):
+                    b[rng.randrange(len(b))] = rng.choices(vocab, cum_weights=cum)[0]
+            summary = f"<p>{' '.join(b)}</p> {boiler[source]}"
+            items.append(NewsItem(source, " ".join(t), f"https://{c}.example/{s}", summary=summary))
+            truth.append(s)
+    order = list(range(len(items)))
+    rng.shuffle(order)
+    return [items[i] for i in order], [truth[i] for i in order]
+
+
+def _pair_scores(items, truth):
+    """대표로 묶인 결과와 정답 소식 번호로 쌍 단위 precision/recall"""
+    from collections import Counter
+    label = {}
+    for i, e in enumerate(items):
+        label[id(e)] = i
+    predicted = list(range(len(items)))
+    for i, e in enumerate(items):
+        for d in e.duplicates:
+            predicted[label[id(d)]] = i
+
+    def same_pairs(labels):
+        return sum(n * (n - 1) // 2 for n in Counter(labels).values())
+
+    tp = same_pairs(list(zip(predicted, truth)))
+    pred_pairs = same_pairs(predicted)
+    true_pairs = same_pairs(truth)
+    precision = tp / pred_pairs if pred_pairs else 1.0
+    recall = tp / true_pairs if true_pairs else 1.0
+    return precision, recall
+
+
+def test_clustering(n_stories: int = 3000):
+    """합성 말뭉치에서 쌍 단위 precision/recall 확인"""
+    items, truth = _synthetic_corpus(n_stories)
+    clusterer = StoryClusterer()
+    reps = list(clusterer(items))
+    precision, recall = _pair_scores(items, truth)
+    print(f"[INFO] {len(items)} items from {n_stories} stories → {len(reps)} clusters")
+    print(f"[INFO] Pairwise precision {precision:.3f}, recall {recall:.3f} (threshold {clusterer.threshold})")
+    assert precision >= 0.98 and recall >= 0.95, (precision, recall)
+    print("[INFO] Clustering test passed")
+
+
+def benchmark_clustering(sizes=(10_000, 50_000, 100_000)):
+    """항목 수에 따른 클러스터링 시간 (거의 선형인지 확인)"""
+    results = []
+    for n in sizes:
+        items, truth = _synthetic_corpus(int(n / 1.85))
+        items = items[:n]
+        t0 = time.perf_counter()
+        clusterer = StoryClusterer()
+        reps = sum(1 for _ in clusterer(items))
+        elapsed = time.perf_counter() - t0
+        results.append((len(items), elapsed))
+        print(f"[INFO] {len(items):>7} items: {elapsed:6.2f}s ({elapsed * 1e6 / len(items):.1f} us/item), {reps} clusters")
+    (n0, t0), (n1, t1) = results[0], results[-1]
+    print(f"[INFO] Scaling: {n1 / n0:.0f}x items → {t1 / t0:.1f}x time")
+    return results
+
+
+if __name__ == "__main__":
+    test_clustering()
+    benchmark_clustering()
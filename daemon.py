@@ -0,0 +1,263 @@
+import os, json, signal, threading, traceback, datetime as dt
+import main
+import journal, metrics
+from utils import TZ, now_kst, start_of_today_kst
+from notifier import flush_slack
+
+# 상주 모드(MODE=SERVE) 설정
+# - SERVE_DAILY_AT: 일일 요약을 보내는 시각 (KST, HH:MM)
+# - 피드별 확인 간격(분)은 발행 이력으로 학습한 도착률(scheduler.py)로 정하되 최소/최대 사이로 제한한다
+# - SERVE_DEFAULT_INTERVAL_MIN: 확인에 실패한 피드를 다시 시도하기까지의 최대 간격
+SERVE_DAILY_AT = os.getenv("SERVE_DAILY_AT", "09:00")
+SERVE_MIN_INTERVAL_MIN = float(os.getenv("SERVE_MIN_INTERVAL_MIN", "10"))
+SERVE_MAX_INTERVAL_MIN = float(os.getenv("SERVE_MAX_INTERVAL_MIN", "360"))
+SERVE_DEFAULT_INTERVAL_MIN = float(os.getenv("SERVE_DEFAULT_INTERVAL_MIN", "60"))
+
+# 곧 차례가 오는 피드(이 시간 안, 분)는 같이 받아 실행/메시지 수를 줄인다
+SERVE_BATCH_WINDOW_MIN = float(os.getenv("SERVE_BATCH_WINDOW_MIN", "5"))
+
+SERVE_STATE_PATH = os.path.join("data", "serve-state.json")
+
+
+def next_daily(now, at=SERVE_DAILY_AT):
+    """now 이후(포함하지 않음) 처음 오는 일일 요약 시각"""
+    hour, minute = (int(x) for x in at.split(":"))
+    t = start_of_today_kst(now) + dt.timedelta(hours=hour, minutes=minute)
+    return t if t > now else t + dt.timedelta(days=1)
+
+
+class Daemon:
+    def __init__(self, feeds=None, clock=now_kst, state=None, state_path=SERVE_STATE_PATH):
+        """
+        상주 스케줄러 (MODE=SERVE)
+
+        실행마다 새 프로세스를 띄우는 대신 RunState(seen, 검증자/커서, HTTP 세션, 요약기)를 메모리에 두고
+        - 피드마다 자기 간격으로 HOURLY_CHECK를 돌린다. 간격은 발행 시각 이력으로 추정한 도착률로
+          FeedScheduler가 정한다 (scheduler.py, 범위는 SERVE_MIN/MAX_INTERVAL_MIN)
+        - 매일 SERVE_DAILY_AT(KST)에 DAILY_SUMMARY를 보낸다
+        - 실행마다 seen/검증자/커서/피드 스케줄(run_once)과 다음 일일 요약 시각(serve-state.json)을 저장한다
+
+        Args:
+            feeds: 피드 목록 (기본 feeds.yaml)
+            clock: 현재 시각(KST aware datetime)을 돌려주는 함수 (테스트용 가짜 시계)
+            state: main.RunState (기본: 새로 읽음)
+        """
+        self.feeds = feeds if feeds is not None else main.load_feeds()
+        self.clock = clock
+        self.state = state if state is not None else main.RunState()
+        self.state_path = state_path
+        self.stop_event = threading.Event()
+        self.polls = {}
+        self.daily_runs = 0
+        self.scheduler = self.state.scheduler
+        self.scheduler.min_interval = 60 * SERVE_MIN_INTERVAL_MIN
+        self.scheduler.max_staleness = 60 * SERVE_MAX_INTERVAL_MIN
+        # 확인에 실패한 피드의 재시도 시각 (URL → epoch 초)
+        self.retry_at = {}
+
+        now = clock()
+        saved = self._load()
+        # 멈춰 있는 동안 지나간 일일 요약은 시작하자마자 보낸다
+        self.next_daily = (dt.datetime.fromisoformat(saved["next_daily"]).astimezone(now.tzinfo)
+                           if saved.get("next_daily") else next_daily(now))
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"[WARN] Failed to load serve state {self.state_path}: {e}")
+            return {}
+
+    def checkpoint(self):
+        """다음 일일 요약 시각 저장 (임시 파일에 쓰고 교체)"""
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"next_daily": self.next_daily.isoformat()}, f)
+        os.replace(tmp, self.state_path)
+
+    def next_poll(self, feed, ts):
+        """이 피드를 다음에 확인할 시각 (epoch 초)"""
+        return self.retry_at.get(feed["url"]) or self.scheduler.next_fetch(feed, ts)
+
+    def _polled(self, feeds, now, ok):
+        ts = now.timestamp()
+        for f in feeds:
+            if ok:
+                # 받은 시각과 발행 이력은 run_once가 스케줄러에 기록했다
+                self.retry_at.pop(f["url"], None)
+            else:
+                # 실패한 실행은 기록이 없으므로 기본 간격 안에 다시 시도한다
+                wait = min(self.scheduler.interval(f, ts), 60 * SERVE_DEFAULT_INTERVAL_MIN)
+                self.retry_at[f["url"]] = ts + max(wait, 60 * SERVE_MIN_INTERVAL_MIN)
+            self.polls[f["name"]] = self.polls.get(f["name"], 0) + 1
+
+    def _run(self, mode, feeds, now):
+        try:
+            main.run_once(mode, self.state, feeds, now)
+            return True
+        except Exception as e:
+            print(f"[ERROR] {mode} run failed: {e}")
+            traceback.print_exc()
+            return False
+        finally:
+            # 전송 스레드와 세션은 남겨 두고 보낸 메시지만 기다린다
+            if flush_slack(close=False):
+                journal.complete()
+            metrics.flush(mode=mode)
+
+    def due_feeds(self, now):
+        ts = now.timestamp()
+        horizon = ts + 60 * SERVE_BATCH_WINDOW_MIN
+        return [f for f in self.feeds if self.next_poll(f, ts) <= horizon]
+
+    def step(self):
+        """
+        지금 할 일(일일 요약, 차례가 된 피드 확인)을 하고 다음에 깨어날 시각을 반환한다.
+        """
+        now = self.clock()
+        if now >= self.next_daily:
+            self._run("DAILY_SUMMARY", self.feeds, now)
+            self.daily_runs += 1
+            self.next_daily = next_daily(now)
+            # 하루 한 번 보존 기간이 지난 seen ID를 메모리에서도 버린다
+            self.state.reload_seen()
+
+        due = self.due_feeds(now)
+        if due:
+            print(f"[INFO] Polling {len(due)}/{len(self.feeds)} feeds: {', '.join(f['name'] for f in due)}")
+            ok = self._run("HOURLY_CHECK", due, now)
+            self._polled(due, now, ok)
+        self.checkpoint()
+        return self.next_wakeup()
+
+    def next_wakeup(self):
+        ts = self.clock().timestamp()
+        first_poll = min((self.next_poll(f, ts) for f in self.feeds), default=float("inf"))
+        return min(self.next_daily, dt.datetime.fromtimestamp(first_poll, self.next_daily.tzinfo))
+
+    def run_forever(self, max_sleep=60.0):
+        """종료 신호(SIGTERM/SIGINT)를 받을 때까지 실행한다 (실제 시계 기준)."""
+        def stop(signum, frame):
+            print(f"[INFO] Received signal {signum} - stopping after the current run")
+            self.stop_event.set()
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        print(f"[INFO] Serving {len(self.feeds)} feeds, daily summary at {SERVE_DAILY_AT} KST "
+              f"(next {self.next_daily.strftime('%Y-%m-%d %H:%M')})")
+        try:
+            while not self.stop_event.is_set():
+                wake = self.step()
+                wait = (wake - self.clock()).total_seconds()
+                self.stop_event.wait(min(max_sleep, max(1.0, wait)))
+        finally:
+            if flush_slack():
+                journal.complete()
+            self.checkpoint()
+            self.state.close()
+
+
+def serve():
+    Daemon().run_forever()
+
+
+def test_daemon(days=3):
+    """
+    가짜 시계 + 로컬 피드 서버로 며칠을 돌려 본다.
+    - 자주 올라오는 피드(30분마다)와 드문 피드(이틀마다)의 확인 횟수가 도착률에 맞게 갈리는지
+    - 일일 요약이 매일 한 번 나가는지
+    - HOURLY 알림에 같은 항목이 두 번 나가지 않는지, 재시작해도 스케줄이 이어지는지
+    """
+    import tempfile, contextlib, io, hashlib
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from email.utils import format_datetime
+
+    start = TZ.localize(dt.datetime(2025, 3, 3, 6, 0))
+    clock = {"now": start}
+    period = {"/fast.xml": dt.timedelta(minutes=30), "/slow.xml": dt.timedelta(days=2)}
+    origin = start - dt.timedelta(days=3)
+
+    def published(path):
+        now = clock["now"]
+        n = int((now - origin) / period[path])
+        return [origin + period[path] * (i + 1) for i in range(max(0, n - 50), n)]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            items = published(self.path)
+            body = ('<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>' + "".join(
+                f"<item><title>{self.path} {t.isoformat()}</title><link>https://x.example{self.path}/{t.timestamp():.0f}</link>"
+                f"<pubDate>{format_datetime(t.astimezone(dt.timezone.utc))}</pubDate></item>"
+                for t in reversed(items)) + "</channel></rss>").encode("utf-8")
+            etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    feeds = [{"name": "Fast", "url": base + "/fast.xml"}, {"name": "Slow", "url": base + "/slow.xml"}]
+
+    hourly, daily = [], []
+    saved = (main.send_with_mode, main.GEMINI_API_KEY, main.CLUSTER_STORIES, os.getcwd())
+
+    def capture(title, items, use_gemini_text):
+        (daily if title.startswith("📌") else hourly).extend(e.link for e in items)
+
+    main.send_with_mode, main.GEMINI_API_KEY, main.CLUSTER_STORIES = capture, None, False
+    tmp = tempfile.TemporaryDirectory()
+    os.chdir(tmp.name)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            d = Daemon(feeds, clock=lambda: clock["now"])
+            end = start + dt.timedelta(days=days)
+            restarted = False
+            while clock["now"] < end:
+                wake = d.step()
+                clock["now"] = max(wake, clock["now"] + dt.timedelta(seconds=1))
+                if not restarted and clock["now"] >= start + dt.timedelta(days=days / 2):
+                    # 재시작: 스케줄과 seen을 디스크에서 다시 읽는다
+                    polls, daily_runs = d.polls, d.daily_runs
+                    d.state.close()
+                    d = Daemon(feeds, clock=lambda: clock["now"])
+                    d.polls, d.daily_runs = polls, daily_runs
+                    restarted = True
+            d.state.close()
+    finally:
+        main.send_with_mode, main.GEMINI_API_KEY, main.CLUSTER_STORIES, cwd = saved
+        os.chdir(cwd)
+        server.shutdown()
+        tmp.cleanup()
+
+    hourly_polls = days * 24
+    fast_items = int((end - origin) / period["/fast.xml"]) - int((start - origin) / period["/fast.xml"])
+    fast_hourly = [link for link in hourly if "/fast.xml/" in link]
+    print(f"[TEST] {days} days: Fast polled {d.polls.get('Fast', 0)}x, Slow {d.polls.get('Slow', 0)}x "
+          f"(fixed hourly: {hourly_polls}x each), {d.daily_runs} daily summaries, "
+          f"{len(fast_hourly)} hourly notifications for {fast_items} new Fast items")
+    assert d.daily_runs == days, d.daily_runs
+    assert len(hourly) == len(set(hourly)), "item notified twice"
+    # 드문 피드는 최대 간격까지 늘어나고, 자주 올라오는 피드는 도착 간격(30분)쯤으로 확인한다
+    assert d.polls["Slow"] <= hourly_polls / 3, d.polls
+    assert d.polls["Fast"] >= hourly_polls * 1.5, d.polls
+    # 자정 직전 항목은 다음 날 일일 요약으로 알린다 (HOURLY 창은 오늘 00:00부터)
+    assert len(fast_hourly) >= 0.9 * fast_items, (len(fast_hourly), fast_items)
+    print("[INFO] Daemon test passed")
+
+
+if __name__ == "__main__":
+    test_daemon()
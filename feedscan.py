@@ -0,0 +1,427 @@
+import os, io, time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import feedparser
+from utils import parse_date, entry_datetime, raw_entry_id
+
+# RSS 2.0 / Atom은 feedparser 대신 스트리밍 파서(ElementTree.iterparse)로 읽을지 여부
+# (형식이 깨진 피드는 항상 feedparser로 다시 읽는다)
+FASTPARSE = os.getenv("FASTPARSE", "true").lower() == "true"
+
+# 큰 피드(본문 바이트 이상)는 별도 프로세스에서 파싱한다 (GIL 때문에 스레드로는 나눠지지 않음)
+# 프로세스 수 0이면 끈다 (기본: CPU 수 - 1, 최대 4)
+FASTPARSE_WORKERS = int(os.getenv("FASTPARSE_WORKERS", str(max(0, min(4, (os.cpu_count() or 1) - 1)))))
+FASTPARSE_POOL_MIN_BYTES = int(os.getenv("FASTPARSE_POOL_MIN_BYTES", str(256 * 1024)))
+
+# 날짜순 피드에서 멈출 자리를 찾은 뒤 날짜순인지 확인하려고 더 읽는 항목 수 (select_entries)
+_CONFIRM = 8
+
+_ATOM = "{http://www.w3.org/2005/Atom}"
+_ATOM03 = "{http://purl.org/atom/ns#}"
+_RSS1 = "{http://purl.org/rss/1.0/}"
+_DC_DATE = "{http://purl.org/dc/elements/1.1/}date"
+_CONTENT = "{http://purl.org/rss/1.0/modules/content/}encoded"
+
+
+class FeedFormatError(ValueError):
+    """RSS/Atom이 아닌 문서 (feedparser로 다시 읽는다)"""
+
+
+class FeedEntry:
+    """
+    스트리밍 파서가 만드는 피드 항목
+
+    normalize_entry/raw_entry_id가 읽는 feedparser 항목의 속성만 같은 이름과 의미로 갖는다.
+    (없는 값은 feedparser 항목에서 getattr 기본값으로 읽던 값과 같다)
+    """
+    __slots__ = ("title", "link", "id", "published", "published_parsed", "updated", "updated_parsed", "summary")
+
+    def __init__(self, title="", link="", id=None, published=None, updated=None, summary=""):
+        self.title = title
+        self.link = link
+        self.id = id
+        self.published = published
+        self.published_parsed = None
+        self.updated = updated
+        self.updated_parsed = None
+        self.summary = summary
+
+
+def _text(el):
+    if el is None:
+        return None
+    return "".join(el.itertext()).strip()
+
+
+def _children(item, ns=None):
+    """자식 태그 → 첫 번째 요소 (ns 접두어는 떼어 낸다)"""
+    fields = {}
+    for child in item:
+        tag = child.tag
+        if ns and tag.startswith(ns):
+            tag = tag[len(ns):]
+        if tag not in fields:
+            fields[tag] = child
+    return fields
+
+
+def _rss_entry(item):
+    fields = _children(item, _RSS1)
+    e = FeedEntry(title=_text(fields.get("title")) or "")
+    link = _text(fields.get("link"))
+    guid = fields.get("guid")
+    if guid is not None:
+        e.id = _text(guid)
+        # feedparser처럼 링크가 없으면 고유 링크(isPermaLink가 false가 아닌 guid)를 쓴다
+        if not link and guid.get("isPermaLink", "true").lower() != "false":
+            link = e.id
+    e.link = link or ""
+    # pubDate는 published/updated 둘 다, dc:date는 updated (feedparser와 같음)
+    e.published = _text(fields.get("pubDate"))
+    e.updated = e.published or _text(fields.get(_DC_DATE))
+    e.summary = _text(fields.get("description")) or _text(fields.get(_CONTENT)) or ""
+    return e
+
+
+def _atom_entry(entry, ns):
+    fields = _children(entry, ns)
+    e = FeedEntry(title=_text(fields.get("title")) or "", id=_text(fields.get("id")))
+    for child in entry:
+        if child.tag == ns + "link" and child.get("rel", "alternate") == "alternate":
+            e.link = (child.get("href") or "").strip()
+            break
+    e.published = _text(fields.get("published")) or _text(fields.get("issued"))
+    e.updated = _text(fields.get("updated")) or _text(fields.get("modified"))
+    e.summary = _text(fields.get("summary")) or _text(fields.get("content")) or ""
+    return e
+
+
+def _set_parsed(e, source_name):
+    # feedparser처럼 *_parsed(UTC struct_time)를 미리 계산해 둔다 (entry_datetime이 쓰는 쪽만)
+    if e.published:
+        value = parse_date(e.published, None, source_name)
+        if value is not None:
+            e.published_parsed = value.utctimetuple()
+            if e.updated == e.published:
+                e.updated_parsed = e.published_parsed
+    elif e.updated:
+        value = parse_date(e.updated, None, source_name)
+        if value is not None:
+            e.updated_parsed = value.utctimetuple()
+
+
+def iter_feed(content: bytes, source_name=None):
+    """
+    RSS 2.0 / RSS 1.0 / Atom 본문을 앞에서부터 읽어 항목(FeedEntry)을 하나씩 yield 한다.
+
+    항목이 끝날 때마다 요소를 트리에서 떼어 내므로 메모리는 항목 하나 크기로 유지되고,
+    소비자가 멈추면 나머지 본문은 읽지 않는다.
+
+    Raises:
+        FeedFormatError: 루트가 RSS/Atom이 아님
+        xml.etree.ElementTree.ParseError: 형식이 깨진 XML (HTML 엔티티, 잘못된 인코딩 등)
+    """
+    events = ET.iterparse(io.BytesIO(content), events=("start", "end"))
+    _, root = next(events)
+    tag = root.tag
+    if tag == "rss" or tag.endswith("}RDF"):
+        item_tags = ("item", _RSS1 + "item")
+        make = _rss_entry
+    elif tag in (_ATOM + "feed", _ATOM03 + "feed"):
+        ns = tag[:-len("feed")]
+        item_tags = (ns + "entry",)
+        make = lambda el: _atom_entry(el, ns)
+    else:
+        raise FeedFormatError(f"not an RSS/Atom document (root <{tag}>)")
+
+    stack = [root]
+    for event, el in events:
+        if event == "start":
+            stack.append(el)
+            continue
+        stack.pop()
+        if el.tag in item_tags:
+            e = make(el)
+            _set_parsed(e, source_name)
+            # 처리한 항목은 부모에서 떼어 낸다 (부모에는 항목이 쌓이지 않는다)
+            stack[-1].remove(el)
+            yield e
+
+
+def entry_timestamp(raw, source_name):
+    published_dt = entry_datetime(raw, source_name)
+    return published_dt.timestamp() if published_dt else None
+
+
+def select_entries(entries, source_name, cursor=None, window=None, limit=None):
+    """
+    피드 항목 중 아직 처리하지 않은 항목을 처리할 순서대로 고른다.
+
+    - 커서의 ids에 있는 항목(이미 처리함)은 건너뛴다.
+    - 날짜순(최신 먼저)으로 정렬된 피드이고 지난 실행에서 남긴 항목이 없으면
+      이미 처리한 항목이나 커서보다 오래된 항목을 만나는 순간 멈춘다.
+    - entries가 지연 iterator(iter_feed)면 날짜순 피드에서 기간(window, epoch 초 (시작, 끝)) 시작보다
+      오래된 항목이나, 기간 안의 limit+1번째 항목(다음 실행으로 넘길 항목이 있다는 표시)까지만 고르고
+      나머지 본문은 읽지 않는다.
+    - 날짜순이 아닌 피드는 끝까지 보되, 최신 항목부터 처리하도록 정렬한다.
+
+    지연 iterator는 끝까지 보지 않으므로 멈출 자리를 찾은 뒤에도 _CONFIRM개를 더 읽어
+    그때까지 날짜순이 유지될 때만 멈춘다 (섞인 피드의 앞 몇 항목이 우연히 날짜순인 경우).
+
+    Returns:
+        ([(raw, id, 발행 시각 epoch)], 건너뛴 이미 처리한 항목 수, 피드 항목 수, 끝까지 읽었는지)
+        일찍 멈추면 항목 수와 건너뛴 수는 읽은 데까지만 센다.
+    """
+    known = set(cursor.get("ids", ())) if cursor else set()
+    newest = cursor.get("newest") if cursor else None
+    use_cursor = cursor is not None and not cursor.get("backlog")
+    lazy = not isinstance(entries, list)
+    start, end = window if window is not None and lazy else (None, None)
+    limit = limit if lazy else None
+
+    seen = []
+    ordered = True
+    previous = float("inf")
+    in_window = 0
+    stop = None       # 날짜순일 때 고를 항목의 끝 (seen 인덱스)
+    stop_known = False
+    complete = True
+    for raw in entries:
+        ts = entry_timestamp(raw, source_name)
+        rid = raw_entry_id(raw)
+        if ts is None or ts > previous:
+            ordered = False
+        else:
+            previous = ts
+        seen.append((raw, rid, ts))
+        if not ordered:
+            if not lazy:
+                continue
+            # 날짜순이 아니면 끝까지 읽는다
+            stop = None
+            continue
+        if stop is not None:
+            if lazy and len(seen) > stop + _CONFIRM:
+                complete = False
+                break
+            continue
+        if use_cursor and (rid in known or (newest is not None and ts < newest)):
+            # 날짜순 피드: 여기부터 아래는 모두 지난 실행에서 처리한 항목
+            stop, stop_known = len(seen) - 1, True
+        elif start is not None and ts < start:
+            stop = len(seen)
+        elif limit is not None and rid not in known and start <= ts <= end:
+            in_window += 1
+            if in_window > limit:
+                stop = len(seen)
+
+    if not ordered:
+        candidates = [r for r in seen if r[1] not in known]
+        candidates.sort(key=lambda r: r[2] if r[2] is not None else float("-inf"), reverse=True)
+        return candidates, len(seen) - len(candidates), len(seen), True
+
+    cut = stop if stop is not None else len(seen)
+    candidates = [r for r in seen[:cut] if r[1] not in known]
+    skipped = cut - len(candidates)
+    if stop_known:
+        skipped += len(seen) - cut
+    return candidates, skipped, len(seen), complete
+
+
+def scan_feed(content: bytes, headers, source_name, cursor=None, window=None, limit=None):
+    """
+    피드 본문 하나를 파싱해 처리할 항목을 고른다 (select_entries 참고).
+
+    FASTPARSE면 스트리밍 파서로 필요한 만큼만 읽고, RSS/Atom이 아니거나 XML이 깨졌으면
+    feedparser로 처음부터 다시 읽는다. 결과는 pickle 가능한 값이라 다른 프로세스에서 실행해도 된다.
+
+    Returns:
+        {"candidates", "known", "entries", "complete", "parser": "fast" | "feedparser"}
+    """
+    if FASTPARSE:
+        try:
+            candidates, known, n, complete = select_entries(iter_feed(content, source_name), source_name,
+                                                            cursor, window, limit)
+            return {"candidates": candidates, "known": known, "entries": n, "complete": complete, "parser": "fast"}
+        except (ET.ParseError, FeedFormatError) as e:
+            print(f"[DEBUG] Fast parser fell back to feedparser for {source_name}: {e}")
+    d = feedparser.parse(content, response_headers=headers)
+    candidates, known, n, complete = select_entries(d.entries, source_name, cursor)
+    return {"candidates": candidates, "known": known, "entries": n, "complete": complete, "parser": "feedparser"}
+
+
+_pool = None
+
+
+def _warm():
+    return os.getpid()
+
+
+def get_pool():
+    """파싱 프로세스 풀 (FASTPARSE_WORKERS가 0이면 None, 처음 보내는 큰 피드에서 띄우고 shutdown_pool까지 재사용)"""
+    global _pool
+    if _pool is None and FASTPARSE_WORKERS > 0:
+        # fork는 다운로드/전송 스레드가 잡고 있던 락을 그대로 복사하므로 spawn으로 띄운다
+        _pool = ProcessPoolExecutor(FASTPARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        # 나머지 프로세스 시작(모듈 import)을 이후 다운로드와 겹치도록 미리 띄워 둔다
+        for _ in range(FASTPARSE_WORKERS):
+            _pool.submit(_warm)
+    return _pool
+
+
+def offload(content) -> bool:
+    """이 본문을 파싱 프로세스로 보낼지 (큰 피드만)"""
+    return FASTPARSE_WORKERS > 0 and content is not None and len(content) >= FASTPARSE_POOL_MIN_BYTES
+
+
+def submit(content, headers, source_name, cursor=None, window=None, limit=None):
+    """scan_feed를 파싱 프로세스에서 실행한다 (Future)"""
+    return get_pool().submit(scan_feed, content, dict(headers or {}), source_name, cursor, window, limit)
+
+
+def shutdown_pool(wait: bool = False):
+    """파싱 프로세스를 끝낸다 (띄운 적이 없으면 아무 일도 하지 않는다)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=wait, cancel_futures=True)
+        _pool = None
+
+
+def _compare_fields(raw):
+    from textnorm import truncate_html
+    summary = getattr(raw, "summary", "") or getattr(raw, "description", "")
+    return (raw_entry_id(raw), getattr(raw, "title", "").strip(), getattr(raw, "link", "").strip(),
+            getattr(raw, "published", None), entry_timestamp(raw, None), truncate_html(summary, 500))
+
+
+def test_feedscan():
+    """
+    - 벤치마크 피드(녹화본, 없으면 합성)에서 스트리밍 파서와 feedparser의 항목이 같은지
+    - 형식이 깨진 피드는 feedparser로 돌아가는지
+    - 날짜순 피드에서 커서/기간/상한에 닿으면 멈추는지
+    """
+    import benchmark
+    bodies, now, kind = benchmark.load_fixtures(benchmark.load_feeds())
+    for name, body in bodies.items():
+        fast = [_compare_fields(e) for e in iter_feed(body, name)]
+        slow = [_compare_fields(e) for e in feedparser.parse(body).entries]
+        assert fast == slow, (name, next((a, b) for a, b in zip(fast, slow) if a != b) if fast and slow else None)
+    print(f"[TEST] {len(bodies)} {kind} feeds: streaming parser matches feedparser")
+
+    edge = (b'<?xml version="1.0"?><rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/" '
+            b'xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel><title>t</title>'
+            b'<item><title>  A &amp; B <![CDATA[<b>x</b>]]> </title><guid>https://e.com/g1</guid>'
+            b'<dc:date>2024-05-01T10:00:00Z</dc:date><content:encoded><![CDATA[<p>full</p>]]></content:encoded></item>'
+            b'<item><title>B</title><guid isPermaLink="false">abc</guid><pubDate>Wed, 01 May 2024 12:34:56 +0000</pubDate>'
+            b'<description>&lt;p&gt;d&lt;/p&gt;</description><link> https://e.com/b </link></item>'
+            b'<item><title>C</title><description>plain &amp; text</description></item></channel></rss>')
+    atom = (b'<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom"><title>x</title>'
+            b'<entry><title type="html">A &lt;b&gt;bold&lt;/b&gt;</title><link rel="self" href="https://e.com/self"/>'
+            b'<link rel="alternate" type="text/html" href="https://e.com/a"/><id>urn:1</id>'
+            b'<published>2024-05-01T10:00:00+09:00</published><updated>2024-05-02T10:00:00Z</updated>'
+            b'<content type="html">&lt;p&gt;c&lt;/p&gt;</content></entry>'
+            b'<entry><title>B</title><link href="https://e.com/b"/><updated>2024-05-02T10:00:00Z</updated>'
+            b'<summary>s</summary></entry></feed>')
+    for body in (edge, atom):
+        assert [_compare_fields(e) for e in iter_feed(body)] == [_compare_fields(e) for e in feedparser.parse(body).entries]
+
+    # 정의되지 않은 HTML 엔티티 → feedparser
+    broken = b'<rss version="2.0"><channel><item><title>A&nbsp;B</title><link>https://e.com/x</link></item></channel></rss>'
+    assert scan_feed(broken, {}, "broken")["parser"] == "feedparser"
+    assert scan_feed(b"<html><body>not a feed</body></html>", {}, "html")["candidates"] == []
+
+    # 날짜순 피드 200건 (1시간 간격)
+    base = 1_700_000_000
+    items = "".join(f"<item><title>T{i}</title><link>https://e.com/{i}</link>"
+                    f"<pubDate>{time.strftime('%a, %d %b %Y %H:%M:%S +0000', time.gmtime(base - 3600 * i))}</pubDate></item>"
+                    for i in range(200))
+    body = f'<rss version="2.0"><channel><title>t</title>{items}</channel></rss>'.encode()
+    full = scan_feed(body, {}, "ordered")
+    assert full["entries"] == 200 and full["complete"] and len(full["candidates"]) == 200
+    # 기간: 최근 10시간 → 11번째(기간 밖 첫 항목)에서 멈춘다
+    r = scan_feed(body, {}, "ordered", window=(base - 3600 * 9.5, base + 1))
+    assert len(r["candidates"]) == 11 and not r["complete"] and r["entries"] == 11 + _CONFIRM + 1, r["entries"]
+    # 상한 30 → 31번째(다음 실행으로 넘길 항목)에서 멈춘다
+    r = scan_feed(body, {}, "ordered", window=(base - 86400 * 30, base + 1), limit=30)
+    assert len(r["candidates"]) == 31 and not r["complete"]
+    # 커서: 5건 이후는 이미 처리함
+    cursor = {"newest": base - 3600 * 5, "ids": [c[1] for c in full["candidates"][5:60]], "backlog": 0}
+    r = scan_feed(body, {}, "ordered", cursor=cursor)
+    assert len(r["candidates"]) == 5 and r["known"] == _CONFIRM + 1 and r["entries"] == 5 + _CONFIRM + 1, r
+    # 섞인 피드는 앞 항목이 기간 밖이어도 끝까지 본다
+    shuffled = [items.split("</item>")[i] + "</item>" for i in (150, *range(150))]
+    body2 = f'<rss version="2.0"><channel>{"".join(shuffled)}</channel></rss>'.encode()
+    r = scan_feed(body2, {}, "shuffled", window=(base - 3600 * 9.5, base + 1), limit=30)
+    assert r["complete"] and r["entries"] == 151 and r["candidates"][0][2] == base
+    # feedparser 경로는 그대로 끝까지 센다
+    r = select_entries(feedparser.parse(body).entries, "ordered", cursor, (base - 3600 * 9.5, base + 1), 3)
+    assert len(r[0]) == 5 and r[1] == 195 and r[2] == 200
+    print("[INFO] Feed scan test passed")
+
+
+def benchmark_parse(repeat: int = 3, workers: int = 2):
+    """
+    벤치마크 피드(녹화본, 없으면 합성) 중 큰 피드를 feedparser와 스트리밍 파서로 파싱해 시간/메모리를 비교한다.
+
+    - feedparser: 지금까지의 방식 (전체 트리 + select_entries)
+    - fast (full): 스트리밍 파서로 끝까지
+    - fast (DAILY): 어제 하루 + 피드당 상한에서 멈춤
+    - pool: 큰 피드를 workers개 프로세스에 나눠 파싱 (프로세스 시작 시간 제외)
+    """
+    import tracemalloc
+    import benchmark
+    from concurrent.futures import wait
+    from main import date_range, MAX_ITEMS_PER_FEED
+
+    bodies, now, kind = benchmark.load_fixtures(benchmark.load_feeds())
+    big = {name: body for name, body in bodies.items() if len(body) >= 100 * 1024} or bodies
+    start, end = date_range("DAILY_SUMMARY", now)
+    window = (start.timestamp(), end.timestamp())
+    total = sum(map(len, big.values()))
+    print(f"[BENCH] {len(big)} large {kind} feeds, {total / 1024:.0f} KB")
+
+    def legacy():
+        return [select_entries(feedparser.parse(b).entries, n) for n, b in big.items()]
+
+    def fast_full():
+        return [select_entries(iter_feed(b, n), n) for n, b in big.items()]
+
+    def fast_daily():
+        return [select_entries(iter_feed(b, n), n, None, window, MAX_ITEMS_PER_FEED) for n, b in big.items()]
+
+    def measure(fn):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return best, peak
+
+    base_time, base_peak = measure(legacy)
+    print(f"[BENCH] feedparser:   {base_time * 1000:8.1f} ms, peak {base_peak / 1e6:6.1f} MB")
+    for label, fn in (("fast (full)", fast_full), ("fast (DAILY)", fast_daily)):
+        t, peak = measure(fn)
+        print(f"[BENCH] {label:<13} {t * 1000:8.1f} ms, peak {peak / 1e6:6.1f} MB "
+              f"({base_time / t:.1f}x faster, {base_peak / max(peak, 1):.1f}x less memory)")
+
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        wait([pool.submit(_warm) for _ in range(workers)])
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            wait([pool.submit(scan_feed, b, {}, n) for n, b in big.items()])
+            best = min(best, time.perf_counter() - t0)
+    finally:
+        pool.shutdown()
+    print(f"[BENCH] pool x{workers}:     {best * 1000:8.1f} ms ({os.cpu_count()} CPUs, results pickled back)")
+
+
+if __name__ == "__main__":
+    test_feedscan()
+    benchmark_parse()
@@ -0,0 +1,373 @@
+import os, time, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+# 동시에 진행할 최대 다운로드 수
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+
+# 같은 호스트에 동시에 보낼 최대 요청 수 (raw.githubusercontent.com 등 공용 호스트 보호)
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "2"))
+
+# 피드 하나의 다운로드 제한 시간 (초) - 연결부터 본문 수신 완료까지
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "20"))
+
+# fetch 단계 전체에 허용하는 최대 시간 (초)
+FETCH_BUDGET = float(os.getenv("FETCH_BUDGET", "60"))
+
+# feedparser가 직접 요청할 때와 같은 User-Agent를 사용한다
+USER_AGENT = os.getenv("FETCH_USER_AGENT", "feedparser/6.0.11 +https://github.com/kurtmckee/feedparser/")
+
+_CHUNK = 64 * 1024
+
+
+class FeedFetcher:
+    def __init__(self, workers: int = FETCH_WORKERS, per_host: int = FETCH_PER_HOST,
+                 timeout: float = FETCH_TIMEOUT, budget: float = FETCH_BUDGET):
+        """
+        피드 동시 다운로드 엔진
+
+        스레드 풀 + 공유 requests.Session(커넥션 풀)으로 여러 피드를 동시에 받는다.
+        본문 바이트를 모두 받은 뒤에만 feedparser에 넘기도록 다운로드와 파싱을 분리한다.
+
+        Args:
+            workers: 동시 다운로드 수
+            per_host: 호스트당 동시 요청 수
+            timeout: 피드당 제한 시간 (초)
+            budget: 전체 제한 시간 (초)
+        """
+        self.workers = max(1, workers)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.budget = budget
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "application/rss+xml, application/atom+xml, application/xml;q=0.9, */*;q=0.8",
+        })
+
+        self._host_locks = {}
+        self._host_locks_guard = threading.Lock()
+
+        # 예산을 넘겨 결과를 기다리지 않고 남겨 둔 다운로드 (close가 끝나기를 기다린다)
+        self._running = set()
+        self._running_guard = threading.Lock()
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        with self._host_locks_guard:
+            sem = self._host_locks.get(host)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.per_host)
+                self._host_locks[host] = sem
+            return sem
+
+    def _download(self, feed, deadline, validator=None):
+        """
+        피드 하나를 다운로드한다. 예외는 결과의 error 필드로 전달한다.
+
+        validator(이전 실행의 ETag/Last-Modified/본문 해시)가 있으면 조건부 요청을 보내고,
+        304 응답이면 not_modified, 본문 해시가 같으면 unchanged를 True로 표시한다.
+        """
+        url = feed["url"]
+        result = {
+            "feed": feed,
+            "status": None,
+            "headers": {},
+            "content": None,
+            "error": None,
+            "elapsed": 0.0,
+            "not_modified": False,
+            "unchanged": False,
+            "hash": None,
+        }
+        headers = {}
+        if validator:
+            if validator.get("etag"):
+                headers["If-None-Match"] = validator["etag"]
+            if validator.get("last_modified"):
+                headers["If-Modified-Since"] = validator["last_modified"]
+        started = time.monotonic()
+        sem = self._host_semaphore(url)
+        try:
+            # 호스트 슬롯 대기도 전체 예산 안에서만 허용
+            if not sem.acquire(timeout=max(0.0, deadline - started)):
+                raise TimeoutError("fetch budget exhausted while waiting for host slot")
+            try:
+                feed_deadline = min(time.monotonic() + self.timeout, deadline)
+                remaining = max(0.1, feed_deadline - time.monotonic())
+                with self.session.get(url, headers=headers, timeout=remaining, stream=True) as resp:
+                    result["status"] = resp.status_code
+                    # feedparser는 소문자 헤더 이름을 기대한다
+                    result["headers"] = {k.lower(): v for k, v in resp.headers.items()}
+                    resp.raise_for_status()
+                    if resp.status_code == 304:
+                        result["not_modified"] = True
+                        result["elapsed"] = time.monotonic() - started
+                        return result
+
+                    # requests의 timeout은 읽기 간격 기준이므로 전체 수신 시간은 직접 제한
+                    chunks = []
+                    for chunk in resp.iter_content(_CHUNK):
+                        chunks.append(chunk)
+                        if time.monotonic() > feed_deadline:
+                            raise TimeoutError(f"download exceeded {self.timeout:.0f}s")
+                    result["content"] = b"".join(chunks)
+                    result["hash"] = hashlib.sha256(result["content"]).hexdigest()[:16]
+                    result["unchanged"] = bool(validator) and validator.get("hash") == result["hash"]
+            finally:
+                sem.release()
+        except Exception as ex:
+            result["error"] = str(ex) or ex.__class__.__name__
+        result["elapsed"] = time.monotonic() - started
+        return result
+
+    def iter_fetch(self, feeds, validators=None):
+        """
+        피드를 동시에 다운로드하고 완료되는 순서대로 결과를 yield 한다.
+        전체 예산을 넘기면 남은 피드는 error 결과로 돌려준다.
+
+        Args:
+            feeds: feeds.yaml의 피드 목록
+            validators: {url: {"etag", "last_modified", "hash", "length"}} 조건부 요청용 캐시
+        """
+        for _, result in self._iter_indexed(feeds, validators):
+            yield result
+
+    def _iter_indexed(self, feeds, validators=None):
+        """(feeds 안의 위치, 결과)를 완료 순서대로 - 같은 URL의 피드가 여럿이어도 구분된다"""
+        validators = validators or {}
+        deadline = time.monotonic() + self.budget
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fetch")
+        pending = {}
+        try:
+            pending = {
+                executor.submit(self._download, f, deadline, validators.get(f["url"])): i
+                for i, f in enumerate(feeds)
+            }
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield pending.pop(fut), fut.result()
+
+            for fut, i in list(pending.items()):
+                if fut.cancel():
+                    pending.pop(fut)
+                yield i, {
+                    "feed": feeds[i],
+                    "status": None,
+                    "headers": {},
+                    "content": None,
+                    "error": f"fetch budget ({self.budget:.0f}s) exceeded",
+                    "elapsed": self.budget,
+                    "not_modified": False,
+                    "unchanged": False,
+                    "hash": None,
+                }
+        finally:
+            # 실행 중인 다운로드는 피드별 timeout 안에 스스로 끝난다 - 세션을 닫기 전에 close가 기다린다
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._track(fut for fut in pending if not fut.done())
+
+    def _track(self, futures):
+        for fut in futures:
+            with self._running_guard:
+                self._running.add(fut)
+            # 이미 끝났으면 바로 불린다
+            fut.add_done_callback(self._untrack)
+
+    def _untrack(self, fut):
+        with self._running_guard:
+            self._running.discard(fut)
+
+    def fetch(self, feeds, validators=None):
+        """모든 피드를 다운로드하고 입력 순서대로 결과 리스트를 반환한다."""
+        results = [None] * len(feeds)
+        for i, r in self._iter_indexed(feeds, validators):
+            results[i] = r
+        return results
+
+    def close(self):
+        # 남은 다운로드가 닫힌 세션을 쓰지 않도록 끝나기를 기다린다 (피드별 timeout 안에 끝난다)
+        with self._running_guard:
+            running = list(self._running)
+        wait(running)
+        self.session.close()
+
+
+def validator_from(result, previous=None):
+    """다운로드 결과에서 다음 실행에 보낼 검증자를 만든다 (304면 기존 값 유지)."""
+    previous = dict(previous or {})
+    headers = result["headers"]
+    if headers.get("etag"):
+        previous["etag"] = headers["etag"]
+    if headers.get("last-modified"):
+        previous["last_modified"] = headers["last-modified"]
+    if result["content"] is not None:
+        previous["hash"] = result["hash"]
+        previous["length"] = len(result["content"])
+    return previous
+
+
+def benchmark_fetcher(n_feeds: int = 20, latency: float = 0.3):
+    """
+    로컬 HTTP 서버로 지연이 있는 피드를 흉내 내어
+    순차 다운로드(기존 방식)와 동시 다운로드의 전체 시간을 비교한다.
+    """
+    import random
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    rng = random.Random(42)
+    latencies = {f"/feed/{i}.xml": latency * (0.5 + rng.random()) for i in range(n_feeds)}
+    body = (
+        '<?xml version="1.0"?><rss version="2.0"><channel><title>bench</title>'
+        + "".join(
+            f"<item><title>Item {i}</title><link>https://example.com/{i}</link>"
+            f"<pubDate>Mon, 06 Jan 2025 0{i % 10}:00:00 GMT</pubDate></item>"
+            for i in range(30)
+        )
+        + "</channel></rss>"
+    ).encode("utf-8")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latencies.get(self.path, 0))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/rss+xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    feeds = [{"name": path, "url": base + path} for path in latencies]
+
+    try:
+        # 기존 방식: 한 번에 하나씩
+        t0 = time.monotonic()
+        for f in feeds:
+            requests.get(f["url"], timeout=FETCH_TIMEOUT).content
+        sequential = time.monotonic() - t0
+
+        # 모든 피드가 같은 로컬 호스트이므로 호스트 제한은 피드 수로 둔다
+        fetcher = FeedFetcher(workers=n_feeds, per_host=n_feeds)
+        t0 = time.monotonic()
+        results = fetcher.fetch(feeds)
+        concurrent = time.monotonic() - t0
+        fetcher.close()
+    finally:
+        server.shutdown()
+
+    failed = sum(1 for r in results if r["error"])
+    print(f"[BENCH] feeds={n_feeds}, sum(latency)={sum(latencies.values()):.2f}s, max(latency)={max(latencies.values()):.2f}s")
+    print(f"[BENCH] sequential: {sequential:.2f}s")
+    print(f"[BENCH] concurrent: {concurrent:.2f}s ({sequential / concurrent:.1f}x, failed={failed})")
+
+
+def test_conditional_get():
+    """304를 돌려주는 로컬 서버로 조건부 요청과 본문 해시 비교를 확인한다."""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    body = b'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title></channel></rss>'
+    hits = {"200": 0, "304": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/etag" and self.headers.get("If-None-Match") == '"v1"':
+                hits["304"] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            hits["200"] += 1
+            self.send_response(200)
+            if self.path == "/etag":
+                self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    feeds = [{"name": "etag", "url": base + "/etag"}, {"name": "plain", "url": base + "/plain"}]
+
+    fetcher = FeedFetcher(workers=2, per_host=2)
+    try:
+        first = fetcher.fetch(feeds, {})
+        validators = {r["feed"]["url"]: validator_from(r) for r in first}
+        assert not any(r["not_modified"] or r["unchanged"] for r in first)
+
+        second = fetcher.fetch(feeds, validators)
+        assert second[0]["not_modified"] and second[0]["content"] is None
+        assert second[1]["unchanged"] and not second[1]["not_modified"]
+        assert hits == {"200": 3, "304": 1}, hits
+    finally:
+        fetcher.close()
+        server.shutdown()
+    print("[TEST] conditional GET: OK (304 skipped, identical body detected)")
+
+
+def test_same_url_and_close():
+    """URL이 같은 피드도 각자 결과를 받고, 예산을 넘겨 남은 다운로드는 close가 끝나기를 기다린다."""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    body = b'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title></channel></rss>'
+    finished = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    feeds = [{"name": "a", "url": base + "/same"}, {"name": "b", "url": base + "/same"},
+             {"name": "slow", "url": base + "/slow"}]
+
+    class SlowFetcher(FeedFetcher):
+        # 다운로드 뒤 일이 남은 작업자 (예산이 끝난 뒤에도 세션을 쓰는 중인 다운로드)
+        def _download(self, feed, deadline, validator=None):
+            result = super()._download(feed, deadline, validator)
+            if feed["name"] == "slow":
+                time.sleep(0.5)
+                finished.append(feed["name"])
+            return result
+
+    fetcher = SlowFetcher(workers=3, per_host=3, budget=0.2)
+    try:
+        results = fetcher.fetch(feeds)
+        assert [r["feed"]["name"] for r in results] == ["a", "b", "slow"]
+        assert results[0]["content"] == results[1]["content"] == body
+        assert "budget" in results[2]["error"]
+        fetcher.close()
+        assert not fetcher._running and finished == ["slow"], finished
+    finally:
+        server.shutdown()
+    print("[TEST] same URL twice: OK, close waited for the download left over the budget")
+
+
+if __name__ == "__main__":
+    test_conditional_get()
+    test_same_url_and_close()
+    benchmark_fetcher()
@@ -1,57 +1,191 @@
-import os, re, time
-import google.generativeai as genai
+import os, re, json, time, threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
+from ratelimit import TokenBucket, backoff_delay
+from summary_cache import SummaryCache
+from textnorm import clean_html
+from newsitem import NewsItem
+import metrics
+
+# 동시에 진행할 Gemini 요청 수
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "4"))
+
+# 분당 요청 수 / 분당 토큰 수 한도 (무료 티어 기준: 분당 15회)
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "15"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+
+# 429/5xx 응답 시 재시도 횟수
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+
+# 여러 항목을 한 번의 요청으로 묶어 처리 (JSON 응답)
+GEMINI_PACK = os.getenv("GEMINI_PACK", "true").lower() == "true"
+
+# 묶음 하나의 토큰 예산 (입력 + 예상 출력)과 최대 항목 수
+GEMINI_PACK_TOKENS = int(os.getenv("GEMINI_PACK_TOKENS", "6000"))
+GEMINI_PACK_MAX_ITEMS = int(os.getenv("GEMINI_PACK_MAX_ITEMS", "15"))
+
+_RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+# 선택한 모델을 기억해 두는 파일과 유효 기간 (시간) - 기간 안에는 list_models()를 호출하지 않는다
+MODEL_CACHE_PATH = os.path.join("data", "gemini-model.json")
+GEMINI_MODEL_TTL_HOURS = float(os.getenv("GEMINI_MODEL_TTL_HOURS", "24"))
+
+MODEL_CANDIDATES = [
+    'gemini-1.5-flash-latest',
+    'gemini-1.5-flash',
+    'gemini-pro',
+    'gemini-1.0-pro'
+]
+
+def _genai():
+    """google.generativeai는 무거우므로 실제로 요약할 때만 import 한다"""
+    import google.generativeai as genai
+    return genai
+
+def _load_model_cache() -> Optional[Dict]:
+    if not os.path.exists(MODEL_CACHE_PATH):
+        return None
+    try:
+        with open(MODEL_CACHE_PATH, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"[WARN] Failed to load model cache {MODEL_CACHE_PATH}: {e}")
+        return None
+    if time.time() - cached.get("t", 0) > GEMINI_MODEL_TTL_HOURS * 3600:
+        return None
+    if "generateContent" not in cached.get("methods", []):
+        return None
+    return cached
+
+def _save_model_cache(model: str, methods: List[str]):
+    os.makedirs(os.path.dirname(MODEL_CACHE_PATH), exist_ok=True)
+    with open(MODEL_CACHE_PATH, "w", encoding="utf-8") as f:
+        json.dump({"model": model, "methods": methods, "t": time.time()}, f, ensure_ascii=False, indent=2)
+
+SUMMARY_PROMPT = """다음 AI 뉴스의 초록을 한국어로 간단히 요약해주세요 (2-3문장):
+
+제목: {title}
+초록: {summary}
+
+요약:"""
+
+TRANSLATE_PROMPT = """다음 AI 뉴스 제목을 자연스러운 한국어로 번역해주세요:
+
+{title}
 
-# RSS 초록의 최대 길이 (Gemini 프롬프트 크기 절약)
-MAX_SUMMARY_LENGTH = 1500
+번역:"""
+
+PACKED_PROMPT = """다음은 AI 뉴스 목록(JSON 배열)입니다. 각 항목을 처리해주세요:
+- "abstract"가 있으면 초록을 한국어로 간단히 요약 (2-3문장)
+- "abstract"가 없으면 "title"을 자연스러운 한국어로 번역
+
+입력의 모든 id에 대해 [{{"id": <id>, "ko": "<요약 또는 번역>"}}] 형식의 JSON 배열로만 답하세요.
+설명이나 코드 블록 없이 JSON만 출력합니다.
+
+입력:
+{items}"""
+
+# 요약 한 건의 예상 출력 토큰 (한국어 2-3문장)
+_OUTPUT_TOKENS_PER_ITEM = 150
+
+def _status_code(e) -> Optional[int]:
+    """google.api_core 예외의 HTTP 상태 코드 (없으면 메시지 앞부분에서 추정)"""
+    code = getattr(e, "code", None)
+    if isinstance(code, int):
+        return code
+    m = re.match(r"\s*(\d{3})\b", str(e))
+    return int(m.group(1)) if m else None
+
+def _estimate_tokens(prompt: str) -> int:
+    # 대략 4자당 1토큰 + 응답 여유분
+    return len(prompt) // 4 + 200
 
 class GeminiSummarizer:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, model=None,
+                 cache: Optional[SummaryCache] = None):
         """
         Gemini API를 사용한 뉴스 요약/번역기
 
         Args:
             api_key: Gemini API 키 (없으면 환경변수 GEMINI_API_KEY 사용)
+            model: generate_content를 가진 모델 객체 (테스트용 - 주면 모델 탐색을 건너뜀)
+            cache: 요약 결과 캐시 (없으면 캐시하지 않음)
         """
+        self.bucket = TokenBucket(GEMINI_RPM, GEMINI_TPM)
+        self.backoff_base = 1.0
+        self.cache = cache
+        self.model_from_cache = False
+        self._model_lock = threading.Lock()
+
+        if model is not None:
+            self.model = model
+            self.model_name = getattr(model, "model_name", model.__class__.__name__)
+            return
+
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY가 설정되지 않았습니다")
 
-        genai.configure(api_key=self.api_key)
+        self._genai = _genai()
+        self._genai.configure(api_key=self.api_key)
 
-        # 사용 가능한 모델 리스트 확인 및 선택
         try:
-            model_candidates = [
-                'gemini-1.5-flash-latest',
-                'gemini-1.5-flash',
-                'gemini-pro',
-                'gemini-1.0-pro'
-            ]
-
-            available_models = [m.name for m in genai.list_models()]
-            print(f"[DEBUG] Available models: {available_models[:5]}...")
-
-            selected_model = None
-            for candidate in model_candidates:
-                if f'models/{candidate}' in available_models or candidate in available_models:
-                    selected_model = candidate
-                    break
+            cached = _load_model_cache()
+            if cached:
+                self.model_from_cache = True
+                self._use_model(cached["model"])
+                print(f"[INFO] Using Gemini model: {self.model_name} (cached)")
+            else:
+                self._rediscover()
+        except Exception as e:
+            print(f"[ERROR] 모델 초기화 오류: {e}")
+            raise
 
-            if not selected_model:
-                for model_info in genai.list_models():
-                    if 'generateContent' in model_info.supported_generation_methods:
-                        selected_model = model_info.name.replace('models/', '')
-                        break
+    def _use_model(self, name: str):
+        self.model = self._genai.GenerativeModel(name)
+        self.model_name = name
 
-            if not selected_model:
-                raise ValueError("사용 가능한 Gemini 모델을 찾을 수 없습니다")
+    def _rediscover(self):
+        """list_models()를 한 번만 호출해 모델을 고르고 결과를 기억해 둔다."""
+        self.model_from_cache = False
+        models = {
+            m.name.replace('models/', ''): list(m.supported_generation_methods)
+            for m in self._genai.list_models()
+        }
+        print(f"[DEBUG] Available models: {list(models)[:5]}...")
+
+        selected_model = None
+        for candidate in MODEL_CANDIDATES:
+            if candidate in models:
+                selected_model = candidate
+                break
+
+        if not selected_model:
+            for name, methods in models.items():
+                if 'generateContent' in methods:
+                    selected_model = name
+                    break
 
-            print(f"[INFO] Using Gemini model: {selected_model}")
-            self.model = genai.GenerativeModel(selected_model)
+        if not selected_model:
+            raise ValueError("사용 가능한 Gemini 모델을 찾을 수 없습니다")
 
-        except Exception as e:
-            print(f"[ERROR] 모델 초기화 오류: {e}")
-            raise
+        print(f"[INFO] Using Gemini model: {selected_model}")
+        self._use_model(selected_model)
+        _save_model_cache(selected_model, models[selected_model])
+
+    def _refresh_stale_model(self, failed_name: str) -> bool:
+        """
+        기억해 둔 모델이 404(not found)로 실패하면 한 번만 다시 탐색한다.
+        다른 스레드가 이미 바꿨으면 그 모델을 그대로 쓴다.
+        """
+        with self._model_lock:
+            if self.model_name != failed_name:
+                return True
+            if not self.model_from_cache:
+                return False
+            print(f"[WARN] Cached Gemini model '{failed_name}' not found - rediscovering")
+            self._rediscover()
+            return True
 
     @staticmethod
     def _clean_html(text: str) -> str:
@@ -59,37 +193,11 @@ class GeminiSummarizer:
         RSS 초록에서 HTML 태그를 제거한다.
         많은 피드(특히 VentureBeat, MIT Tech Review 등)가
         <p>, <a>, <img>, <span> 등의 HTML을 초록에 포함시킨다.
+        (textnorm.clean_html 참고)
         """
-        if not text:
-            return ""
-
-        # HTML 태그 제거
-        text = re.sub(r'<[^>]+>', ' ', text)
-
-        # HTML 엔티티 복원
-        html_entities = {
-            '&amp;': '&',
-            '&lt;': '<',
-            '&gt;': '>',
-            '&quot;': '"',
-            '&#39;': "'",
-            '&apos;': "'",
-            '&nbsp;': ' ',
-            '&#8217;': '\u2019',  # 오른쪽 작은따옴표
-            '&#8216;': '\u2018',  # 왼쪽 작은따옴표
-            '&#8220;': '\u201c',  # 왼쪽 큰따옴표
-            '&#8221;': '\u201d',  # 오른쪽 큰따옴표
-            '&#8230;': '…',      # 줄임표
-        }
-        for entity, char in html_entities.items():
-            text = text.replace(entity, char)
+        return clean_html(text)
 
-        # 중복 공백 정리
-        text = re.sub(r'\s+', ' ', text).strip()
-
-        return text
-
-    def summarize_item(self, item: Dict) -> Dict:
+    def summarize_item(self, item: NewsItem) -> NewsItem:
         """
         단일 뉴스 아이템 처리
         - 초록이 있으면 한국어로 요약
@@ -101,67 +209,237 @@ class GeminiSummarizer:
         Returns:
             원본 아이템 + 'summary_ko' 필드 추가된 딕셔너리
         """
-        title = item.get('title', '')
-        # HTML 정리 후 길이 제한
-        summary = self._clean_html(item.get('summary', ''))
-        if len(summary) > MAX_SUMMARY_LENGTH:
-            summary = summary[:MAX_SUMMARY_LENGTH] + "..."
-            print(f"[INFO] Summary truncated for: {title[:40]}...")
+        if self._from_cache(item):
+            return item
+        return self._summarize_uncached(item)
+
+    def _summarize_uncached(self, item: NewsItem) -> NewsItem:
+        title, summary = self._prepare(item, verbose=True)
 
         try:
             if summary:
-                prompt = f"""다음 AI 뉴스의 초록을 한국어로 간단히 요약해주세요 (2-3문장):
-
-제목: {title}
-초록: {summary}
-
-요약:"""
+                prompt = SUMMARY_PROMPT.format(title=title, summary=summary)
             else:
-                prompt = f"""다음 AI 뉴스 제목을 자연스러운 한국어로 번역해주세요:
+                prompt = TRANSLATE_PROMPT.format(title=title)
 
-{title}
+            summary_ko = self._generate(prompt, kind="single")
 
-번역:"""
-
-            response = self.model.generate_content(prompt)
-            summary_ko = response.text.strip()
-
-            item['summary_ko'] = summary_ko
-            item['has_summary'] = bool(summary)
+            item.summary_ko = summary_ko
+            item.has_summary = bool(summary)
+            self._to_cache(item)
 
             print(f"[INFO] Processed: {title[:50]}...")
 
         except Exception as e:
             print(f"[ERROR] Gemini API 오류: {e}")
             # 실패시 원본 제목 사용
-            item['summary_ko'] = title
-            item['has_summary'] = False
+            item.summary_ko = title
+            item.has_summary = False
 
         return item
 
-    def batch_summarize(self, items: List[Dict], delay: float = 1.0) -> List[Dict]:
+    def _cache_key(self, item: NewsItem) -> str:
+        title, summary = self._prepare(item)
+        template = SUMMARY_PROMPT if summary else TRANSLATE_PROMPT
+        return SummaryCache.key(self.model_name, template, title, summary)
+
+    def _from_cache(self, item: NewsItem) -> bool:
+        """캐시에 있으면 summary_ko/has_summary를 채우고 True"""
+        if self.cache is None:
+            return False
+        hit = self.cache.get(self._cache_key(item))
+        if hit is None:
+            return False
+        item.summary_ko, item.has_summary = hit
+        return True
+
+    def _to_cache(self, item: NewsItem):
+        if self.cache is not None:
+            self.cache.put(self._cache_key(item), item.summary_ko, item.has_summary)
+
+    def _prepare(self, item: NewsItem, verbose: bool = False):
+        """프롬프트에 넣을 (제목, HTML 정리 후 길이 제한한 초록)"""
+        title = item.title
+        # 처음 읽을 때 정리하면서 MAX_SUMMARY_LENGTH를 넘는 순간 멈춘다 (NewsItem.summary)
+        summary = item.summary
+        if item.summary_truncated:
+            summary += "..."
+            if verbose:
+                print(f"[INFO] Summary truncated for: {title[:40]}...")
+        return title, summary
+
+    def _pack_groups(self, items: List[NewsItem]) -> List[List[NewsItem]]:
         """
-        여러 뉴스 아이템 일괄 처리
+        입력 순서를 유지하며 토큰 예산(GEMINI_PACK_TOKENS) 안에 들어가도록 항목을 묶는다.
+        """
+        groups, current, used = [], [], _estimate_tokens(PACKED_PROMPT)
+        for item in items:
+            title, summary = self._prepare(item)
+            cost = (len(title) + len(summary)) // 4 + _OUTPUT_TOKENS_PER_ITEM
+            if current and (used + cost > GEMINI_PACK_TOKENS or len(current) >= GEMINI_PACK_MAX_ITEMS):
+                groups.append(current)
+                current, used = [], _estimate_tokens(PACKED_PROMPT)
+            current.append(item)
+            used += cost
+        if current:
+            groups.append(current)
+        return groups
+
+    @staticmethod
+    def _parse_packed(text: str) -> Dict[int, str]:
+        """묶음 응답(JSON 배열)을 {id: 결과}로 변환한다. 코드 블록/앞뒤 설명은 무시한다."""
+        start, end = text.find("["), text.rfind("]")
+        if start < 0 or end < start:
+            raise ValueError("JSON 배열을 찾을 수 없습니다")
+        results = {}
+        for entry in json.loads(text[start:end + 1]):
+            if not isinstance(entry, dict):
+                continue
+            ko = entry.get("ko")
+            try:
+                key = int(entry.get("id"))
+            except (TypeError, ValueError):
+                continue
+            if isinstance(ko, str) and ko.strip():
+                results[key] = ko.strip()
+        return results
+
+    def summarize_group(self, items: List[NewsItem]) -> List[NewsItem]:
+        """
+        여러 아이템을 한 번의 요청(JSON 응답)으로 요약/번역한다.
+        응답이 깨졌거나 빠진 항목만 반으로 나눠 다시 요청하고, 한 건만 남으면 summarize_item으로 처리한다.
+        API/전송 오류(재시도를 다 쓴 429, 인증 오류 등)는 나눠도 같은 오류이므로 나누지 않고
+        묶음 전체를 원본 제목으로 둔다 (summarize_item의 실패 처리와 같다).
 
         Args:
             items: 뉴스 아이템 리스트
-            delay: API 호출 간 대기 시간 (초)
 
         Returns:
-            처리된 아이템 리스트
+            'summary_ko', 'has_summary' 필드가 추가된 아이템 리스트 (입력 순서 유지)
         """
-        processed_items = []
+        self._summarize_group([item for item in items if not self._from_cache(item)])
+        return items
+
+    def _summarize_group(self, items: List[NewsItem]):
+        if not items:
+            return
+        if len(items) == 1:
+            self._summarize_uncached(items[0])
+            return
+
+        payload = []
+        for i, item in enumerate(items):
+            title, summary = self._prepare(item)
+            entry = {"id": i, "title": title}
+            if summary:
+                entry["abstract"] = summary
+            payload.append(entry)
+
+        prompt = PACKED_PROMPT.format(items=json.dumps(payload, ensure_ascii=False, indent=0))
+        try:
+            text = self._generate(prompt, kind="packed", items=len(items))
+        except Exception as e:
+            print(f"[ERROR] Gemini API 오류 ({len(items)}건 묶음): {e}")
+            # 실패시 원본 제목 사용
+            for item in items:
+                item.summary_ko = item.title
+                item.has_summary = False
+            return
 
-        for i, item in enumerate(items, 1):
-            print(f"[INFO] Processing {i}/{len(items)}...")
-            processed = self.summarize_item(item)
-            processed_items.append(processed)
+        try:
+            results = self._parse_packed(text)
+        except (ValueError, TypeError) as e:
+            print(f"[WARN] Malformed packed response ({len(items)} items): {e}")
+            results = {}
+        failed = []
+        for i, item in enumerate(items):
+            if i in results:
+                item.summary_ko = results[i]
+                item.has_summary = "abstract" in payload[i]
+                self._to_cache(item)
+            else:
+                failed.append(item)
+        if results:
+            print(f"[INFO] Processed group of {len(items)} ({len(failed)} to retry)")
+
+        if failed:
+            mid = (len(failed) + 1) // 2
+            self._summarize_group(failed[:mid])
+            self._summarize_group(failed[mid:])
 
-            # API rate limit 방지
-            if i < len(items):
-                time.sleep(delay)
+    def _generate(self, prompt: str, kind: str = "single", items: int = 1) -> str:
+        """
+        토큰 버킷으로 속도를 맞춰 generate_content를 호출한다.
+        429/5xx는 지수 백오프(+jitter)로 재시도하고, 429면 버킷을 비워 다른 요청도 늦춘다.
+        요청마다 gemini_call span(kind: single | packed)을, 버킷 대기는 gemini_wait로 기록한다.
+        """
+        tokens = _estimate_tokens(prompt)
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            with metrics.span("gemini_wait", event=False, kind=kind):
+                self.bucket.acquire(tokens)
+            model_name = self.model_name
+            try:
+                with metrics.span("gemini_call", kind=kind) as attrs:
+                    attrs.update(items=items, tokens=tokens, attempt=attempt)
+                    response = self.model.generate_content(prompt)
+                metrics.count("gemini_calls", kind=kind)
+                metrics.count("gemini_items", items, kind=kind)
+                return response.text.strip()
+            except Exception as e:
+                code = _status_code(e)
+                metrics.count("gemini_errors", code=code)
+                if code == 404 and attempt < GEMINI_MAX_RETRIES and self._refresh_stale_model(model_name):
+                    continue
+                if code not in _RETRYABLE_CODES or attempt == GEMINI_MAX_RETRIES:
+                    raise
+                if code == 429:
+                    self.bucket.drain()
+                metrics.count("gemini_retries")
+                wait = backoff_delay(attempt, base=self.backoff_base)
+                print(f"[WARN] Gemini {code} - retry {attempt + 1}/{GEMINI_MAX_RETRIES} in {wait:.1f}s")
+                time.sleep(wait)
+
+    def batch_summarize(self, items: List[NewsItem], delay: Optional[float] = None,
+                        concurrency: Optional[int] = None, packed: Optional[bool] = None) -> List[NewsItem]:
+        """
+        여러 뉴스 아이템 일괄 처리
+        여러 요청을 동시에 보내되 속도는 토큰 버킷(GEMINI_RPM / GEMINI_TPM)으로 제한한다.
+        묶음 모드에서는 토큰 예산만큼 항목을 묶어 한 번에 요청한다.
+
+        Args:
+            items: 뉴스 아이템 리스트
+            delay: API 호출 간 최소 간격 (초) - 주면 분당 요청 한도를 60/delay 이하로 낮춘다
+            concurrency: 동시 요청 수 (기본 GEMINI_CONCURRENCY)
+            packed: 묶음 모드 사용 여부 (기본 GEMINI_PACK)
 
-        return processed_items
+        Returns:
+            처리된 아이템 리스트 (입력 순서 유지)
+        """
+        if delay:
+            self.bucket.rpm = min(self.bucket.rpm, 60.0 / delay)
+
+        # 캐시에 있는 항목은 요청하지 않는다
+        misses = [item for item in items if not self._from_cache(item)]
+        if self.cache is not None:
+            print(f"[INFO] Summary cache: {len(items) - len(misses)} hits, {len(misses)} misses")
+            metrics.count("summary_cache_hits", len(items) - len(misses))
+            metrics.count("summary_cache_misses", len(misses))
+
+        if GEMINI_PACK if packed is None else packed:
+            units, run = self._pack_groups(misses), self._summarize_group
+        else:
+            units, run = misses, self._summarize_uncached
+
+        workers = max(1, min(concurrency or GEMINI_CONCURRENCY, len(units) or 1))
+        print(f"[INFO] Processing {len(misses)} items in {len(units)} requests "
+              f"({workers} concurrent, {self.bucket.rpm:.0f} req/min)")
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gemini") as executor:
+                list(executor.map(run, units))
+        finally:
+            if self.cache is not None:
+                self.cache.save()
+        return items
 
 
 def test_summarizer():
@@ -178,28 +456,267 @@ def test_summarizer():
         summarizer = GeminiSummarizer()
 
         test_items = [
-            {
-                'title': 'OpenAI Announces GPT-5 with Advanced Reasoning',
-                'summary': '<p>OpenAI today unveiled <strong>GPT-5</strong>, featuring enhanced reasoning capabilities and multimodal understanding.</p><p>The new model shows significant improvements in complex problem-solving tasks.</p>',
-                'link': 'https://example.com/gpt5'
-            },
-            {
-                'title': 'Google DeepMind Releases New AlphaFold Version',
-                'summary': '',  # 초록 없음
-                'link': 'https://example.com/alphafold'
-            }
+            NewsItem(
+                'test',
+                title='OpenAI Announces GPT-5 with Advanced Reasoning',
+                summary='<p>OpenAI today unveiled <strong>GPT-5</strong>, featuring enhanced reasoning capabilities and multimodal understanding.</p><p>The new model shows significant improvements in complex problem-solving tasks.</p>',
+                link='https://example.com/gpt5'
+            ),
+            NewsItem(
+                'test',
+                title='Google DeepMind Releases New AlphaFold Version',
+                summary='',  # 초록 없음
+                link='https://example.com/alphafold'
+            )
         ]
 
         results = summarizer.batch_summarize(test_items)
 
         print("\n=== 결과 ===")
         for item in results:
-            print(f"\n제목: {item['title']}")
-            print(f"요약/번역: {item['summary_ko']}")
-            print(f"초록 존재: {item['has_summary']}")
+            print(f"\n제목: {item.title}")
+            print(f"요약/번역: {item.summary_ko}")
+            print(f"초록 존재: {item.has_summary}")
     except Exception as e:
         print(f"[ERROR] 테스트 실패: {e}")
 
 
+class _FakeModel:
+    """
+    지연과 429 오류, 깨진 묶음 응답을 결정적으로 흉내 내는 generate_content 대역
+    """
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.1, malformed_every: int = 0):
+        self.latency = latency
+        self.error_every = round(1 / error_rate) if error_rate else 0
+        self.malformed_every = malformed_every
+        self.calls = 0
+        self.packed_calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.calls += 1
+            fail = bool(self.error_every) and self.calls % self.error_every == 0
+            packed = "\n입력:\n" in prompt
+            if packed:
+                self.packed_calls += 1
+            malformed = packed and bool(self.malformed_every) and self.packed_calls % self.malformed_every == 0
+        time.sleep(self.latency)
+        if fail:
+            err = RuntimeError("429 Resource has been exhausted")
+            err.code = 429
+            raise err
+
+        class _Response:
+            pass
+        response = _Response()
+        if packed:
+            entries = json.loads(prompt.split("\n입력:\n", 1)[1])
+            out = [{"id": e["id"], "ko": "요약: " + e["title"]} for e in entries]
+            # 깨진 응답: 마지막 항목을 빠뜨리고 JSON 끝을 잘라낸다
+            text = "```json\n" + json.dumps(out, ensure_ascii=False) + "\n```"
+            response.text = text[:len(text) // 2] if malformed else text
+        else:
+            response.text = "요약: " + prompt.splitlines()[2][:40]
+        return response
+
+
+def test_scheduler(n_items: int = 20, latency: float = 0.1, delay: float = 0.2):
+    """
+    가짜 모델로 동시 스케줄러의 순서 보존, 429 재시도와
+    기존 순차 루프(요청 + 고정 delay) 대비 처리량을 확인한다.
+    """
+    def make_items():
+        return [NewsItem("test", f"Title {i}", f"https://e.com/{i}", summary=f"Abstract {i}")
+                for i in range(n_items)]
+
+    # 기존 방식: 한 건씩 처리하고 delay만큼 쉰다
+    legacy = GeminiSummarizer(model=_FakeModel(latency, error_rate=0.0))
+    legacy.bucket = TokenBucket(requests_per_min=1e9)
+    t0 = time.perf_counter()
+    for i, item in enumerate(make_items(), 1):
+        legacy.summarize_item(item)
+        if i < n_items:
+            time.sleep(delay)
+    legacy_t = time.perf_counter() - t0
+
+    fake = _FakeModel(latency, error_rate=0.2)
+    summarizer = GeminiSummarizer(model=fake)
+    summarizer.bucket = TokenBucket(requests_per_min=600, tokens_per_min=0)
+    summarizer.backoff_base = 0.05
+    t0 = time.perf_counter()
+    results = summarizer.batch_summarize(make_items(), concurrency=8, packed=False)
+    sched_t = time.perf_counter() - t0
+
+    assert [r.link for r in results] == [f"https://e.com/{i}" for i in range(n_items)]
+    assert all(r.summary_ko.startswith("요약") for r in results), "retries should recover from 429"
+    print(f"[TEST] legacy loop: {n_items / legacy_t:.1f} items/s ({legacy_t:.2f}s)")
+    print(f"[TEST] scheduler  : {n_items / sched_t:.1f} items/s ({sched_t:.2f}s, {fake.calls} calls incl. retries)")
+
+
+def test_packing(n_items: int = 80, latency: float = 0.2):
+    """
+    가짜 모델로 묶음 모드의 결과 복원, 깨진 응답의 부분 재시도,
+    단건 모드 대비 API 호출 수와 처리 시간을 확인한다.
+    """
+    def make_items():
+        return [NewsItem("test", f"Title {i}", f"https://e.com/{i}",
+                         summary=f"<p>Abstract {i} " + "x" * 300 + "</p>" if i % 3 else "") for i in range(n_items)]
+
+    timings = {}
+    for packed in (False, True):
+        fake = _FakeModel(latency, error_rate=0.0, malformed_every=3)
+        summarizer = GeminiSummarizer(model=fake)
+        summarizer.bucket = TokenBucket(requests_per_min=1e9)
+        t0 = time.perf_counter()
+        results = summarizer.batch_summarize(make_items(), concurrency=1, packed=packed)
+        timings[packed] = (time.perf_counter() - t0, fake.calls)
+
+        assert [r.link for r in results] == [f"https://e.com/{i}" for i in range(n_items)]
+        for i, r in enumerate(results):
+            assert r.summary_ko.endswith(f"Title {i}"), r
+            assert r.has_summary == bool(i % 3)
+
+    (single_t, single_calls), (packed_t, packed_calls) = timings[False], timings[True]
+    print(f"[TEST] single: {single_calls} calls, {single_t:.2f}s")
+    print(f"[TEST] packed: {packed_calls} calls, {packed_t:.2f}s (every 3rd packed response malformed)")
+
+
+def test_packed_errors(n_items: int = 12):
+    """API 오류는 묶음을 나눠 다시 요청하지 않고, 깨진 응답만 나눠 다시 요청하는지 확인한다."""
+    def make_items():
+        return [NewsItem("test", f"Title {i}", f"https://e.com/{i}", summary=f"Abstract {i}") for i in range(n_items)]
+
+    class _AuthError(RuntimeError):
+        code = 403
+
+    class _Denied(_FakeModel):
+        def generate_content(self, prompt):
+            with self._lock:
+                self.calls += 1
+            raise _AuthError("403 API key not valid")
+
+    for fake, expected in ((_Denied(latency=0.0), 1),                                # 재시도하지 않는 오류
+                           (_FakeModel(latency=0.0, error_rate=1.0), GEMINI_MAX_RETRIES + 1)):  # 429가 계속
+        summarizer = GeminiSummarizer(model=fake)
+        summarizer.bucket = TokenBucket(requests_per_min=1e9)
+        summarizer.backoff_base = 0.001
+        results = summarizer.batch_summarize(make_items(), concurrency=1, packed=True)
+        assert fake.calls == expected, (type(fake).__name__, fake.calls)
+        assert all(r.summary_ko == r.title and not r.has_summary for r in results)
+
+    # 응답이 깨지면 나눠서 모두 복구한다
+    fake = _FakeModel(latency=0.0, error_rate=0.0, malformed_every=1)
+    summarizer = GeminiSummarizer(model=fake)
+    summarizer.bucket = TokenBucket(requests_per_min=1e9)
+    results = summarizer.batch_summarize(make_items(), concurrency=1, packed=True)
+    assert all(r.summary_ko.startswith("요약") and r.summary_ko.endswith(r.title) for r in results)
+    assert fake.calls == 2 * n_items - 1, fake.calls
+    print(f"[TEST] packed errors: API error 1 call, 429 {GEMINI_MAX_RETRIES + 1} calls, "
+          f"malformed responses split ({2 * n_items - 1} calls)")
+
+
+def test_summary_cache():
+    """
+    HOURLY_CHECK 두 번 이후의 DAILY_SUMMARY가 이미 요약한 항목에 대해
+    모델을 한 번도 호출하지 않는지 확인한다.
+    """
+    import tempfile
+
+    def make_items(ids):
+        return [NewsItem("test", f"Title {i}", f"https://e.com/{i}", summary=f"<p>Abstract {i}</p>" if i % 2 else "")
+                for i in ids]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "summary-cache.json")
+        fake = _FakeModel(latency=0.0, error_rate=0.0)
+
+        # 시간별 실행 두 번 (실행마다 캐시를 파일에서 새로 읽는다)
+        for ids in (range(0, 10), range(10, 25)):
+            summarizer = GeminiSummarizer(model=fake, cache=SummaryCache(path))
+            summarizer.bucket = TokenBucket(requests_per_min=1e9)
+            summarizer.batch_summarize(make_items(ids))
+        hourly_calls = fake.calls
+
+        # 다음 날 일일 요약: 같은 항목 전체
+        cache = SummaryCache(path)
+        summarizer = GeminiSummarizer(model=fake, cache=cache)
+        results = summarizer.batch_summarize(make_items(range(25)))
+        assert fake.calls == hourly_calls, "daily run should not call the model"
+        assert cache.hits == 25 and cache.misses == 0
+        assert all(r.summary_ko == "요약: " + r.title for r in results)
+    print(f"[TEST] summary cache: hourly runs {hourly_calls} calls, daily run 0 calls (25 hits)")
+
+
+def test_model_cache():
+    """
+    가짜 genai 모듈로 모델 선택 캐시를 확인한다:
+    첫 실행만 list_models()를 호출하고, 기억한 모델이 404면 한 번 다시 탐색한다.
+    """
+    import tempfile
+    global MODEL_CACHE_PATH, _genai
+
+    class _Info:
+        def __init__(self, name):
+            self.name = f"models/{name}"
+            self.supported_generation_methods = ["generateContent"]
+
+    class _Model:
+        def __init__(self, name):
+            self.name = name
+
+        def generate_content(self, prompt):
+            if self.name in fake.retired:
+                err = RuntimeError(f"404 models/{self.name} is not found")
+                err.code = 404
+                raise err
+
+            class _Response:
+                text = f"{self.name}: ok"
+            return _Response()
+
+    class _FakeGenai:
+        def __init__(self):
+            self.available = ["gemini-1.5-flash", "gemini-pro"]
+            self.retired = set()
+            self.list_calls = 0
+
+        def configure(self, api_key):
+            pass
+
+        def list_models(self):
+            self.list_calls += 1
+            return [_Info(n) for n in self.available if n not in self.retired]
+
+        GenerativeModel = _Model
+
+    fake = _FakeGenai()
+    saved = MODEL_CACHE_PATH, _genai
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            MODEL_CACHE_PATH = os.path.join(tmp, "gemini-model.json")
+            _genai = lambda: fake
+
+            GeminiSummarizer("key")  # 첫 실행: 모델 탐색
+            second = GeminiSummarizer("key")
+            assert fake.list_calls == 1 and second.model_from_cache
+            assert second.model_name == "gemini-1.5-flash"
+
+            fake.retired.add("gemini-1.5-flash")
+            assert second._generate("프롬프트") == "gemini-pro: ok"
+            assert fake.list_calls == 2 and GeminiSummarizer("key").model_name == "gemini-pro"
+        finally:
+            MODEL_CACHE_PATH, _genai = saved
+    print("[TEST] model cache: 1 discovery for 3 startups, rediscovered once after 404")
+
+
 if __name__ == "__main__":
-    test_summarizer()
\ No newline at end of file
+    test_model_cache()
+    if os.getenv("GEMINI_API_KEY"):
+        test_summarizer()
+    else:
+        test_scheduler()
+        test_packing()
+        test_packed_errors()
+        test_summary_cache()
\ No newline at end of file
@@ -0,0 +1,241 @@
+import os, json, time, hashlib, threading
+from typing import Dict, Iterable, Optional
+
+DATA_DIR = "data"
+
+# 실행 journal 사용 여부 (중간에 죽은 실행을 다음 실행이 이어서 한다)
+JOURNAL = os.getenv("JOURNAL", "true").lower() == "true"
+
+
+def journal_path(mode: str) -> str:
+    """모드별 journal 파일 (DAILY와 HOURLY가 서로의 journal을 버리지 않도록)"""
+    return os.path.join(DATA_DIR, f"run-journal-{mode.lower()}.jsonl")
+
+
+def channel_key(webhook: str) -> str:
+    """journal에 Webhook URL(비밀값) 대신 남기는 채널 이름"""
+    return hashlib.sha256(webhook.encode("utf-8")).hexdigest()[:12]
+
+
+class RunJournal:
+    def __init__(self, key: str, path: str):
+        """
+        실행 하나의 write-ahead journal
+
+        단계가 끝낸 단위를 한 줄씩 덧붙인다:
+            {"op": "run", "key": ..., "t": ...}           실행 시작 (모드 + 기간 시작)
+            {"op": "summary", "key", "ko", "has"}         Gemini 요약 하나 (요약 캐시 키)
+            {"op": "sent", "channel", "ids": [...]}       Slack 스풀에 넣은 메시지의 항목 ID
+        실행이 상태 저장까지 끝나고 (finish) 보낸 메시지가 모두 전송되면 (complete) 파일을 지운다.
+        전송이 끝나기 전에 죽으면 스풀이 남은 메시지를 다시 보내고, 남은 journal은 같은 기간의
+        다음 실행이 같은 항목을 다시 보내지 않게 한다 (DAILY_SUMMARY는 seen으로 거르지 않는다).
+
+        같은 key의 journal이 남아 있으면 그 실행을 이어서 한다: 요약은 요약 캐시에 다시 넣어
+        Gemini를 부르지 않고, 채널마다 이미 스풀에 넣은 항목은 다시 보내지 않는다.
+        항목 자체는 적지 않는다 - 이어서 하는 실행은 피드를 다시 받는다 (seen은 전송 뒤에 저장하므로 같은 항목이 다시 나온다).
+        key가 다르면 (다음 날 등) 보낸 기록은 버리고 요약만 캐시로 살린다 (캐시 키는 내용 주소라 안전하다).
+
+        sent는 fsync한다 (중복 전송 방지). summary는 flush만 한다 - 프로세스가 죽어도 남고,
+        머신이 통째로 죽을 때만 마지막 몇 개의 요약을 다시 요청한다.
+        """
+        self.key = key
+        self.path = path
+        self.resumed = False
+        self.summaries: Dict[str, tuple] = {}
+        # 이어받은 실행이 채널마다 보낸 항목 (이 실행이 보내는 것은 파일에만 적는다 - unsent가 거르지 않게)
+        self.sent: Dict[str, set] = {}
+        self.finished = False
+        self._cache = None
+        self._lock = threading.Lock()
+
+        started = None
+        if os.path.exists(path):
+            started, records = self._load()
+            self.resumed = bool(records) and records[0].get("key") == key
+            for rec in records:
+                op = rec.get("op")
+                if op == "summary":
+                    self.summaries[rec["key"]] = (rec["ko"], rec["has"])
+                elif not self.resumed:
+                    continue
+                elif op == "sent":
+                    self.sent.setdefault(rec["channel"], set()).update(rec["ids"])
+            if not self.resumed:
+                print(f"[INFO] Discarding journal of an earlier run ({records[0].get('key') if records else '?'}), "
+                      f"keeping {len(self.summaries)} summaries")
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if self.resumed:
+            self._file = open(path, "a", encoding="utf-8")
+            when = time.strftime("%H:%M:%S", time.localtime(started)) if started else "?"
+            print(f"[INFO] Resuming run {key} started at {when}: "
+                  f"{len(self.summaries)} summaries, {sum(map(len, self.sent.values()))} items sent")
+        else:
+            # 새 실행 - 살린 요약은 다시 죽어도 남도록 새 journal에 옮겨 적는다
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"op": "run", "key": key, "t": time.time()}) + "\n")
+                for k, (ko, has) in self.summaries.items():
+                    f.write(json.dumps({"op": "summary", "key": k, "ko": ko, "has": has}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        """(시작 시각, 기록 목록) - 기록 도중 종료되어 잘린 마지막 줄은 잘라 낸다 (이어 쓸 때 붙지 않게)"""
+        records, good = [], 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                good += len(line)
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        if os.path.getsize(self.path) > good:
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+        if records and records[0].get("op") != "run":
+            records = []
+        return (records[0].get("t") if records else None), records
+
+    def _append(self, rec, sync=False):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def record_summary(self, key: str, summary_ko: str, has_summary: bool):
+        self._append({"op": "summary", "key": key, "ko": summary_ko, "has": has_summary})
+
+    def record_sent(self, webhook: str, ids: Iterable[str]):
+        self._append({"op": "sent", "channel": channel_key(webhook), "ids": list(ids)}, sync=True)
+
+    def unsent(self, webhook: str, items: list) -> list:
+        """이어받은 실행이 webhook 채널에 보내지 않은 항목 (이 실행에서 보낸 것과는 상관없다)"""
+        done = self.sent.get(channel_key(webhook))
+        if not done:
+            return items
+        # 지난 실행과 대표 항목이 달라져도 (묶기는 도착 순서를 따른다) 같은 소식은 다시 보내지 않는다
+        return [e for e in items if e.id not in done and not any(d.id in done for d in e.duplicates)]
+
+    def attach(self, cache):
+        """살린 요약을 요약 캐시에 넣고, 이후 캐시에 들어오는 요약을 journal에도 기록하게 한다"""
+        if cache is None:
+            return
+        for key, (ko, has) in self.summaries.items():
+            cache.put(key, ko, has)
+        cache.journal = self
+        self._cache = cache
+
+    def close(self, completed: bool = False):
+        if self._cache is not None and self._cache.journal is self:
+            self._cache.journal = None
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if completed and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+_journal: Optional[RunJournal] = None
+
+
+def begin(mode: str, key: str, path: Optional[str] = None) -> Optional[RunJournal]:
+    """실행 journal을 연다 (JOURNAL=false면 None - 아래 함수들은 아무 일도 하지 않는다)"""
+    global _journal
+    if _journal is not None:
+        # 끝나지 못한 지난 실행 (상주 모드에서 예외로 끝난 실행) - 파일은 남긴다
+        _journal.close()
+        _journal = None
+    if JOURNAL:
+        _journal = RunJournal(f"{mode}|{key}", path or journal_path(mode))
+    return _journal
+
+
+def attach(cache):
+    if _journal is not None:
+        _journal.attach(cache)
+
+
+def record_sent(webhook: str, ids: Iterable[str]):
+    if _journal is not None:
+        _journal.record_sent(webhook, ids)
+
+
+def unsent(webhook: str, items: list) -> list:
+    """webhook 채널에 아직 보내지 않은 항목 (이어서 하는 실행이 아니면 그대로)"""
+    if _journal is None:
+        return items
+    return _journal.unsent(webhook, items)
+
+
+def finish():
+    """실행이 상태 저장까지 끝났다 (Slack 전송이 끝나면 complete가 journal을 지운다)"""
+    if _journal is not None:
+        _journal.finished = True
+
+
+def complete():
+    """보낸 메시지가 모두 전송되었다 - 끝까지 실행한 실행의 journal을 지운다"""
+    global _journal
+    if _journal is not None and _journal.finished:
+        _journal.close(completed=True)
+        _journal = None
+
+
+def test_journal():
+    """이어서 하기/다른 실행의 journal 버리기/잘린 줄/요약 캐시 연결 확인"""
+    import tempfile
+    from newsitem import NewsItem
+    from summary_cache import SummaryCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "run-journal.jsonl")
+        cache = SummaryCache(os.path.join(tmp, "cache.json"))
+        items = [NewsItem("s", f"t{i}", f"https://e.com/{i}") for i in range(5)]
+
+        j = RunJournal("DAILY|2026-10-17", path)
+        assert not j.resumed
+        j.attach(cache)
+        cache.put("k1", "요약 1", True)
+        j.record_sent("https://hooks.example/a", [items[0].id, items[1].id])
+        j.close()
+        assert cache.journal is None
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"op": "sent", "channel": "x", "id')  # 기록 도중 죽은 줄
+
+        j = RunJournal("DAILY|2026-10-17", path)
+        assert j.resumed
+        assert j.summaries == {"k1": ("요약 1", True)}
+        assert [e.title for e in j.unsent("https://hooks.example/a", items)] == ["t2", "t3", "t4"]
+        assert j.unsent("https://hooks.example/b", items) == items
+        # 이 실행에서 보낸 항목은 다른 메시지에서 거르지 않는다 (다시 죽은 뒤 이어서 할 때만 거른다)
+        j.record_sent("https://hooks.example/b", [items[2].id])
+        assert j.unsent("https://hooks.example/b", items) == items
+        fresh = SummaryCache(os.path.join(tmp, "other.json"))
+        j.attach(fresh)
+        assert fresh.get("k1") == ("요약 1", True)
+        fresh.put("k2", "요약 2", False)
+        j.close()
+        j = RunJournal("DAILY|2026-10-17", path)
+        assert [e.title for e in j.unsent("https://hooks.example/b", items)] == ["t0", "t1", "t3", "t4"]
+        j.close()
+
+        # 다음 날 실행: 보낸 기록은 버리고 요약은 살린다
+        j = RunJournal("DAILY|2026-10-18", path)
+        assert not j.resumed and j.unsent("https://hooks.example/a", items) == items
+        assert set(j.summaries) == {"k1", "k2"}
+        j.close(completed=True)
+        assert not os.path.exists(path)
+    print("[INFO] Journal test passed")
+
+
+if __name__ == "__main__":
+    test_journal()
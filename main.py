@@ -1,13 +1,24 @@
-import os, json, hashlib, sys, datetime as dt
+import os, json, sys, threading, datetime as dt
+from concurrent.futures import as_completed
 from dateutil import parser as dp
-import pytz, feedparser, yaml
+import yaml
 from utils import normalize_entry, now_kst, start_of_today_kst
-from state import load_seen, save_seen
-from notifier import send_slack
-from gemini_summarizer import GeminiSummarizer
+from state import load_seen, save_seen, load_feed_cache, save_feed_cache, load_feed_cursors, save_feed_cursors
+from notifier import send_slack, get_delivery, flush_slack, pack_lines, SLACK_MAX_BYTES
+from fetcher import FeedFetcher, validator_from
+from gemini_summarizer import GeminiSummarizer, GEMINI_PACK_MAX_ITEMS
+from summary_cache import SummaryCache
+from pipeline import Pipeline, SummarizeStage
+from cluster import StoryClusterer
+from scheduler import FeedScheduler, FEED_SCHEDULE
+from archive import archive_items, ARCHIVE
+from router import load_router
+import journal
+import feedscan
+import metrics
 
 TIMEZONE = os.getenv("TIMEZONE", "Asia/Seoul")
-MODE = os.getenv("MODE", "DAILY_SUMMARY")  # DAILY_SUMMARY | HOURLY_CHECK
+MODE = os.getenv("MODE", "DAILY_SUMMARY")  # DAILY_SUMMARY | HOURLY_CHECK | SERVE
 SLACK_WEBHOOK = os.getenv("SLACK_WEBHOOK")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 USE_GEMINI = os.getenv("USE_GEMINI", "true").lower() == "true"
@@ -20,86 +31,304 @@ MAX_ITEMS_PER_FEED = int(os.getenv("MAX_ITEMS_PER_FEED", "30"))
 # Gemini API 무료 티어 보호: 한 번에 처리할 최대 항목 수
 MAX_GEMINI_ITEMS = int(os.getenv("MAX_GEMINI_ITEMS", "80"))
 
+# fetch가 끝나기 전에 먼저 들어온 항목부터 요약을 시작할지 여부
+# (나중에 더 새로운 항목에 밀려 상위 MAX_GEMINI_ITEMS에서 빠지는 항목도 요청하므로 기본은 끔)
+PIPELINE_SPECULATIVE = os.getenv("PIPELINE_SPECULATIVE", "false").lower() == "true"
+
+# 여러 소스에 올라온 같은 소식을 하나로 묶어 대표 항목만 요약/전송할지 여부
+CLUSTER_STORIES = os.getenv("CLUSTER_STORIES", "true").lower() == "true"
+
 def load_feeds(path="feeds.yaml"):
     with open(path, "r", encoding="utf-8") as f:
         return yaml.safe_load(f)["feeds"]
 
-def entry_id(e):
-    # URL 우선, 없으면 title+published 해시
-    key = e.get("link") or (e.get("title","") + "|" + e.get("published",""))
-    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
-
-def filter_by_date_range(entries):
-    """날짜별 필터링
+def date_range(mode=None, now=None):
+    """MODE에 맞는 (시작, 끝) 시각 (mode/now를 주면 그 기준)
     - DAILY_SUMMARY: 어제 00:00 KST ~ 오늘 00:00 KST (정확히 전날 하루분)
     - HOURLY_CHECK:  오늘 00:00 KST ~ 현재
     """
-    tz = pytz.timezone(TIMEZONE)
-    now = now_kst()
-    today_start = start_of_today_kst()
+    now = now or now_kst()
+    today_start = start_of_today_kst(now)
 
-    if MODE == "DAILY_SUMMARY":
+    if (mode or MODE) == "DAILY_SUMMARY":
         # 정확히 "어제" 하루분만 가져옴
         yesterday_start = today_start - dt.timedelta(days=1)
-        start = yesterday_start
-        end = today_start
-    else:
-        # HOURLY_CHECK: 오늘 하루분
-        start = today_start
-        end = now
+        return yesterday_start, today_start
 
-    print(f"[INFO] Date range: {start.strftime('%Y-%m-%d %H:%M')} ~ {end.strftime('%Y-%m-%d %H:%M')}")
-
-    filtered = []
-    no_date_count = 0
+    # HOURLY_CHECK: 오늘 하루분
+    return today_start, now
 
+def iter_in_date_range(entries, start, end, stats=None, mode=None):
+    """start~end 사이에 발행된 항목만 하나씩 통과시킨다 (stats["no_date"]에 날짜 없는 항목 수)"""
+    mode = mode or MODE
+    lo, hi = start.timestamp(), end.timestamp()
     for e in entries:
-        pub_dt = e.get("published_dt")
-        if not pub_dt:
+        if e.ts is None:
             # 날짜 정보가 없는 경우:
             # DAILY_SUMMARY에서는 건너뜀 (날짜 불명확한 것은 제외)
             # HOURLY_CHECK에서는 포함 (빠진 날짜 차피 오늘 글로 간주)
-            if MODE == "HOURLY_CHECK":
-                no_date_count += 1
-                filtered.append(e)
+            if mode == "HOURLY_CHECK":
+                if stats is not None:
+                    stats["no_date"] = stats.get("no_date", 0) + 1
+                yield e
             continue
 
-        if start <= pub_dt <= end:
-            filtered.append(e)
+        if lo <= e.ts <= hi:
+            yield e
 
-    print(f"[INFO] Filtered: {len(filtered)} items ({no_date_count} without date)")
+@metrics.timed("filter_by_date_range", event=True)
+def filter_by_date_range(entries):
+    """날짜별 필터링 (date_range 참고)"""
+    start, end = date_range()
+    print(f"[INFO] Date range: {start.strftime('%Y-%m-%d %H:%M')} ~ {end.strftime('%Y-%m-%d %H:%M')}")
+
+    stats = {}
+    filtered = list(iter_in_date_range(entries, start, end, stats))
+
+    print(f"[INFO] Filtered: {len(filtered)} items ({stats.get('no_date', 0)} without date)")
     return filtered
 
-def fetch_all():
-    feeds = load_feeds()
+def iter_entries(validators=None, window=None, stats=None, cursors=None, feeds=None, fetcher=None):
+    """
+    모든 피드를 동시에 받아, 다운로드가 끝나는 피드부터 파싱/정규화한 항목을 하나씩 yield 한다.
+
+    Args:
+        validators: 피드 검증자 캐시 (state.load_feed_cache). 주어지면 조건부 요청을 보내고
+            304 또는 본문이 이전과 같은 피드는 파싱/정규화를 건너뛴다.
+            파싱에 성공한 피드의 새 검증자로 이 dict를 갱신한다.
+        window: (시작, 끝). 주어지면 날짜가 범위 밖인 항목은 정규화 전에 버린다.
+        stats: 주어지면 stats["rejected"]에 버린 항목 수를, stats["fetched"]에 받은 피드(URL)별
+            새로 본 항목의 발행 시각(epoch) 리스트를 기록한다.
+        cursors: 피드 커서 (state.load_feed_cursors). 주어지면 이미 처리한 항목은 건너뛰고
+            처리한 항목으로 커서를 갱신한다 (select_entries 참고).
+        feeds: 받을 피드 목록 (기본: feeds.yaml 전체)
+        fetcher: 재사용할 FeedFetcher (주면 닫지 않고, 파싱 프로세스도 종료하지 않는다)
+
+    큰 피드(FASTPARSE_POOL_MIN_BYTES 이상)는 파싱 프로세스로 보내고, 그동안 다른 피드를 계속 받고 처리한다.
+    파싱 프로세스는 처음 보내는 큰 피드에서 띄운다 (큰 피드가 없으면 띄우지 않는다). fetcher를 주지 않은
+    한 번 실행은 끝나면 종료하고, 상주 모드는 RunState.close가 종료한다 (확인할 때마다 다시 띄우지 않게).
+    """
+    feeds = feeds if feeds is not None else load_feeds()
+    total = 0
+    stats = stats if stats is not None else {}
+    stats["rejected"] = 0
+    stats["known"] = 0
+    stats["backlog"] = 0
+    stats["fetched"] = {}
+    skipped_304 = skipped_same = bytes_saved = 0
+
+    window_ts = _epoch_window(window)
+
+    request_validators = validators
+    if validators is not None and cursors:
+        # 상한 때문에 남겨 둔 항목이 있거나 미래 날짜라 넘긴 항목의 시각이 기간 안으로 들어온 피드는
+        # 변경이 없어도 (304/같은 본문) 다시 받아 이어서 처리한다
+        def pending(cursor):
+            due = cursor.get("future")
+            return cursor.get("backlog") or (due is not None and window_ts is not None and due < window_ts[1])
+        request_validators = {url: v for url, v in validators.items()
+                              if not pending(cursors.get(url, {}))}
+    pending = {}
+
+    def finish(res, scanned=None):
+        nonlocal total
+        f = res["feed"]
+        with metrics.span("feed_parse", feed=f["name"]) as attrs:
+            items = _parse_result(f, res, validators, window, stats, cursors, scanned)
+            attrs["items"] = len(items)
+            attrs["offloaded"] = scanned is not None
+        metrics.observe("feed_items", len(items), feed=f["name"])
+        total += len(items)
+        return items
+
+    def drain(futures):
+        for fut in futures:
+            res = pending.pop(fut)
+            try:
+                scanned = fut.result()
+            except Exception as ex:
+                # 프로세스가 죽었거나 결과를 돌려받지 못하면 여기서 다시 파싱한다
+                print(f"[WARN] Parse worker failed for {res['feed']['name']}: {ex}")
+                scanned = None
+            yield from finish(res, scanned)
+
+    own_fetcher = fetcher is None
+    fetcher = fetcher or FeedFetcher()
+    try:
+        # 다운로드가 끝나는 순서대로 받아 바로 파싱한다 (느린 피드를 기다리지 않음)
+        for res in fetcher.iter_fetch(feeds, request_validators):
+            f = res["feed"]
+            metrics.record("feed_fetch", res["elapsed"], {
+                "status": res["status"], "bytes": len(res["content"] or b""),
+                "not_modified": res["not_modified"], "error": str(res["error"]) if res["error"] else None,
+            }, feed=f["name"])
+            metrics.count("feed_bytes", len(res["content"] or b""))
+            if res["error"]:
+                metrics.count("feed_errors")
+            else:
+                stats["fetched"][f["url"]] = []
+            if validators is not None and not res["error"]:
+                if res["not_modified"]:
+                    skipped_304 += 1
+                    bytes_saved += validators.get(f["url"], {}).get("length", 0)
+                    metrics.count("feeds_not_modified")
+                elif res["unchanged"]:
+                    skipped_same += 1
+                    metrics.count("feeds_unchanged")
+            skip = res["error"] or (validators is not None and (res["not_modified"] or res["unchanged"]))
+            if not skip and feedscan.offload(res["content"]):
+                cursor = cursors.get(f["url"]) if cursors is not None else None
+                fut = feedscan.submit(res["content"], res["headers"], f["name"], cursor, window_ts, MAX_ITEMS_PER_FEED)
+                pending[fut] = res
+            else:
+                yield from finish(res)
+            yield from drain([fut for fut in pending if fut.done()])
+        yield from drain(as_completed(list(pending)))
+    finally:
+        if own_fetcher:
+            feedscan.shutdown_pool(wait=True)
+            fetcher.close()
+
+    if validators is not None:
+        print(f"[INFO] Feed cache: {skipped_304 + skipped_same} feeds skipped "
+              f"(304: {skipped_304}, identical body: {skipped_same}), ~{bytes_saved / 1024:.1f} KB not downloaded")
+    if window is not None:
+        print(f"[DEBUG] Skipped {stats['rejected']} entries outside the date range before normalizing")
+    if cursors is not None:
+        print(f"[INFO] Feed cursors: {stats['known']} already-processed entries skipped, "
+              f"{stats['backlog']} left for the next run")
+    print(f"[DEBUG] Total items fetched: {total}")
+    metrics.count("entries_fetched", total)
+    metrics.count("entries_rejected", stats["rejected"])
+    metrics.count("entries_known", stats["known"])
+    metrics.count("entries_backlog", stats["backlog"])
+
+def fetch_all(validators=None):
+    """모든 피드를 받아 정규화된 항목 리스트를 반환한다 (iter_entries 참고)."""
+    return list(iter_entries(validators))
+
+def _update_cursor(cursor, handled, backlog, feed_length, complete=True, future=None):
+    """
+    처리한 (ID, 발행 시각)으로 커서를 갱신한다 (complete: 피드를 끝까지 읽어 길이를 아는지).
+    future: 아직 기간이 오지 않아 넘긴(미래 날짜) 항목 중 가장 이른 발행 시각 - 그 시각이 지나면
+    피드가 바뀌지 않았어도 다시 파싱한다 (iter_entries).
+    """
+    cursor = dict(cursor or {})
+    stamps = [t for _, t in handled if t is not None]
+    if stamps and (cursor.get("newest") is None or max(stamps) > cursor["newest"]):
+        cursor["newest"] = max(stamps)
+    # 피드에 남아 있을 수 있는 만큼만 기억한다 (피드 길이의 2배)
+    fresh = [rid for rid, _ in handled]
+    fresh_set = set(fresh)
+    ids = fresh + [rid for rid in cursor.get("ids", []) if rid not in fresh_set]
+    keep = 2 * max(feed_length, MAX_ITEMS_PER_FEED)
+    if not complete:
+        # 중간에 멈춰 피드 길이를 모르면 기억하던 만큼은 유지한다
+        keep = max(keep, len(cursor.get("ids", [])))
+    cursor["ids"] = ids[:keep]
+    cursor["backlog"] = backlog
+    if future is not None:
+        cursor["future"] = future
+    else:
+        cursor.pop("future", None)
+    return cursor
+
+def _epoch_window(window):
+    return (window[0].timestamp(), window[1].timestamp()) if window is not None else None
+
+def _parse_result(f, res, validators, window=None, stats=None, cursors=None, scanned=None):
+    """
+    다운로드 결과 하나를 파싱해 정규화된 항목 리스트로 만든다.
+
+    scanned: 다른 프로세스에서 미리 실행한 feedscan.scan_feed 결과 (없으면 여기서 파싱)
+    """
+    print(f"[DEBUG] Fetched: {f['name']} ({res['elapsed']:.2f}s)")
+    if res["error"]:
+        print(f"[ERROR] Failed to fetch {f['name']}: {res['error']}")
+        return []
+
+    if validators is not None and (res["not_modified"] or res["unchanged"]):
+        validators[f["url"]] = validator_from(res, validators.get(f["url"], {}))
+        print(f"[DEBUG] Unchanged since last run: {f['name']} (skip parsing)")
+        return []
+
+    stats = stats if stats is not None else {"rejected": 0, "known": 0, "backlog": 0}
     items = []
-    for f in feeds:
-        print(f"[DEBUG] Fetching: {f['name']}")
-        try:
-            d = feedparser.parse(f["url"])
-            feed_items = len(d.entries)
-            print(f"[DEBUG] Found {feed_items} entries from {f['name']}")
-
-            # 피드당 최대 항목 수 제한 (arXiv 등 대량 피드 보호)
-            entries_to_process = d.entries[:MAX_ITEMS_PER_FEED]
-            if feed_items > MAX_ITEMS_PER_FEED:
-                print(f"[INFO] Capped {f['name']}: {feed_items} → {MAX_ITEMS_PER_FEED} items")
-
-            for raw in entries_to_process:
-                e = normalize_entry(raw, f["name"])
-                e["__id"] = entry_id(e)
-
-                # RSS 초록 추출 (summary 또는 description)
-                summary = getattr(raw, "summary", "") or getattr(raw, "description", "")
-                e["summary"] = summary.strip() if summary else ""
-
-                items.append(e)
-        except Exception as ex:
-            print(f"[ERROR] Failed to fetch {f['name']}: {ex}")
-
-    print(f"[DEBUG] Total items fetched: {len(items)}")
+    try:
+        cursor = cursors.get(f["url"]) if cursors is not None else None
+        if scanned is None:
+            # 날짜순 피드는 기간/상한/커서에 닿으면 나머지 본문을 읽지 않는다
+            scanned = feedscan.scan_feed(res["content"], res["headers"], f["name"], cursor,
+                                         _epoch_window(window), MAX_ITEMS_PER_FEED)
+        candidates, known, feed_items = scanned["candidates"], scanned["known"], scanned["entries"]
+        print(f"[DEBUG] Found {feed_items}{'' if scanned['complete'] else '+'} entries from {f['name']} "
+              f"({scanned['parser']})")
+        # 발행 간격 학습용 (scheduler.py)
+        stats.setdefault("fetched", {})[f["url"]] = [ts for _, _, ts in candidates if ts is not None]
+
+        # 피드당 최대 항목 수 제한 (arXiv 등 대량 피드 보호)
+        # 기간 안의 새 항목만 세고, 상한을 넘은 항목은 커서가 있으면 다음 실행으로 넘긴다
+        handled = []
+        backlog = 0
+        future = None
+        for raw, rid, ts in candidates:
+            if len(items) >= MAX_ITEMS_PER_FEED:
+                backlog += 1
+                continue
+            # 초록 정리(HTML 제거, MAX_SUMMARY_LENGTH 자르기)는 요약 단계에서 처음 읽을 때 한다
+            e = normalize_entry(raw, f["name"], window, ts=ts, id=rid)
+            if e is None:
+                # 기간 밖 항목은 나머지 필드를 만들지 않고 버린다
+                stats["rejected"] += 1
+                # 아직 기간이 오지 않은(미래 날짜) 항목만 다음 실행에서 다시 본다
+                if ts is None or ts < window[1].timestamp():
+                    handled.append((rid, ts))
+                else:
+                    future = ts if future is None else min(future, ts)
+                continue
+            items.append(e)
+            handled.append((rid, ts))
+
+        if backlog:
+            more = "" if scanned["complete"] else "+"
+            print(f"[INFO] Capped {f['name']}: {len(items) + backlog}{more} → {MAX_ITEMS_PER_FEED} items"
+                  + (f" ({backlog}{more} left for the next run)" if cursors is not None else ""))
+
+        stats["known"] += known
+        stats["backlog"] += backlog
+        if cursors is not None:
+            cursors[f["url"]] = _update_cursor(cursor, handled, backlog, feed_items, scanned["complete"], future)
+        if validators is not None:
+            validators[f["url"]] = validator_from(res, validators.get(f["url"]))
+    except Exception as ex:
+        print(f"[ERROR] Failed to parse {f['name']}: {ex}")
+        return []
     return items
 
+def format_line(e, use_gemini_text=False):
+    """뉴스 아이템 하나를 메시지 한 덩어리로 (제목 줄 + 링크 줄)"""
+    date_str = e.date_str
+
+    # Gemini 요약/번역 사용
+    if use_gemini_text and e.summary_ko:
+        title_text = e.summary_ko
+        if e.has_summary:
+            prefix = "📝"  # 요약된 경우
+        else:
+            prefix = "🔤"  # 번역만 된 경우
+    else:
+        title_text = e.title
+        prefix = "•"
+
+    line = f"{prefix} [{e.source}] {title_text}"
+    if date_str:
+        line += f" ({date_str})"
+    line += f"\n  {e.link}"
+    # 같은 소식을 다룬 다른 소스 링크
+    for d in e.duplicates:
+        line += f"\n  ↳ [{d.source}] {d.link}"
+    return line
+
 def format_summary(items, use_gemini_text=False):
     """
     뉴스 아이템 포맷팅 - 모든 항목 표시
@@ -111,199 +340,378 @@ def format_summary(items, use_gemini_text=False):
     if not items:
         return "항목이 없습니다."
 
-    lines = []
-    for e in items:
-        date_str = ""
-        if e.get("published_dt"):
-            date_str = e["published_dt"].strftime("%m/%d %H:%M")
-
-        # Gemini 요약/번역 사용
-        if use_gemini_text and e.get("summary_ko"):
-            title_text = e["summary_ko"]
-            if e.get("has_summary"):
-                prefix = "📝"  # 요약된 경우
-            else:
-                prefix = "🔤"  # 번역만 된 경우
-        else:
-            title_text = e.get("title")
-            prefix = "•"
+    return "\n\n".join(format_line(e, use_gemini_text) for e in items)
 
-        line = f"{prefix} [{e.get('source')}] {title_text}"
-        if date_str:
-            line += f" ({date_str})"
-        line += f"\n  {e.get('link')}"
-        lines.append(line)
+def _page_budget(title):
+    """제목을 붙인 메시지가 SLACK_MAX_BYTES를 넘지 않는 본문 크기 (64바이트 여유)"""
+    return SLACK_MAX_BYTES - len(f"*{title}*\n".encode("utf-8")) - 64
 
-    return "\n\n".join(lines)
+# 연속 메시지 제목 ("📄 계속 (p/N)")이 가장 길 때 기준
+_CONTINUATION_BUDGET = _page_budget("📄 계속 (9999/9999)")
 
-def send_with_mode(title, items, use_gemini_text):
+def send_with_mode(title, items, use_gemini_text, webhook=None):
     """
     SEND_MODE에 따라 Slack 메시지 전송 방식 결정
     - SINGLE: 전체를 하나의 메시지로 (항목이 적을 때)
     - MULTIPLE: 첫 N개 메시지 + 나머지를 분할 전송 (항목이 많을 때)
+
+    어느 모드든 메시지 크기 한도를 넘는 부분은 연속 메시지로 넘기므로 항목이 빠지지 않는다.
+    webhook을 주면 그 채널로 보낸다 (기본 SLACK_WEBHOOK).
+    이어서 하는 실행이면 journal에 이 채널로 보냈다고 기록된 항목은 빼고 보낸다.
     """
-    if not SLACK_WEBHOOK:
+    if not (webhook or SLACK_WEBHOOK):
         print("[WARN] SLACK_WEBHOOK not configured - skipping notification")
         print("\n=== Preview ===")
         print(format_summary(items[:5], use_gemini_text))
         return
 
+    webhook = webhook or SLACK_WEBHOOK
+    unsent = journal.unsent(webhook, items)
+    if len(unsent) < len(items):
+        print(f"[INFO] {len(items) - len(unsent)} items already sent by the interrupted run, {len(unsent)} left")
+        if not unsent:
+            return
+        title += f" (이어서 {len(unsent)}건)"
+        items = unsent
+
+    lines = [format_line(e, use_gemini_text) for e in items]
+    # 메시지마다 담긴 항목 ID - 같은 소식으로 묶은 다른 소스 항목도 함께 (페이지는 items를 순서대로 자른 것이다)
+    shown = [[e.id] + [d.id for d in e.duplicates] for e in items]
+
+    def ids(lo, hi):
+        return [i for group in shown[lo:hi] for i in group]
+
     if SEND_MODE == "SINGLE" or len(items) <= ITEMS_PER_MESSAGE:
         # SINGLE 모드 또는 항목이 적으면 하나의 메시지로 전송
-        body = format_summary(items, use_gemini_text)
-        print(f"[INFO] Sending single message ({len(items)} items)")
-        send_slack(title, body)
-        return
+        pages = pack_lines(lines, _CONTINUATION_BUDGET, first_budget=_page_budget(title))
+        if len(pages) <= 1:
+            print(f"[INFO] Sending single message ({len(items)} items)")
+            send_slack(title, format_summary(items, use_gemini_text) if len(pages) == 0 else "\n\n".join(pages[0]),
+                       webhook, ids(0, len(items)))
+            return
+        print(f"[INFO] Message exceeds {SLACK_MAX_BYTES} bytes - splitting into {len(pages)} messages")
+        first_page, continuation = pages[0], pages[1:]
+    else:
+        # MULTIPLE 모드: 첫 메시지에 ITEMS_PER_MESSAGE건, 나머지를 메시지 크기 한도까지 채워 분할
+        footer = f"\n\n📄 ... 외 {len(items)}건 (다음 메시지에서 확인)"
+        first_budget = _page_budget(title) - len(footer.encode("utf-8"))
+        head = pack_lines(lines[:ITEMS_PER_MESSAGE], _CONTINUATION_BUDGET, first_budget=first_budget)
+        first_page = head[0]
+        continuation = head[1:] + pack_lines(lines[ITEMS_PER_MESSAGE:], _CONTINUATION_BUDGET)
 
-    # MULTIPLE 모드: 첫 메시지에 ITEMS_PER_MESSAGE건, 나머지를 10건씩 분할
     # 첫 메시지
-    first_batch = items[:ITEMS_PER_MESSAGE]
-    remaining = items[ITEMS_PER_MESSAGE:]
-    chunk_size = 10  # 연속 메시지당 항목 수
-
-    first_body = format_summary(first_batch, use_gemini_text)
+    remaining = len(items) - len(first_page)
+    first_body = "\n\n".join(first_page)
     if remaining:
-        total_pages = 1 + ((len(remaining) - 1) // chunk_size + 1)
-        first_body += f"\n\n📄 ... 외 {len(remaining)}건 (다음 메시지에서 확인)"
-
-    print(f"[INFO] Sending first message ({len(first_batch)} items, {len(remaining)} remaining)")
-    send_slack(title, first_body)
+        first_body += f"\n\n📄 ... 외 {remaining}건 (다음 메시지에서 확인)"
+    print(f"[INFO] Sending first message ({len(first_page)} items, {remaining} remaining)")
+    send_slack(title, first_body, webhook, ids(0, len(first_page)))
+    offset = len(first_page)
 
     # 나머지 메시지를 분할 전송
-    page = 1
-    for i in range(0, len(remaining), chunk_size):
-        chunk = remaining[i:i + chunk_size]
-        total_pages = (len(remaining) - 1) // chunk_size + 1
+    total_pages = len(continuation)
+    for page, chunk in enumerate(continuation, 1):
         chunk_title = f"📄 계속 ({page}/{total_pages})"
-        chunk_body = format_summary(chunk, use_gemini_text)
         print(f"[INFO] Sending continuation message {page}/{total_pages} ({len(chunk)} items)")
-        send_slack(chunk_title, chunk_body)
-        page += 1
+        send_slack(chunk_title, "\n\n".join(chunk), webhook, ids(offset, offset + len(chunk)))
+        offset += len(chunk)
+
+def sort_key(e):
+    """최신순 정렬 키 (날짜 없는 항목은 맨 뒤)"""
+    return e.ts if e.ts is not None else float("-inf")
+
+def make_summarizer():
+    return GeminiSummarizer(GEMINI_API_KEY, cache=SummaryCache())
+
+class RunState:
+    def __init__(self):
+        """
+        실행 사이에 메모리에 유지하는 상태 (SERVE 모드)
+
+        seen, 피드 검증자/커서, 피드 다운로드 세션, 요약기(모델 + 요약 캐시)를 한 번만 읽거나 만들고
+        run_once가 매번 디스크에서 다시 읽는 대신 이것을 쓴다. 저장은 run_once가 실행마다 한다.
+        """
+        self.seen = load_seen()
+        self.validators = load_feed_cache()
+        self.cursors = load_feed_cursors()
+        self.scheduler = FeedScheduler.load()
+        self.fetcher = FeedFetcher()
+        self._summarizer = None
+        self._summarizer_lock = threading.Lock()
+
+    def summarizer(self):
+        with self._summarizer_lock:
+            if self._summarizer is None:
+                self._summarizer = make_summarizer()
+            return self._summarizer
+
+    def reload_seen(self):
+        """보존 기간이 지난 ID를 메모리에서도 버린다 (하루 한 번)"""
+        self.seen = load_seen()
+
+    def close(self):
+        self.fetcher.close()
+        feedscan.shutdown_pool(wait=True)
+
+# 모드별 파이프라인 구성
+# - conditional_fetch: 조건부 요청(ETag/Last-Modified) 사용 여부.
+#   DAILY_SUMMARY는 어제 하루분 전체가 필요하므로 변경 없는 피드도 다시 파싱해야 하고,
+#   검증자를 갱신하면 HOURLY_CHECK가 아직 seen에 없는 오늘 항목을 건너뛸 수 있다.
+# - cursors: 피드 커서로 지난 실행에서 처리한 항목을 건너뛸지. 조건부 요청과 같은 이유로
+#   DAILY_SUMMARY에서는 사용하지 않는다.
+# - dedup: seen에 있는 항목을 걸러낼지 (False면 기간 내 항목을 모두 seen에 기록)
+# - schedule: 발행 간격을 학습해 차례가 된 피드만 받을지 (scheduler.py, FEED_SCHEDULE=false면 끔).
+#   DAILY_SUMMARY는 어제 하루분 전체가 필요하므로 모든 피드를 받는다.
+MODE_PIPELINES = {
+    "DAILY_SUMMARY": {
+        "conditional_fetch": False,
+        "cursors": False,
+        "dedup": False,
+        "schedule": False,
+        "empty_message": "No items to report for daily summary",
+        "title": lambda n, now: f"📌 {(now - dt.timedelta(days=1)).strftime('%Y-%m-%d')} AI 뉴스 요약 ({n}건)",
+    },
+    "HOURLY_CHECK": {
+        "conditional_fetch": True,
+        "cursors": True,
+        "dedup": True,
+        "schedule": True,
+        "empty_message": "No new items found",
+        "title": lambda n, now: f"🆕 신규 감지 {now.strftime('%H:%M KST')} ({n}건)",
+    },
+}
 
 def main():
+    """한 번 실행하고 단계별 시간이 담긴 Pipeline을 반환한다 (벤치마크용, 설정 오류면 None)."""
+    if MODE == "SERVE":
+        # 상주 모드: 종료 신호를 받을 때까지 피드별 간격으로 확인하고 매일 요약을 보낸다 (daemon.py)
+        from daemon import serve
+        return serve()
+    try:
+        return run_once()
+    finally:
+        # 큐에 넣은 Slack 메시지가 전송될 때까지 기다린다 (못 보낸 것은 스풀에 남아 다음 실행에서 재전송)
+        with metrics.span("slack_flush"):
+            if flush_slack():
+                # 끝까지 실행했고 보낸 메시지도 모두 전송됨 - 실행 journal을 지운다
+                journal.complete()
+        # 계측이 켜져 있으면 (METRICS=true) 실행 기록을 남긴다
+        metrics.flush(mode=MODE)
+
+def send_routes(router, title, items, use_gemini_text):
+    """
+    router(feeds.yaml의 routes)에 맞은 항목을 라우트별 Webhook으로 보낸다.
+    Webhook이 같은 라우트는 한 메시지로 합치고 (항목은 한 번씩, 전체 요약과 같은 순서),
+    Webhook이 SLACK_WEBHOOK인 라우트는 전체 요약에 이미 모두 들어 있으므로 따로 보내지 않는다.
+    """
+    channels = {}
+    for route, matched in router.route(items):
+        metrics.count("routed_items", len(matched), route=route["name"])
+        if not route["webhook"]:
+            print(f"[INFO] Route {route['name']}: {len(matched)} items (no webhook)")
+            continue
+        names, ids = channels.setdefault(route["webhook"], ([], set()))
+        names.append(route["name"])
+        ids.update(e.id for e in matched)
+
+    for webhook, (names, ids) in channels.items():
+        label = ", ".join(names)
+        if webhook == SLACK_WEBHOOK:
+            print(f"[INFO] Route {label}: {len(ids)} items already in the main message")
+            continue
+        merged = [e for e in items if e.id in ids]
+        print(f"[INFO] Route {label}: sending {len(merged)} items")
+        send_with_mode(f"🏷️ [{label}] {title}", merged, use_gemini_text, webhook)
+
+
+def run_once(mode=None, state=None, feeds=None, now=None):
+    """
+    한 번 실행 (fetch → 필터 → 중복 제거 → 요약 → 전송 → 보관 → 상태 저장)
+    단계마다 끝낸 단위를 실행 journal(journal.py)에 남겨, 중간에 죽으면 다음 실행이 Gemini 요약과
+    Slack 전송을 되풀이하지 않고 이어서 한다.
+
+    Args:
+        mode: DAILY_SUMMARY | HOURLY_CHECK (기본 MODE)
+        state: RunState. 주면 seen/검증자/커서/세션/요약기를 디스크에서 다시 읽지 않고 이것을 쓴다.
+            검증자/커서는 실행이 끝까지 성공했을 때만 state에 반영한다.
+        feeds: 받을 피드 목록 (기본 feeds.yaml 전체, 스케줄을 쓰는 모드에서는 그중 차례가 된 피드)
+        now: 기준 시각 (기본 now_kst())
+    """
+    mode = mode or MODE
+    now = now or now_kst()
     print(f"[INFO] ========================================")
-    print(f"[INFO] Starting in {MODE} mode")
-    print(f"[INFO] Current time (KST): {now_kst().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"[INFO] Starting in {mode} mode")
+    print(f"[INFO] Current time (KST): {now.strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"[INFO] Gemini API: {'Enabled' if USE_GEMINI and GEMINI_API_KEY else 'Disabled'}")
     print(f"[INFO] Send mode: {SEND_MODE} (first batch: {ITEMS_PER_MESSAGE}건)")
     print(f"[INFO] Max items per feed: {MAX_ITEMS_PER_FEED}")
     print(f"[INFO] Max Gemini items: {MAX_GEMINI_ITEMS}")
     print(f"[INFO] ========================================")
 
-    all_items = fetch_all()
-
-    if not all_items:
-        print("[WARN] No items fetched from any feed!")
+    config = MODE_PIPELINES.get(mode)
+    if config is None:
+        print(f"[ERROR] Unknown MODE: {mode}")
         return
 
-    # 날짜별 필터링
-    print(f"[INFO] Filtering items...")
-    filtered_items = filter_by_date_range(all_items)
-    print(f"[INFO] Items after date filtering: {len(filtered_items)}")
-
-    seen = load_seen()
+    # 이 실행의 journal (같은 기간의 실행이 중간에 죽었으면 그 요약/전송 기록을 이어받는다)
+    start, end = date_range(mode, now)
+    journal.begin(mode, start.strftime("%Y-%m-%d %H:%M"))
+
+    # 지난 실행에서 보내지 못한 Slack 메시지를 먼저 보내기 시작한다 (주제별 채널 포함)
+    get_delivery()
+    router = load_router()
+    if router is not None:
+        for webhook, name in router.webhooks():
+            get_delivery(webhook, name)
+
+    if state is not None:
+        # 실패한 실행이 메모리의 검증자/커서를 앞당기지 않도록 복사본으로 실행한다
+        validators = dict(state.validators) if config["conditional_fetch"] else None
+        cursors = dict(state.cursors) if config["cursors"] else None
+        seen = state.seen
+    else:
+        validators = load_feed_cache() if config["conditional_fetch"] else None
+        cursors = load_feed_cursors() if config["cursors"] else None
+        seen = load_seen()
     print(f"[INFO] Previously seen items: {len(seen)}")
 
-    if MODE == "DAILY_SUMMARY":
-        # seen에 오늘 날짜 기준으로 저장하되, 어제의 뉴스를 요약 전송
-        print(f"[INFO] Processing {len(filtered_items)} items for daily summary")
-
-        for e in filtered_items:
-            seen.add(e["__id"])
-        save_seen(seen)
-        print(f"[INFO] Saved {len(seen)} items to seen set")
-
-        if filtered_items:
-            sorted_items = sorted(
-                filtered_items,
-                key=lambda x: x.get("published_dt") or dt.datetime(1900, 1, 1, tzinfo=pytz.timezone(TIMEZONE)),
-                reverse=True
-            )
-
-            # Gemini API로 요약/번역 (MAX_GEMINI_ITEMS 이하로 제한)
-            use_gemini_text = False
-            if USE_GEMINI and GEMINI_API_KEY:
-                try:
-                    items_for_gemini = sorted_items[:MAX_GEMINI_ITEMS]
-                    skipped = len(sorted_items) - len(items_for_gemini)
-                    if skipped > 0:
-                        print(f"[INFO] Gemini will process {len(items_for_gemini)} items (skipping {skipped} to stay under limit)")
-
-                    print(f"[INFO] Processing with Gemini API...")
-                    summarizer = GeminiSummarizer(GEMINI_API_KEY)
-                    summarized = summarizer.batch_summarize(items_for_gemini, delay=1.0)
-                    use_gemini_text = True
-                    print(f"[INFO] Gemini processing completed for {len(summarized)} items")
-
-                    # 처리된 것과 미처리 것을 다시 합침
-                    sorted_items = summarized + sorted_items[MAX_GEMINI_ITEMS:]
-                except Exception as e:
-                    print(f"[ERROR] Gemini API 오류: {e}")
-                    print(f"[INFO] Falling back to original format")
-
-            if SLACK_WEBHOOK:
-                yesterday = (now_kst() - dt.timedelta(days=1)).strftime('%Y-%m-%d')
-                title = f"📌 {yesterday} AI 뉴스 요약 ({len(filtered_items)}건)"
-                if use_gemini_text:
-                    title += " 🤖"
-                print(f"[INFO] Sending Slack notification (mode: {SEND_MODE})")
-                send_with_mode(title, sorted_items, use_gemini_text)
-            else:
-                print("[WARN] SLACK_WEBHOOK not configured - skipping notification")
-                print("\n=== Preview ===")
-                print(format_summary(sorted_items[:5], use_gemini_text))
-        else:
-            print("[INFO] No items to report for daily summary")
+    scheduler = None
+    if config["schedule"] and FEED_SCHEDULE:
+        scheduler = state.scheduler if state is not None else FeedScheduler.load()
+        if feeds is None:
+            all_feeds = load_feeds()
+            feeds = scheduler.due(all_feeds, now.timestamp())
+            avoided = len(all_feeds) - len(feeds)
+            scheduler.avoided += avoided
+            metrics.count("fetches_avoided", avoided)
+            print(f"[INFO] Feed schedule: {len(feeds)}/{len(all_feeds)} feeds due, "
+                  f"{avoided} fetches avoided ({scheduler.avoided} in total)")
 
-        return
+    print(f"[INFO] Date range: {start.strftime('%Y-%m-%d %H:%M')} ~ {end.strftime('%Y-%m-%d %H:%M')}")
 
-    if MODE == "HOURLY_CHECK":
-        new_items = [e for e in filtered_items if e["__id"] not in seen]
-        print(f"[INFO] New items found: {len(new_items)}")
+    # fetch → 날짜 필터 → (중복 제거 | seen 기록) → 상위 MAX_GEMINI_ITEMS 요약
+    # 앞 단계가 항목을 내놓는 즉시 다음 단계가 처리한다
+    filter_stats = {}
+    new_items = []
+
+    def dedup(entries):
+        for e in entries:
+            if e.id not in seen:
+                new_items.append(e)
+                yield e
+
+    def mark_seen(entries):
+        for e in entries:
+            seen.add(e.id)
+            new_items.append(e)
+            yield e
+
+    def commit_feed_state():
+        # seen 저장 이후에만 검증자/커서/스케줄을 저장해야 중간 실패 시 새 항목을 놓치지 않는다
+        if scheduler is not None:
+            for url, stamps in fetch_stats.get("fetched", {}).items():
+                scheduler.record(url, now.timestamp(), stamps)
+            scheduler.save()
+        if validators is None:
+            return
+        save_feed_cache(validators)
+        if cursors is not None:
+            save_feed_cursors(cursors)
+        if state is not None:
+            state.validators = validators
+            if cursors is not None:
+                state.cursors = cursors
+
+    pipe = Pipeline(mode)
+    pipe.stage("filter", lambda it: iter_in_date_range(it, start, end, filter_stats, mode))
+    pipe.stage("dedup" if config["dedup"] else "mark_seen", dedup if config["dedup"] else mark_seen)
+    clusterer = StoryClusterer() if CLUSTER_STORIES else None
+    if clusterer is not None:
+        pipe.stage("cluster", clusterer)
+
+    if USE_GEMINI and GEMINI_API_KEY:
+        make = state.summarizer if state is not None else make_summarizer
+
+        def summarizer_factory():
+            # 요약이 캐시에 들어가는 즉시 journal에도 남긴다 (이어서 하는 실행은 캐시에서 꺼내 쓴다)
+            summarizer = make()
+            journal.attach(summarizer.cache)
+            return summarizer
+    else:
+        summarizer_factory = None
+    summarize = SummarizeStage(
+        MAX_GEMINI_ITEMS, sort_key, summarizer_factory,
+        group_size=GEMINI_PACK_MAX_ITEMS,
+        speculative=PIPELINE_SPECULATIVE,
+    )
+    fetch_stats = {}
+    fetcher = state.fetcher if state is not None else None
+    entries = iter_entries(validators, (start, end), fetch_stats, cursors, feeds, fetcher)
+    try:
+        summarize.consume(pipe.run(entries, "fetch"))
+    finally:
+        # 뒤 단계에서 예외가 나도 파싱 프로세스를 바로 끝낸다 (iter_entries의 finally)
+        entries.close()
+
+    if not pipe.counts.get("fetch") and not fetch_stats["rejected"] and not fetch_stats["known"]:
+        if validators:
+            # 모든 피드가 변경 없음 - 새 항목이 없으므로 검증자/커서만 저장
+            commit_feed_state()
+            print("[INFO] No feed changed since last run")
+        else:
+            print("[WARN] No items fetched from any feed!")
+        summarize.finish()
+        journal.finish()
+        return pipe
 
-        if new_items:
-            sorted_items = sorted(
-                new_items,
-                key=lambda x: x.get("published_dt") or dt.datetime(1900, 1, 1, tzinfo=pytz.timezone(TIMEZONE)),
-                reverse=True
-            )
-
-            # Gemini API로 요약/번역 (MAX_GEMINI_ITEMS 이하로 제한)
-            use_gemini_text = False
-            if USE_GEMINI and GEMINI_API_KEY:
-                try:
-                    items_for_gemini = sorted_items[:MAX_GEMINI_ITEMS]
-                    skipped = len(sorted_items) - len(items_for_gemini)
-                    if skipped > 0:
-                        print(f"[INFO] Gemini will process {len(items_for_gemini)} items (skipping {skipped})")
-
-                    print(f"[INFO] Processing with Gemini API...")
-                    summarizer = GeminiSummarizer(GEMINI_API_KEY)
-                    summarized = summarizer.batch_summarize(items_for_gemini, delay=1.0)
-                    use_gemini_text = True
-                    print(f"[INFO] Gemini processing completed for {len(summarized)} items")
-
-                    sorted_items = summarized + sorted_items[MAX_GEMINI_ITEMS:]
-                except Exception as e:
-                    print(f"[ERROR] Gemini API 오류: {e}")
-                    print(f"[INFO] Falling back to original format")
-
-            if SLACK_WEBHOOK:
-                title = f"🆕 신규 감지 {now_kst().strftime('%H:%M KST')} ({len(new_items)}건)"
-                if use_gemini_text:
-                    title += " 🤖"
-                print(f"[INFO] Sending Slack notification (mode: {SEND_MODE})")
-                send_with_mode(title, sorted_items, use_gemini_text)
-
-            # seen에 추가
-            for e in new_items:
-                seen.add(e["__id"])
+    print(f"[INFO] Filtered: {pipe.counts.get('filter', 0)} items ({filter_stats.get('no_date', 0)} without date)")
+    if config["dedup"]:
+        print(f"[INFO] New items found: {len(new_items)}")
+    if clusterer is not None and clusterer.duplicates:
+        print(f"[INFO] Grouped {clusterer.duplicates} duplicate items from other sources "
+              f"({clusterer.representatives} stories)")
+
+    if new_items:
+        stories = clusterer.representatives if clusterer is not None else len(new_items)
+        skipped = stories - MAX_GEMINI_ITEMS
+        if USE_GEMINI and GEMINI_API_KEY and skipped > 0:
+            print(f"[INFO] Gemini will process {MAX_GEMINI_ITEMS} items (skipping {skipped} to stay under limit)")
+
+        with pipe.timer("summarize"):
+            sorted_items, use_gemini_text = summarize.finish()
+        if use_gemini_text:
+            print(f"[INFO] Gemini processing completed for {min(stories, MAX_GEMINI_ITEMS)} items")
+
+        title = config["title"](len(sorted_items), now)
+        if use_gemini_text:
+            title += " 🤖"
+        print(f"[INFO] Sending Slack notification (mode: {SEND_MODE})")
+        with pipe.timer("send"):
+            send_with_mode(title, sorted_items, use_gemini_text)
+        if router is not None:
+            # 키워드가 맞은 항목을 주제별 채널에도 보낸다
+            with pipe.timer("route"):
+                send_routes(router, title, sorted_items, use_gemini_text)
+        if ARCHIVE:
+            # 제목/링크/초록/한국어 요약을 보관소에 남긴다 (python archive.py search ...)
+            with pipe.timer("archive"):
+                archive_items(sorted_items, mode)
+    else:
+        summarize.finish()
+        print(f"[INFO] {config['empty_message']}")
+
+    # seen은 전송(스풀에 넣기)까지 끝난 뒤에 저장한다 - 그 전에 죽으면 다음 실행이 journal로 이어서 보낸다
+    if new_items:
+        for e in new_items:
+            seen.add(e.id)
+        with pipe.timer("save_seen"):
             save_seen(seen)
-            print(f"[INFO] Saved {len(new_items)} new items to seen set")
-        else:
-            print("[INFO] No new items found")
+        print(f"[INFO] Saved {len(new_items)} new items to seen set")
+    commit_feed_state()
+    journal.finish()
 
-        return
+    pipe.report()
+    return pipe
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,365 @@
+import os, json, time, bisect, threading, datetime as dt
+from contextlib import contextmanager
+from functools import wraps
+
+# 계측 사용 여부. 끄면 span/count/record는 바로 반환하고 timed는 원래 함수를 그대로 돌려준다
+METRICS = os.getenv("METRICS", "false").lower() == "true"
+
+# 실행 기록(JSONL, 실행마다 덧붙임)과 Prometheus textfile 경로 (비우면 textfile은 쓰지 않음)
+METRICS_LOG_PATH = os.getenv("METRICS_LOG_PATH", os.path.join("data", "run-log.jsonl"))
+METRICS_PROM_PATH = os.getenv("METRICS_PROM_PATH", "")
+
+# Prometheus 지표 이름 접두어
+METRICS_PREFIX = "ai_news_"
+
+# 히스토그램 구간 상한 (초 단위 지표 기준)
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """구간 상한으로 어림한 분위수 (마지막 구간은 최댓값)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "sum": round(self.sum, 6), "max": round(self.max, 6),
+                "p50": round(self.quantile(0.5), 6), "p95": round(self.quantile(0.95), 6)}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Recorder:
+    def __init__(self, clock=time.perf_counter):
+        """
+        한 번의 실행 동안 span/카운터/히스토그램을 모으는 기록기 (스레드 안전)
+
+        - span: 이름 + 라벨로 소요 시간을 히스토그램(<name>_seconds)에 더하고 이벤트로 남긴다
+        - 카운터: 이름 + 라벨별 누적 값 (<name>_total)
+        - 히스토그램: 임의의 값 분포 (항목 수, 바이트 등)
+
+        이벤트와 집계는 메모리에만 두고 flush 때 한 번에 쓴다 (실행 중 파일 I/O 없음).
+        """
+        self.clock = clock
+        self.started = time.time()
+        self.run_id = dt.datetime.fromtimestamp(self.started, dt.timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+        self._t0 = clock()
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.events = []
+
+    def count(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        self.observe_key(_key(name, labels), value)
+
+    def observe_key(self, key, value):
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = Histogram()
+            h.add(value)
+
+    def record(self, name, seconds, attrs=None, event=True, **labels):
+        """이미 잰 소요 시간 기록 (attrs는 이벤트에만 붙는 부가 정보)"""
+        self.observe(name + "_seconds", seconds, **labels)
+        if event:
+            ev = {"type": "span", "name": name, "at": round(self.clock() - self._t0 - seconds, 6),
+                  "seconds": round(seconds, 6)}
+            ev.update(labels)
+            if attrs:
+                ev.update(attrs)
+            with self._lock:
+                self.events.append(ev)
+
+    @contextmanager
+    def span(self, name, event=True, **labels):
+        """with 블록의 소요 시간 기록. 블록 안에서 yield된 dict에 부가 정보를 넣을 수 있다"""
+        attrs = {}
+        t0 = self.clock()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            self.record(name, self.clock() - t0, attrs, event, **labels)
+
+    def summary(self):
+        with self._lock:
+            counters = {name + _label_text(labels): v for (name, labels), v in self.counters.items()}
+            histograms = {name + _label_text(labels): h.summary() for (name, labels), h in self.histograms.items()}
+        return counters, histograms
+
+    def write_log(self, path, **extra):
+        """이벤트 줄 + 실행 요약 줄을 JSONL 파일 끝에 덧붙인다"""
+        counters, histograms = self.summary()
+        run = {"type": "run", "started": dt.datetime.fromtimestamp(self.started, dt.timezone.utc).isoformat(),
+               "seconds": round(self.clock() - self._t0, 6)}
+        run.update(extra)
+        run["counters"] = counters
+        run["histograms"] = histograms
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for ev in self.events + [run]:
+                f.write(json.dumps(dict(ev, run=self.run_id), ensure_ascii=False) + "\n")
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda kv: kv[0])
+        typed = set()
+        for (name, labels), value in counters:
+            metric = METRICS_PREFIX + name + "_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_label_text(labels)} {value}")
+        for (name, labels), h in histograms:
+            metric = METRICS_PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ("+Inf",), h.counts):
+                cumulative += n
+                lines.append(f"{metric}_bucket{_label_text(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{metric}_sum{_label_text(labels)} {h.sum:.6f}")
+            lines.append(f"{metric}_count{_label_text(labels)} {h.count}")
+        lines.append(f"# TYPE {METRICS_PREFIX}last_run_timestamp_seconds gauge")
+        lines.append(f"{METRICS_PREFIX}last_run_timestamp_seconds {self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """node_exporter textfile collector 형식 (임시 파일에 쓰고 교체해 반쯤 쓴 파일을 읽지 않게)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+_recorder = Recorder() if METRICS else None
+
+
+def enabled():
+    return _recorder is not None
+
+
+def enable():
+    """계측을 켠다 (테스트/벤치마크용 - 이미 import 시점에 timed로 감싼 함수에는 적용되지 않음)"""
+    global _recorder
+    _recorder = Recorder()
+    return _recorder
+
+
+def disable():
+    global _recorder
+    _recorder = None
+
+
+def span(name, event=True, **labels):
+    """with metrics.span("gemini_call", kind="packed") as attrs: ... (꺼져 있으면 아무 일도 하지 않음)"""
+    if _recorder is None:
+        return _NOOP
+    return _recorder.span(name, event, **labels)
+
+
+def record(name, seconds, attrs=None, **labels):
+    if _recorder is not None:
+        _recorder.record(name, seconds, attrs, **labels)
+
+
+def count(name, value=1, **labels):
+    if _recorder is not None:
+        _recorder.count(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    if _recorder is not None:
+        _recorder.observe(name, value, **labels)
+
+
+def timed(name, event=False):
+    """
+    함수 호출 시간을 <name>_seconds 히스토그램에 기록하는 데코레이터.
+    event=False면 이벤트를 남기지 않는다 (항목마다 불리는 함수용).
+    import 시점에 계측이 꺼져 있으면 원래 함수를 그대로 돌려주므로 비용이 없다.
+    """
+    def decorate(fn):
+        if _recorder is None:
+            return fn
+
+        key = _key(name + "_seconds", {})
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            recorder = _recorder
+            if recorder is None:
+                return fn(*args, **kwargs)
+            t0 = recorder.clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if event:
+                    recorder.record(name, recorder.clock() - t0)
+                else:
+                    recorder.observe_key(key, recorder.clock() - t0)
+        return wrapper
+    return decorate
+
+
+def flush(log_path=None, prom_path=None, **extra):
+    """
+    모은 기록을 JSONL 실행 기록(과 설정된 경우 Prometheus textfile)에 쓰고 새 실행을 시작한다.
+    extra는 실행 요약 줄에 들어간다 (mode 등).
+    """
+    global _recorder
+    if _recorder is None:
+        return
+    recorder, _recorder = _recorder, Recorder()
+    log_path = log_path or METRICS_LOG_PATH
+    prom_path = prom_path if prom_path is not None else METRICS_PROM_PATH
+    try:
+        recorder.write_log(log_path, **extra)
+        if prom_path:
+            recorder.write_prometheus(prom_path)
+        print(f"[INFO] Metrics: {len(recorder.events)} spans written to {log_path}"
+              + (f", Prometheus textfile {prom_path}" if prom_path else ""))
+    except OSError as e:
+        print(f"[WARN] Failed to write metrics: {e}")
+
+
+def test_metrics():
+    import tempfile
+    rec = Recorder()
+    with rec.span("feed_fetch", feed="A") as attrs:
+        attrs["bytes"] = 10
+    rec.record("feed_fetch", 0.2, feed="B")
+    rec.record("normalize_entry", 0.00002, event=False)
+    rec.count("feeds_not_modified", 3)
+    rec.count("slack_posts", status=200)
+    rec.count("slack_posts", status=200)
+    rec.observe("gemini_items_per_call", 15)
+    try:
+        with rec.span("gemini_call", kind="packed"):
+            raise RuntimeError("429")
+    except RuntimeError:
+        pass
+
+    counters, histograms = rec.summary()
+    assert counters == {"feeds_not_modified": 3, 'slack_posts{status="200"}': 2}, counters
+    assert histograms['feed_fetch_seconds{feed="B"}']["count"] == 1
+    assert histograms["normalize_entry_seconds"]["p50"] == 0.00002  # 구간 상한(0.000025)보다 최댓값이 작음
+    assert [e["name"] for e in rec.events] == ["feed_fetch", "feed_fetch", "gemini_call"]
+    assert rec.events[0]["bytes"] == 10 and rec.events[2]["error"] == "RuntimeError"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log, prom = os.path.join(tmp, "run.jsonl"), os.path.join(tmp, "m.prom")
+        rec.write_log(log, mode="TEST")
+        rec.write_prometheus(prom)
+        with open(log, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        assert lines[-1]["type"] == "run" and lines[-1]["mode"] == "TEST" and len(lines) == 4
+        assert len({line["run"] for line in lines}) == 1
+        text = open(prom, encoding="utf-8").read()
+        assert 'ai_news_feed_fetch_seconds_bucket{feed="B",le="0.25"} 1' in text
+        assert 'ai_news_feed_fetch_seconds_bucket{feed="B",le="+Inf"} 1' in text
+        assert "ai_news_feeds_not_modified_total 3" in text
+        assert "# TYPE ai_news_gemini_items_per_call histogram" in text
+
+    # 꺼져 있으면 timed는 원래 함수를 그대로 돌려준다
+    global _recorder
+    saved = _recorder
+    try:
+        _recorder = None
+        fn = lambda x: x
+        assert timed("x")(fn) is fn and span("x") is _NOOP
+    finally:
+        _recorder = saved
+    print("[INFO] Metrics test passed")
+
+
+def benchmark_overhead(n=200_000):
+    """계측을 켜고 끈 상태에서 호출당 추가 비용"""
+    global _recorder
+    saved = _recorder
+
+    def work(x):
+        return x + 1
+
+    def loop(fn):
+        t0 = time.perf_counter()
+        for i in range(n):
+            fn(i)
+        return (time.perf_counter() - t0) / n
+
+    def loop_span():
+        t0 = time.perf_counter()
+        for i in range(n):
+            with span("work", event=False):
+                work(i)
+        return (time.perf_counter() - t0) / n
+
+    try:
+        base = loop(work)
+        _recorder = None
+        off_timed, off_span = loop(timed("work")(work)), loop_span()
+        _recorder = Recorder()
+        on_timed, on_span = loop(timed("work")(work)), loop_span()
+    finally:
+        _recorder = saved
+    print(f"[BENCH] bare call:          {base * 1e9:6.0f} ns")
+    print(f"[BENCH] disabled timed/span: +{(off_timed - base) * 1e9:5.0f} / +{(off_span - base) * 1e9:5.0f} ns per call")
+    print(f"[BENCH] enabled  timed/span: +{(on_timed - base) * 1e9:5.0f} / +{(on_span - base) * 1e9:5.0f} ns per call")
+
+
+if __name__ == "__main__":
+    test_metrics()
+    benchmark_overhead()
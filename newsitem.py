@@ -0,0 +1,227 @@
+import sys, time, hashlib, datetime as dt
+from typing import Optional
+import pytz
+from textnorm import truncate_html
+
+# RSS 초록의 최대 길이 (Gemini 프롬프트 크기 절약)
+MAX_SUMMARY_LENGTH = 1500
+
+# utils.TZ와 같은 객체 (pytz가 시간대 객체를 캐시한다) - utils가 이 모듈을 읽으므로 여기서 따로 만든다
+TZ = pytz.timezone("Asia/Seoul")
+
+
+def make_id(link: str, title: str = "", published: Optional[str] = None) -> str:
+    # URL 우선, 없으면 title+published 해시
+    key = link or (title + "|" + (published or ""))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class NewsItem:
+    """
+    뉴스 항목 하나 (fetch → 필터 → 묶기 → 요약 → 전송까지 같은 객체가 흐른다)
+
+    항목마다 dict를 두는 대신 __slots__로 필드를 고정해 항목당 메모리를 줄이고,
+    발행 시각은 epoch 초(float)로만 들고 있어 정렬/기간 비교가 숫자 비교로 끝난다.
+    같은 피드의 source 문자열은 intern해 한 객체를 같이 쓴다.
+
+    파생 필드는 처음 읽을 때 만든다:
+        id: 주어지지 않았으면 make_id(link, title, published)
+        summary: 원본 HTML 초록을 truncate_html로 정리/자른 평문 (정리한 뒤 원본은 버린다)
+        published_dt / date_str: ts에서 만든 KST datetime / "%m/%d %H:%M"
+    요약 단계까지 가지 않는 항목(기간 밖, 이미 본 항목, 상위 MAX_GEMINI_ITEMS 밖)은 초록을 정리하지 않는다.
+    """
+
+    __slots__ = ("source", "title", "link", "published", "ts", "summary_ko", "has_summary", "duplicates",
+                 "_id", "_summary", "_truncated")
+
+    def __init__(self, source: str, title: str = "", link: str = "", published: Optional[str] = None,
+                 ts: Optional[float] = None, summary: str = "", id: Optional[str] = None):
+        """
+        Args:
+            source: 피드 이름
+            published: 피드의 원래 발행 시각 문자열 (ID 계산용)
+            ts: 발행 시각 (epoch 초, 날짜가 없으면 None)
+            summary: 원본 초록 (HTML 그대로)
+            id: 이미 계산한 항목 ID (utils.raw_entry_id)
+        """
+        self.source = sys.intern(source) if source else source
+        self.title = title
+        self.link = link
+        self.published = published
+        self.ts = ts
+        self.summary_ko = None
+        self.has_summary = False
+        # 같은 소식을 다룬 다른 소스 항목 (cluster.py가 대표 항목에만 리스트를 단다)
+        self.duplicates = ()
+        self._id = id
+        self._summary = summary or ""
+        self._truncated = None  # None이면 _summary가 아직 정리하지 않은 원본
+
+    @property
+    def id(self) -> str:
+        if self._id is None:
+            self._id = make_id(self.link, self.title, self.published)
+        return self._id
+
+    def _clean(self):
+        if self._truncated is None:
+            self._summary, self._truncated = truncate_html(self._summary, MAX_SUMMARY_LENGTH)
+
+    @property
+    def summary(self) -> str:
+        """정리한 초록 (최대 MAX_SUMMARY_LENGTH 글자)"""
+        self._clean()
+        return self._summary
+
+    @summary.setter
+    def summary(self, value: str):
+        self._summary = value or ""
+        self._truncated = None
+
+    @property
+    def summary_truncated(self) -> bool:
+        self._clean()
+        return self._truncated
+
+    @property
+    def published_dt(self) -> Optional[dt.datetime]:
+        if self.ts is None:
+            return None
+        return dt.datetime.fromtimestamp(self.ts, TZ)
+
+    @property
+    def date_str(self) -> str:
+        """메시지에 쓰는 발행 시각 (KST, 날짜가 없으면 빈 문자열)"""
+        if self.ts is None:
+            return ""
+        return self.published_dt.strftime("%m/%d %H:%M")
+
+    def __repr__(self):
+        return f"NewsItem({self.source!r}, {self.title[:40]!r}, {self.link!r})"
+
+
+def test_newsitem():
+    item = NewsItem("Feed A", "Title", "https://e.com/1", "Wed, 01 May 2024 12:00:00 +0000", 1714564800.0,
+                    "<p>Hello &amp; <b>world</b></p>")
+    other = NewsItem("".join(["Feed", " A"]), "T2", "https://e.com/2")
+    assert item.source is other.source, "source should be interned"
+    assert item.id == make_id("https://e.com/1") and NewsItem("s", id="abc").id == "abc"
+    assert item._truncated is None, "summary should be cleaned on first access"
+    assert item.summary == "Hello & world" and item.summary_truncated is False
+    item.summary = "x" * (MAX_SUMMARY_LENGTH + 10)
+    assert len(item.summary) == MAX_SUMMARY_LENGTH and item.summary_truncated
+    assert item.date_str == "05/01 21:00" and item.published_dt.tzinfo is not None
+    assert other.date_str == "" and other.published_dt is None
+    assert not hasattr(item, "__dict__")
+    print("[INFO] NewsItem test passed")
+
+
+def _synthetic_entries(n: int, now: float, seed: int = 0):
+    """
+    n개의 피드 항목 (feedscan.FeedEntry, 200개 피드, now 전 3일에 고르게, HTML 초록 400~1200자)을
+    feedscan.select_entries처럼 (피드 이름, 항목, ID, 발행 시각 epoch)로 하나씩 만든다
+    """
+    import random
+    from email.utils import format_datetime
+    from feedscan import FeedEntry
+    from utils import raw_entry_id
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(5000)]
+    for i in range(n):
+        stamp = float(int(now - rng.uniform(0, 3 * 86400)))
+        body = " ".join(rng.choices(words, k=rng.randint(60, 180)))
+        raw = FeedEntry(title=f"Story {i} " + " ".join(rng.choices(words, k=8)),
+                        link=f"https://site{i % 200}.example/posts/{i}",
+                        published=format_datetime(dt.datetime.fromtimestamp(stamp, dt.timezone.utc)),
+                        summary=f"<p>{body}</p><p><a href='https://x.example'>Read more</a> &hellip;</p>")
+        raw.published_parsed = time.gmtime(stamp)
+        yield f"Feed {i % 200}", raw, raw_entry_id(raw), stamp
+
+
+def benchmark_items(n: int = 100_000, top: int = 80):
+    """
+    항목 n개에서 dict 표현(기존)과 NewsItem의 항목당 메모리와 한 번의 실행 시간을 비교한다.
+
+    메모리: 피드 항목을 하나씩 만들어 정규화하고 원본은 버린 뒤 남은 크기 (문자열 포함)
+    실행: 정규화 → 어제 하루 기간 필터 → 이미 본 항목 제외(절반) → 최신순 정렬 →
+    상위 top개의 초록을 프롬프트용으로 읽기 → 메시지 줄 만들기.
+    dict 표현은 기존 main.py처럼 정규화할 때 날짜를 다시 파싱하고 모든 항목의 초록을 정리한다.
+    """
+    import gc, tracemalloc
+    from utils import entry_datetime, normalize_entry
+
+    end = dt.datetime.now(TZ).replace(microsecond=0)
+    window = (end - dt.timedelta(days=1), end)
+    lo, hi = window[0].timestamp(), window[1].timestamp()
+    corpus = list(_synthetic_entries(n, hi))
+    seen = set(rid for _, _, rid, _ in corpus[::2])
+    print(f"[BENCH] {n} items from {len(set(c[0] for c in corpus))} feeds")
+
+    def as_dict(source, raw, rid, ts):
+        # 기존 utils.normalize_entry + main._parse_result
+        e = {
+            "source": source,
+            "title": raw.title.strip(),
+            "link": raw.link.strip(),
+            "published": raw.published,
+            "published_dt": entry_datetime(raw, source),
+            "published_parsed": raw.published_parsed,
+            "__id": rid,
+        }
+        e["summary"], e["summary_truncated"] = truncate_html(raw.summary, MAX_SUMMARY_LENGTH)
+        e["summary_clean"] = True
+        return e
+
+    def as_item(source, raw, rid, ts):
+        return normalize_entry(raw, source, ts=ts, id=rid)
+
+    def run_dicts(items):
+        kept = [e for e in items if e["published_dt"] and window[0] <= e["published_dt"] <= window[1]]
+        new = [e for e in kept if e["__id"] not in seen]
+        new.sort(key=lambda e: e["published_dt"].timestamp() if e["published_dt"] else float("-inf"), reverse=True)
+        prompt = sum(len(e["summary"]) for e in new[:top])
+        lines = [f"• [{e['source']}] {e['title']} ({e['published_dt'].strftime('%m/%d %H:%M')})\n  {e['link']}"
+                 for e in new]
+        return len(new), prompt, lines
+
+    def run_items(items):
+        kept = [e for e in items if e.ts is not None and lo <= e.ts <= hi]
+        new = [e for e in kept if e.id not in seen]
+        new.sort(key=lambda e: e.ts, reverse=True)
+        prompt = sum(len(e.summary) for e in new[:top])
+        lines = [f"• [{e.source}] {e.title} ({e.date_str})\n  {e.link}" for e in new]
+        return len(new), prompt, lines
+
+    results = {}
+    for name, build, run in (("dict", as_dict, run_dicts), ("NewsItem", as_item, run_items)):
+        gc.collect()
+        tracemalloc.start()
+        items = [build(*entry) for entry in _synthetic_entries(n, hi)]
+        gc.collect()
+        per_item = tracemalloc.get_traced_memory()[0] / n
+        tracemalloc.stop()
+        del items
+        gc.collect()
+
+        t0 = time.perf_counter()
+        items = [build(*entry) for entry in corpus]
+        t_build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        count, prompt, lines = run(items)
+        t_run = time.perf_counter() - t0
+        results[name] = (per_item, t_build, t_run, count, prompt, lines)
+        print(f"[BENCH] {name:<8}: {per_item:6.0f} B/item, build {t_build:.2f}s + "
+              f"filter/sort/format {t_run:.2f}s = {t_build + t_run:.2f}s, {count} new items")
+        del items
+        gc.collect()
+
+    d, s = results["dict"], results["NewsItem"]
+    assert d[3:] == s[3:], "both representations should produce the same messages"
+    print(f"[BENCH] NewsItem: {1 - s[0] / d[0]:.0%} less memory per item, "
+          f"{(d[1] + d[2]) / (s[1] + s[2]):.1f}x faster end to end")
+    return results
+
+
+if __name__ == "__main__":
+    test_newsitem()
+    benchmark_items()
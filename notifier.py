@@ -1,36 +1,494 @@
-import os, requests
+import os, json, time, queue, threading, hashlib, requests
+from requests.adapters import HTTPAdapter
+from ratelimit import backoff_delay
+import journal, metrics
 
 # Slack 메시지 최대 크기 (바이트) - 안전 여유분 포함
 SLACK_MAX_BYTES = 39_000  # 실제 제한은 40KB, 여유분 둄음
 
-def send_slack(title, body):
+# 보내지 못한 메시지를 다음 실행에서 다시 보내기 위한 스풀 파일
+SLACK_SPOOL_PATH = os.path.join("data", "slack-spool.jsonl")
+
+# 429/5xx/네트워크 오류 재시도 횟수, Retry-After 최대 대기(초), 종료 시 전송 완료를 기다리는 시간(초)
+SLACK_MAX_RETRIES = int(os.getenv("SLACK_MAX_RETRIES", "5"))
+SLACK_MAX_RETRY_AFTER = float(os.getenv("SLACK_MAX_RETRY_AFTER", "60"))
+SLACK_FLUSH_TIMEOUT = float(os.getenv("SLACK_FLUSH_TIMEOUT", "120"))
+
+_CUT_MARK = "\n\n⚠️ ...[메시지 길이 제한으로 절단됨]"
+
+def cut_utf8(text, max_bytes):
     """
-    Slack Webhook으로 메시지 전송.
-    메시지가 제한 크기를 초과하면 자동 절단한다.
+    UTF-8로 max_bytes 바이트 이하가 되도록 한 번에 자른다 (글자 중간에서 자르지 않음).
+    """
+    data = text.encode("utf-8")
+    if len(data) <= max_bytes:
+        return text
+    # 잘린 마지막 글자의 앞부분 바이트는 decode에서 버려진다
+    return data[:max(0, max_bytes)].decode("utf-8", "ignore")
+
+def _truncate(text):
+    # UTF-8 바이트 길이로 제한 확인 (Slack은 바이트 기준 제한)
+    size = len(text.encode("utf-8"))
+    if size > SLACK_MAX_BYTES:
+        print(f"[WARN] Message too long ({size} bytes), truncating to {SLACK_MAX_BYTES} bytes...")
+        text = cut_utf8(text, SLACK_MAX_BYTES - len(_CUT_MARK.encode("utf-8"))) + _CUT_MARK
+        print(f"[INFO] Truncated to {len(text.encode('utf-8'))} bytes")
+    return text
+
+def _fit_line(line, budget):
+    """
+    한 줄(항목 하나)이 budget보다 크면 잘라서 맞춘다.
+    마지막 줄(링크)은 남기고 그 앞 본문을 자른다.
     """
-    webhook = os.getenv("SLACK_WEBHOOK")
+    mark = " …"
+    head, sep, tail = line.rpartition("\n")
+    tail_bytes = len(tail.encode("utf-8")) + 1
+    if sep and tail_bytes < budget // 2:
+        return cut_utf8(head, budget - tail_bytes - len(mark.encode("utf-8"))) + mark + "\n" + tail
+    return cut_utf8(line, budget - len(mark.encode("utf-8"))) + mark
+
+def pack_lines(lines, budget, sep="\n\n", first_budget=None):
+    """
+    포맷한 항목 줄들을 순서대로, 페이지당 UTF-8 크기가 budget 이하가 되도록 나눈다.
+
+    각 줄의 바이트 길이는 한 번만 계산하고 앞에서부터 채운다 (순서를 지키는 분할에서는
+    이렇게 채우는 것이 페이지 수가 가장 적다). 한 줄이 budget보다 크면 그 줄만 잘라
+    한 페이지에 넣으므로 항목이 빠지는 일은 없다.
+
+    Args:
+        lines: 항목별 문자열
+        budget: 페이지 본문 최대 바이트
+        sep: 줄 구분자
+        first_budget: 첫 페이지만 다른 한도를 쓸 때 (제목/안내 문구가 더 긴 경우)
+
+    Returns:
+        페이지별 줄 리스트
+    """
+    sep_size = len(sep.encode("utf-8"))
+    pages, current = [], []
+    limit = budget if first_budget is None else first_budget
+    used = 0
+    for line in lines:
+        size = len(line.encode("utf-8"))
+        if current and used + sep_size + size > limit:
+            pages.append(current)
+            current, used, limit = [], 0, budget
+        if not current and size > limit:
+            line = _fit_line(line, limit)
+            size = len(line.encode("utf-8"))
+        used += size + (sep_size if current else 0)
+        current.append(line)
+    if current:
+        pages.append(current)
+    return pages
+
+def _retry_after(resp):
+    try:
+        return min(SLACK_MAX_RETRY_AFTER, max(0.0, float(resp.headers.get("Retry-After", "1"))))
+    except ValueError:
+        return 1.0
+
+
+class SlackDelivery:
+    def __init__(self, webhook, spool_path=SLACK_SPOOL_PATH, max_retries=SLACK_MAX_RETRIES,
+                 timeout=10, sleep=time.sleep):
+        """
+        Slack Webhook 전송기
+
+        - 연결을 재사용하는 세션 하나로 보낸다.
+        - 보낼 메시지는 큐에 넣고 전용 스레드 하나가 넣은 순서대로 보낸다 (호출은 바로 반환).
+        - 429는 Retry-After만큼 기다렸다가 같은 메시지를 다시 보내고, 5xx/네트워크 오류는
+          지수 백오프로 재시도한다. 재시도를 다 써도 실패하면 순서를 지키기 위해 뒤 메시지도 멈춘다.
+        - 큐에 넣는 순간 스풀 파일에 기록(fsync)하고 전송에 성공하면 ack를 남긴다.
+          중간에 프로세스가 죽어도 다음 실행에서 ack 없는 메시지를 순서대로 다시 보낸다.
+          메시지에 담긴 항목 ID도 같이 기록해 두어 (spooled_ids) 이어서 하는 실행이 다시 보내지 않게 한다.
+
+        Args:
+            webhook: Slack Webhook URL
+            spool_path: 스풀 파일 경로
+            max_retries: 재시도 횟수
+            timeout: 요청 제한 시간(초)
+            sleep: 테스트용 대기 함수
+        """
+        self.webhook = webhook
+        self.spool_path = spool_path
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.sleep = sleep
+        self.sent = self.retried = self.failed = 0
+        self.stalled = False
+        self.name = None
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        self._queue = queue.Queue()
+        self._spool_lock = threading.Lock()
+        self._next_id = 0
+        self._pending = 0
+        # 지난 실행의 스풀에 있던 메시지의 항목 ID (보냈거나 이제 다시 보낼 항목)
+        self.spooled_ids = set()
+
+        for msg_id, text in self._load_spool():
+            self._next_id = max(self._next_id, msg_id + 1)
+            self._pending += 1
+            self._queue.put((msg_id, text))
+        if self._pending:
+            print(f"[INFO] Re-sending {self._pending} Slack messages left from a previous run")
+
+        self._worker = threading.Thread(target=self._run, name="slack", daemon=True)
+        self._worker.start()
+
+    def _load_spool(self):
+        """ack 없는 (id, text)를 기록 순서대로"""
+        if not os.path.exists(self.spool_path):
+            return []
+        messages, acked = {}, set()
+        good = 0
+        with open(self.spool_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # 기록 도중 종료되어 잘린 마지막 줄
+                    break
+                good += len(line)
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if rec.get("op") == "msg":
+                    messages[rec["id"]] = rec["text"]
+                    self.spooled_ids.update(rec.get("ids", ()))
+                elif rec.get("op") == "ack":
+                    acked.add(rec["id"])
+        if os.path.getsize(self.spool_path) > good:
+            # 잘린 줄을 잘라 내야 뒤에 덧붙이는 기록이 그 줄에 붙지 않는다
+            with open(self.spool_path, "r+b") as f:
+                f.truncate(good)
+        return [(i, t) for i, t in messages.items() if i not in acked]
+
+    def _append_spool(self, rec, sync=True):
+        os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def send(self, title, body, ids=None):
+        """메시지를 스풀에 기록하고 전송 큐에 넣는다 (전송 완료를 기다리지 않음). ids: 메시지에 담긴 항목 ID"""
+        text = _truncate(f"*{title}*\n{body}")
+        rec = {"op": "msg", "text": text}
+        if ids:
+            rec["ids"] = list(ids)
+        with self._spool_lock:
+            msg_id = rec["id"] = self._next_id
+            self._next_id += 1
+            self._pending += 1
+            self._append_spool(rec)
+        self._queue.put((msg_id, text))
+
+    def _ack(self, msg_id):
+        with self._spool_lock:
+            self._pending -= 1
+            if self._pending == 0:
+                # 모두 보냈으면 스풀을 비운다
+                if os.path.exists(self.spool_path):
+                    os.remove(self.spool_path)
+            else:
+                self._append_spool({"op": "ack", "id": msg_id}, sync=False)
+
+    def _post(self, text):
+        """
+        메시지 하나를 보낸다.
+        Returns: "sent" | "dropped" (다시 보내도 소용없는 오류) | "failed" (재시도 소진)
+        """
+        attempt = 0
+        while True:
+            try:
+                with metrics.span("slack_post") as attrs:
+                    attrs.update(bytes=len(text.encode("utf-8")), attempt=attempt)
+                    resp = self.session.post(self.webhook, json={"text": text}, timeout=self.timeout)
+                    attrs["status"] = resp.status_code
+                metrics.count("slack_posts", status=resp.status_code)
+            except requests.exceptions.RequestException as e:
+                print(f"[ERROR] Slack webhook 전송 실패: {e}")
+                metrics.count("slack_posts", status="error")
+                delay = backoff_delay(attempt)
+            else:
+                if resp.status_code < 300:
+                    return "sent"
+                if resp.status_code == 429:
+                    delay = _retry_after(resp)
+                    print(f"[WARN] Slack rate limited, retrying in {delay:.1f}s")
+                elif resp.status_code >= 500:
+                    print(f"[ERROR] Slack webhook HTTP 오류: {resp.status_code} - {resp.text[:200]}")
+                    delay = backoff_delay(attempt)
+                else:
+                    # 잘못된 요청/삭제된 Webhook 등은 다시 보내도 실패한다
+                    print(f"[ERROR] Slack webhook HTTP 오류: {resp.status_code} - {resp.text[:200]}")
+                    return "dropped"
+            if attempt >= self.max_retries:
+                return "failed"
+            attempt += 1
+            self.retried += 1
+            metrics.count("slack_retries")
+            self.sleep(delay)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                if self.stalled:
+                    continue
+                msg_id, text = job
+                result = self._post(text)
+                if result == "sent":
+                    self.sent += 1
+                    print("[INFO] Message sent successfully")
+                    self._ack(msg_id)
+                elif result == "dropped":
+                    self.failed += 1
+                    self._ack(msg_id)
+                else:
+                    # 순서를 지키기 위해 뒤 메시지도 보내지 않고 스풀에 남긴다
+                    self.failed += 1
+                    self.stalled = True
+                    print("[ERROR] Slack delivery stalled - remaining messages stay in the spool for the next run")
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout=None):
+        """큐가 빌 때까지 (또는 timeout초) 기다린다. 모두 처리했으면 True."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=None):
+        done = self.flush(timeout)
+        self._queue.put(None)
+        if done:
+            self._worker.join(timeout=1)
+        self.session.close()
+        return done
+
+    @property
+    def pending(self):
+        return self._pending
+
+
+# Webhook URL별 전송기 (SLACK_WEBHOOK과 주제별 라우트 Webhook, router.py)
+_deliveries = {}
+
+def _spool_path(webhook):
+    """SLACK_WEBHOOK은 기존 스풀 파일, 다른 Webhook은 URL 해시로 구분한 스풀 파일"""
+    if webhook == os.getenv("SLACK_WEBHOOK"):
+        return SLACK_SPOOL_PATH
+    digest = hashlib.sha256(webhook.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(os.path.dirname(SLACK_SPOOL_PATH), f"slack-spool-{digest}.jsonl")
+
+def get_delivery(webhook=None, name=None):
+    """
+    webhook(기본 SLACK_WEBHOOK)용 전송기 (처음 호출할 때 만들며, 스풀에 남은 메시지를 먼저 보낸다)
+
+    Args:
+        name: 로그에 쓰는 이름 (라우트 이름)
+    """
+    webhook = webhook or os.getenv("SLACK_WEBHOOK")
     if not webhook:
+        return None
+    delivery = _deliveries.get(webhook)
+    if delivery is None:
+        delivery = _deliveries[webhook] = SlackDelivery(webhook, spool_path=_spool_path(webhook))
+        delivery.name = name
+        if delivery.spooled_ids:
+            # 스풀에는 들어갔지만 journal에 기록하기 전에 죽은 메시지도 보낸 것으로 친다
+            journal.record_sent(webhook, delivery.spooled_ids)
+    return delivery
+
+def send_slack(title, body, webhook=None, ids=None):
+    """
+    Slack Webhook(기본 SLACK_WEBHOOK)으로 메시지 전송 (SlackDelivery 큐에 넣고 바로 반환).
+    메시지가 제한 크기를 초과하면 자동 절단한다.
+    ids(메시지에 담긴 항목 ID)를 주면 스풀에 넣은 뒤 실행 journal에 보낸 것으로 기록한다.
+    """
+    delivery = get_delivery(webhook)
+    if delivery is None:
         print("[WARN] SLACK_WEBHOOK 환경변수 미설정")
         return
+    delivery.send(title, body, ids)
+    if ids:
+        journal.record_sent(delivery.webhook, ids)
 
-    text = f"*{title}*\n{body}"
+def flush_slack(timeout=SLACK_FLUSH_TIMEOUT, close=True):
+    """
+    보낸 메시지가 모두 전송될 때까지 기다리고 전송기를 닫는다 (프로세스 종료 전에 호출).
+    close=False면 기다리기만 하고 전송기(세션, 전송 스레드)는 다음 실행을 위해 남겨 둔다.
+    전송기가 여럿이면 (주제별 라우트) timeout 안에서 차례로 기다린다.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    ok = True
+    for webhook, delivery in list(_deliveries.items()):
+        done = delivery.flush(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if close or delivery.stalled:
+            # 멈춘 전송기는 닫고, 남은 메시지는 다음 실행에서 스풀부터 다시 보낸다
+            del _deliveries[webhook]
+            delivery.close(0)
+        label = f" [{delivery.name}]" if delivery.name else ""
+        print(f"[INFO] Slack delivery{label}: {delivery.sent} sent, {delivery.retried} retries, "
+              f"{delivery.failed} failed, {delivery.pending} left in spool")
+        ok = ok and done and delivery.pending == 0
+    return ok
 
-    # UTF-8 바이트 길이로 제한 확인 (Slack은 바이트 기준 제한)
-    text_bytes = text.encode("utf-8")
-    if len(text_bytes) > SLACK_MAX_BYTES:
-        print(f"[WARN] Message too long ({len(text_bytes)} bytes), truncating to {SLACK_MAX_BYTES} bytes...")
-        # 바이트 경계에서 잘라내면 한글 글자가 깨질 수 있으므로 문자 단위로 절단
+
+def test_delivery():
+    """
+    429(Retry-After)와 지연을 섞어 보내는 로컬 Webhook으로
+    순서 유지, 재시도, 스풀 재전송(중간 종료 후 다음 실행)을 확인한다.
+    """
+    import tempfile
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    received = []
+    state = {"calls": 0, "down": False}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                state["calls"] += 1
+                n = state["calls"]
+            time.sleep(0.02)
+            if state["down"]:
+                code, headers = 503, {}
+            elif n % 3 == 0:
+                code, headers = 429, {"Retry-After": "0.05"}
+            else:
+                code, headers = 200, {}
+                with lock:
+                    received.append(json.loads(body)["text"])
+            payload = {200: b"ok", 429: b"rate_limited"}.get(code, b"unavailable")
+            self.send_response(code)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/hook"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        spool = os.path.join(tmp, "spool.jsonl")
+
+        # 1) 429가 섞여도 모두 순서대로 도착
+        d = SlackDelivery(url, spool_path=spool)
+        t0 = time.perf_counter()
+        for i in range(12):
+            d.send(f"msg {i}", "body")
+        enqueue = time.perf_counter() - t0
+        assert d.close(timeout=30)
+        assert received == [f"*msg {i}*\nbody" for i in range(12)], received
+        assert not os.path.exists(spool)
+        print(f"[TEST] 12 messages in order with {d.retried} 429 retries (enqueue took {enqueue * 1e3:.1f} ms)")
+
+        # 2) Webhook이 죽어 있는 동안 보낸 메시지는 스풀에 남고, 다음 실행에서 순서대로 재전송
+        received.clear()
+        state["down"] = True
+        d = SlackDelivery(url, spool_path=spool, max_retries=1, sleep=lambda s: None)
+        for i in range(3):
+            d.send(f"late {i}", "body")
+        d.close(timeout=10)
+        assert d.pending == 3 and received == []
+        state["down"] = False
+        d = SlackDelivery(url, spool_path=spool)
+        d.send("late 3", "body")
+        assert d.close(timeout=30)
+        assert received == [f"*late {i}*\nbody" for i in range(4)], received
+        assert not os.path.exists(spool)
+        print("[TEST] spooled messages re-delivered in order on the next run")
+
+    server.shutdown()
+    print("[INFO] Slack delivery test passed")
+
+
+def _legacy_truncate(text):
+    """기존 send_slack 절단 (50글자씩 줄이며 매번 전체를 다시 인코딩) - 벤치마크 비교용"""
+    if len(text.encode("utf-8")) > SLACK_MAX_BYTES:
         truncated = text
-        while len(truncated.encode("utf-8")) > SLACK_MAX_BYTES - 100:  # "...[절단]" 표시용 여유분
-            truncated = truncated[:-50]  # 50자씩 줄임
-        text = truncated + "\n\n⚠️ ...[메시지 길이 제한으로 절단됨]"
-        print(f"[INFO] Truncated to {len(text.encode('utf-8'))} bytes")
+        while len(truncated.encode("utf-8")) > SLACK_MAX_BYTES - 100:
+            truncated = truncated[:-50]
+        text = truncated + _CUT_MARK
+    return text
 
-    try:
-        resp = requests.post(webhook, json={"text": text}, timeout=10)
-        resp.raise_for_status()
-        print("[INFO] Message sent successfully")
-    except requests.exceptions.HTTPError as e:
-        print(f"[ERROR] Slack webhook HTTP 오류: {e.response.status_code} - {e.response.text[:200]}")
-    except requests.exceptions.RequestException as e:
-        print(f"[ERROR] Slack webhook 전송 실패: {e}")
\ No newline at end of file
+def _sample_lines(n, seed=0):
+    """format_summary 한 항목 모양의 줄 (한글 요약/영문 제목 섞음)"""
+    import random
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n):
+        if i % 2:
+            text = "📝 [VentureBeat] " + "오픈AI가 새로운 추론 모델을 공개했다. " * rng.randint(1, 4)
+        else:
+            text = "• [arXiv cs.AI] " + "Scaling laws for reasoning agents " * rng.randint(1, 4)
+        lines.append(f"{text}(10/18 09:{i % 60:02d})\n  https://example.com/{i}")
+    return lines
+
+def test_packer():
+    lines = _sample_lines(2000)
+    budget = 5000
+    pages = pack_lines(lines, budget)
+    assert [l for p in pages for l in p] == lines, "items must never be dropped or reordered"
+    assert all(len("\n\n".join(p).encode("utf-8")) <= budget for p in pages)
+    # 다음 페이지 첫 줄을 넣으면 넘쳐야 한다 (앞에서부터 꽉 채움)
+    for p, nxt in zip(pages, pages[1:]):
+        assert len("\n\n".join(p + nxt[:1]).encode("utf-8")) > budget
+
+    # 한 줄이 한도보다 크면 그 줄만 UTF-8 경계에서 자르고 링크 줄은 남긴다
+    huge = "📝 [X] " + "가나다라마바사" * 3000 + "\n  https://example.com/huge"
+    pages = pack_lines(["a", huge, "b"], 1000)
+    assert len(pages) == 3 and pages[0] == ["a"] and pages[2] == ["b"]
+    cut = pages[1][0]
+    assert len(cut.encode("utf-8")) <= 1000 and cut.endswith("https://example.com/huge")
+    for limit in range(0, 12):
+        assert len(cut_utf8("가나다라", limit).encode("utf-8")) <= limit
+    assert cut_utf8("가나다라", 7) == "가나"
+    print("[INFO] Packer test passed")
+
+def benchmark_packer(n_items=5000):
+    """5천 건짜리 본문: 기존 50글자씩 줄이는 절단과 줄 단위 바이트 패킹 비교"""
+    lines = _sample_lines(n_items)
+    body = "\n\n".join(lines)
+    print(f"[INFO] {n_items} items, {len(body.encode('utf-8')) / 1024:.0f} KB body")
+
+    t0 = time.perf_counter()
+    legacy = _legacy_truncate(body)
+    t_legacy = time.perf_counter() - t0
+    kept = legacy.count("https://")
+
+    t0 = time.perf_counter()
+    pages = pack_lines(lines, SLACK_MAX_BYTES - 128)
+    t_pack = time.perf_counter() - t0
+
+    print(f"[INFO] legacy truncate loop: {t_legacy * 1e3:8.1f} ms, 1 message, {kept}/{n_items} items kept")
+    print(f"[INFO] byte-budget packer:   {t_pack * 1e3:8.1f} ms, {len(pages)} messages, "
+          f"{sum(len(p) for p in pages)}/{n_items} items kept")
+    return t_legacy, t_pack
+
+
+if __name__ == "__main__":
+    test_packer()
+    benchmark_packer()
+    test_delivery()
@@ -0,0 +1,269 @@
+import time, heapq, itertools, threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import metrics
+
+
+class Pipeline:
+    def __init__(self, name: str):
+        """
+        제너레이터 단계를 이어 붙인 스트리밍 파이프라인
+
+        각 단계는 iterable을 받아 iterable을 돌려주는 함수다.
+        앞 단계가 항목을 내놓는 즉시 다음 단계가 처리하므로 느린 피드를 기다리는 동안에도
+        이미 받은 피드의 필터링/중복 제거가 진행된다.
+        단계별 소요 시간(자기 자신만의 시간)을 timings에 기록한다.
+        """
+        self.name = name
+        self.stages = []
+        self.timings = {}
+        self.counts = {}
+
+    def stage(self, name: str, fn):
+        self.stages.append((name, fn))
+        return self
+
+    def run(self, source, source_name: str = "source"):
+        """source부터 모든 단계를 거친 항목을 하나씩 yield 한다."""
+        names = [source_name] + [n for n, _ in self.stages]
+        inclusive = dict.fromkeys(names, 0.0)
+
+        it = self._timed(source, source_name, inclusive)
+        for name, fn in self.stages:
+            it = self._timed(fn(it), name, inclusive)
+        yield from it
+
+        # 단계 i의 시간에는 앞 단계에서 항목을 당겨 오는 시간이 포함되므로 빼 준다
+        previous = 0.0
+        for n in names:
+            self.timings[n] = self.timings.get(n, 0.0) + max(0.0, inclusive[n] - previous)
+            previous = inclusive[n]
+
+    def _timed(self, iterable, name, acc):
+        it = iter(iterable)
+        count = 0
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                acc[name] += time.perf_counter() - t0
+                self.counts[name] = count
+                return
+            acc[name] += time.perf_counter() - t0
+            count += 1
+            yield item
+
+    @contextmanager
+    def timer(self, name: str):
+        """스트림 밖에서 실행되는 단계(요약 마무리, 전송 등)의 시간 기록"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - t0
+
+    def report(self):
+        parts = []
+        for name, seconds in self.timings.items():
+            count = self.counts.get(name)
+            parts.append(f"{name}={seconds:.2f}s" + (f"({count})" if count is not None else ""))
+            metrics.record("pipeline_stage", seconds, {"items": count} if count is not None else None,
+                           pipeline=self.name, stage=name)
+        print(f"[INFO] Pipeline {self.name} timings: {', '.join(parts)}")
+
+
+class TopK:
+    def __init__(self, k: int, key):
+        """key가 큰 순서로 상위 k개만 유지하는 힙 (전체 정렬 대신 O(n log k))"""
+        self.k = k
+        self.key = key
+        self._heap = []
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def full(self):
+        return len(self._heap) >= self.k
+
+    def push(self, item):
+        """
+        항목을 넣는다. 상위 k개에서 밀려난 항목(들어가지 못한 자기 자신 포함)을 돌려주고,
+        밀려난 것이 없으면 None.
+        """
+        # 같은 key면 먼저 들어온 항목을 우선한다 (seq가 작을수록 힙 안에서 뒤로)
+        entry = (self.key(item), -next(self._seq), item)
+        if self.k <= 0:
+            return item
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return None
+        if entry[:2] > self._heap[0][:2]:
+            return heapq.heapreplace(self._heap, entry)[2]
+        return item
+
+    def items(self):
+        """key 내림차순 상위 항목"""
+        return [e[2] for e in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+
+class SummarizeStage:
+    def __init__(self, k: int, key, make_summarizer=None, group_size: int = 15, speculative: bool = False):
+        """
+        스트림을 받아 key 상위 k개를 요약하고 전체를 key 내림차순으로 돌려주는 마지막 단계
+
+        speculative면 상위 k개가 아직 다 차지 않은 동안 들어온 항목은 fetch가 끝나기 전에
+        group_size개씩 미리 요약을 시작한다. 이후 더 새로운 항목에 밀려난 항목의 요약은
+        요약 캐시에 남아 다음 실행이 재사용하지만 이번 실행에는 쓰이지 않는 유료 요청이다 (최대 k건).
+        k개가 찬 뒤에는 밀려날 수 있으므로 미리 요약하지 않는다.
+        요약기는 요청을 보내기 전에 호출한 스레드에서 한 번만 만든다 (요약 캐시/토큰 버킷이 하나).
+
+        Args:
+            k: 요약할 최대 항목 수 (MAX_GEMINI_ITEMS)
+            key: 정렬 키 (큰 값이 먼저)
+            make_summarizer: 요약기를 만드는 함수 (None이면 요약하지 않음)
+            group_size: 미리 요약을 시작하는 묶음 크기
+            speculative: fetch와 요약을 겹칠지 여부
+        """
+        self.top = TopK(k, key)
+        self.key = key
+        self.make_summarizer = make_summarizer
+        self.group_size = max(1, group_size)
+        self.speculative = speculative and make_summarizer is not None
+        self.summarizer = None
+        self.failed = False
+        self.rest = []
+        self._buffer = []
+        self._submitted = set()
+        self._futures = []
+        self._executor = None
+        self._init_lock = threading.Lock()
+
+    def _ensure_summarizer(self):
+        with self._init_lock:
+            if self.summarizer is None and not self.failed:
+                try:
+                    self.summarizer = self.make_summarizer()
+                except Exception as e:
+                    print(f"[ERROR] Gemini API 오류: {e}")
+                    print("[INFO] Falling back to original format")
+                    self.failed = True
+            return self.summarizer
+
+    def _summarize(self, group):
+        summarizer = self._ensure_summarizer()
+        if summarizer is not None:
+            summarizer.batch_summarize(group)
+
+    def _flush(self):
+        group, self._buffer = self._buffer, []
+        if self._ensure_summarizer() is None:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summarize")
+        self._submitted.update(id(item) for item in group)
+        self._futures.append(self._executor.submit(self._summarize, group))
+
+    def push(self, item):
+        admit_while_open = not self.top.full()
+        evicted = self.top.push(item)
+        if evicted is not None:
+            self.rest.append(evicted)
+        if self.speculative and admit_while_open and evicted is None:
+            self._buffer.append(item)
+            if len(self._buffer) >= self.group_size:
+                self._flush()
+
+    def consume(self, items):
+        for item in items:
+            self.push(item)
+        return self
+
+    def finish(self):
+        """
+        남은 상위 항목을 요약하고 (정렬된 전체 항목, 요약 사용 여부)를 반환한다.
+        """
+        top = self.top.items()
+        try:
+            for fut in self._futures:
+                fut.result()
+            if self.make_summarizer is not None:
+                remaining = [item for item in top if id(item) not in self._submitted]
+                if remaining:
+                    self._summarize(remaining)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+
+        wasted = sum(1 for item in self.rest if id(item) in self._submitted)
+        if self._submitted:
+            print(f"[INFO] Summarized {len(self._submitted)} items while fetching "
+                  f"({wasted} later dropped from top {self.top.k})")
+
+        self.rest.sort(key=self.key, reverse=True)
+        used = self.make_summarizer is not None and self.summarizer is not None and not self.failed
+        return top + self.rest, used
+
+
+def test_summarize_stage(n_items: int = 60, k: int = 20):
+    """
+    가짜 요약기로 SummarizeStage를 실행해 요약기를 한 번만 만드는지, 결과가 key 내림차순인지,
+    상위 k개만 요약하는지, 미리 요약(speculative)에서 밀려난 항목 수를 확인한다.
+    """
+    import random
+
+    class _Item:
+        def __init__(self, ts):
+            self.ts = ts
+            self.summary_ko = None
+
+    class _FakeSummarizer:
+        def __init__(self):
+            self.calls = 0
+            self._lock = threading.Lock()
+
+        def batch_summarize(self, group):
+            time.sleep(0.01)
+            with self._lock:
+                self.calls += 1
+            for item in group:
+                item.summary_ko = f"요약 {item.ts}"
+            return group
+
+    def run(speculative, group_size):
+        built = []
+
+        def make():
+            time.sleep(0.05)  # 모델 선택처럼 느린 생성 - 두 작업자가 동시에 만들면 드러난다
+            built.append(_FakeSummarizer())
+            return built[-1]
+
+        rng = random.Random(3)
+        items = [_Item(ts) for ts in rng.sample(range(1000), n_items)]
+        stage = SummarizeStage(k, lambda e: e.ts, make, group_size=group_size, speculative=speculative)
+        ordered, used = stage.consume(iter(items)).finish()
+
+        assert used and len(built) == 1, len(built)
+        assert [e.ts for e in ordered] == sorted((e.ts for e in items), reverse=True)
+        assert all(e.summary_ko == f"요약 {e.ts}" for e in ordered[:k])
+        extra = sum(1 for e in ordered[k:] if e.summary_ko is not None)
+        assert speculative or extra == 0
+        return extra, built[0].calls
+
+    extra, calls = run(speculative=False, group_size=5)
+    print(f"[TEST] summarize stage: 1 summarizer, {calls} requests, {extra} items summarized outside top {k}")
+    extra, calls = run(speculative=True, group_size=2)
+    print(f"[TEST] speculative: 1 summarizer, {calls} requests, {extra} items summarized then dropped from top {k}")
+
+    # 요약기를 만들지 못하면 요약 없이 정렬만 한다
+    def broken():
+        raise RuntimeError("no model")
+    stage = SummarizeStage(k, lambda e: e.ts, broken, group_size=2, speculative=True)
+    ordered, used = stage.consume(iter([_Item(ts) for ts in range(10)])).finish()
+    assert not used and [e.ts for e in ordered] == list(range(9, -1, -1))
+    print("[INFO] Summarize stage test passed")
+
+
+if __name__ == "__main__":
+    test_summarize_stage()
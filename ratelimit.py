@@ -0,0 +1,59 @@
+import time, random, threading
+
+
+class TokenBucket:
+    def __init__(self, requests_per_min: float, tokens_per_min: float = 0,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        분당 요청 수 + 분당 토큰 수를 함께 제한하는 토큰 버킷 (스레드 안전)
+
+        버킷은 최대 1분치만큼 채워지므로 처음에는 그만큼 바로 보낼 수 있고,
+        이후에는 분당 한도에 맞춰 일정하게 흘려보낸다.
+
+        Args:
+            requests_per_min: 분당 최대 요청 수
+            tokens_per_min: 분당 최대 토큰 수 (0이면 제한 없음)
+            clock, sleep: 테스트용 시계 주입
+        """
+        self.rpm = float(requests_per_min)
+        self.tpm = float(tokens_per_min)
+        self.clock = clock
+        self.sleep = sleep
+        self._req = self.rpm
+        self._tok = self.tpm
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        elapsed = now - self._last
+        self._last = now
+        self._req = min(self.rpm, self._req + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tok = min(self.tpm, self._tok + elapsed * self.tpm / 60.0)
+
+    def acquire(self, tokens: int = 0):
+        """요청 1건(+토큰 tokens개)을 보낼 수 있을 때까지 기다린다."""
+        # 한 요청이 분당 토큰 한도보다 크면 영원히 기다리지 않도록 한도로 자른다
+        tokens = min(tokens, self.tpm) if self.tpm else 0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._req >= 1 and self._tok >= tokens:
+                    self._req -= 1
+                    self._tok -= tokens
+                    return
+                wait_req = (1 - self._req) * 60.0 / self.rpm if self._req < 1 else 0
+                wait_tok = (tokens - self._tok) * 60.0 / self.tpm if self.tpm and self._tok < tokens else 0
+            self.sleep(max(wait_req, wait_tok, 0.01))
+
+    def drain(self):
+        """429 응답을 받았을 때 남은 여유분을 비워 다른 작업자도 속도를 늦추게 한다."""
+        with self._lock:
+            self._refill()
+            self._req = min(self._req, 0.0)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """지수 백오프 + full jitter (attempt는 0부터)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
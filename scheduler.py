@@ -0,0 +1,208 @@
+import os, json, math
+from typing import Dict, List, Optional
+
+FEED_SCHEDULE_PATH = os.path.join("data", "feed-schedule.json")
+
+# HOURLY_CHECK에서 차례가 된 피드만 받을지 여부 (false면 매번 모든 피드)
+FEED_SCHEDULE = os.getenv("FEED_SCHEDULE", "true").lower() == "true"
+
+# 피드를 받을 최소 확률: 마지막으로 받은 뒤 새 항목이 하나 이상 올라왔을 확률이 이 값 이상이면 받는다
+SCHEDULE_MIN_PROB = float(os.getenv("SCHEDULE_MIN_PROB", "0.5"))
+
+# 피드별 최소 간격과 최대 지연(이 시간이 지나면 도착률과 상관없이 받는다), 시간 단위
+SCHEDULE_MIN_INTERVAL_HOURS = float(os.getenv("SCHEDULE_MIN_INTERVAL_HOURS", "0"))
+SCHEDULE_MAX_STALENESS_HOURS = float(os.getenv("SCHEDULE_MAX_STALENESS_HOURS", "12"))
+
+# cron 실행 시각이 밀리는 만큼 일찍 받는다 (초) - 정각보다 몇 분 빠른 실행에서 한 시간을 통째로 미루지 않게
+SCHEDULE_JITTER_SEC = float(os.getenv("SCHEDULE_JITTER_SEC", "600"))
+
+# 도착률 추정에 쓰는 최근 발행 시각 수
+SCHEDULE_HISTORY = 32
+
+
+class FeedScheduler:
+    def __init__(self, data: Optional[Dict] = None, path: str = FEED_SCHEDULE_PATH,
+                 min_interval: float = SCHEDULE_MIN_INTERVAL_HOURS * 3600,
+                 max_staleness: float = SCHEDULE_MAX_STALENESS_HOURS * 3600,
+                 min_prob: float = SCHEDULE_MIN_PROB):
+        """
+        피드별 발행 간격을 학습해 차례가 된 피드만 받게 하는 스케줄러
+
+        피드마다 최근 발행 시각(SCHEDULE_HISTORY개)을 기억하고 도착률을
+        λ = 발행 수 / (지금 - 가장 오래된 발행 시각)으로 추정한다 (조용해진 피드는 시간이 갈수록 λ가 줄어든다).
+        포아송 도착을 가정하면 마지막으로 받은 뒤 Δ초 동안 새 항목이 있을 확률이 1 - exp(-λΔ)이므로
+        이 확률이 min_prob에 이르는 Δ = -ln(1 - min_prob) / λ 를 간격으로 쓰고 [min_interval, max_staleness]로 제한한다.
+        날짜가 있는 항목을 아직 보지 못한 피드는 매번 받는다.
+
+        feeds.yaml의 피드별 설정으로 덮어쓸 수 있다:
+            poll_interval_hours: 고정 간격 (학습하지 않음)
+            min_interval_hours / max_staleness_hours: 이 피드의 간격 범위
+
+        Args:
+            data: 저장된 상태 ({"avoided": n, "feeds": {url: {"stamps", "last_fetch"}}})
+            min_interval, max_staleness: 간격 범위 (초)
+            min_prob: 받을 최소 확률
+        """
+        data = data or {}
+        self.path = path
+        self.feeds: Dict[str, Dict] = data.get("feeds", {})
+        self.avoided = data.get("avoided", 0)
+        self.min_interval = min_interval
+        self.max_staleness = max_staleness
+        self.min_prob = min_prob
+
+    @classmethod
+    def load(cls, path: str = FEED_SCHEDULE_PATH, **kwargs):
+        data = None
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"[WARN] Failed to load feed schedule {path}: {e}")
+        return cls(data, path, **kwargs)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"avoided": self.avoided, "feeds": self.feeds}, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    def rate(self, url: str, now: float) -> Optional[float]:
+        """초당 발행 수 추정 (발행 시각을 본 적이 없으면 None)"""
+        stamps = [t for t in self.feeds.get(url, {}).get("stamps", ()) if t <= now]
+        if not stamps:
+            return None
+        return len(stamps) / max(now - stamps[0], 60.0)
+
+    def interval(self, feed: Dict, now: float) -> float:
+        """이 피드를 다시 받기까지의 간격 (초)"""
+        if feed.get("poll_interval_hours") is not None:
+            return float(feed["poll_interval_hours"]) * 3600
+        lo = float(feed.get("min_interval_hours", self.min_interval / 3600)) * 3600
+        hi = float(feed.get("max_staleness_hours", self.max_staleness / 3600)) * 3600
+        rate = self.rate(feed["url"], now)
+        if rate is None:
+            return lo
+        return min(hi, max(lo, -math.log(1 - self.min_prob) / rate))
+
+    def next_fetch(self, feed: Dict, now: float) -> float:
+        """다음에 받을 시각 (epoch 초, 한 번도 받지 않았으면 지금)"""
+        last = self.feeds.get(feed["url"], {}).get("last_fetch")
+        if last is None:
+            return now
+        return last + self.interval(feed, now)
+
+    def due(self, feeds: List[Dict], now: float, horizon: float = SCHEDULE_JITTER_SEC) -> List[Dict]:
+        """now + horizon 안에 차례가 오는 피드"""
+        return [f for f in feeds if self.next_fetch(f, now) <= now + horizon]
+
+    def record(self, url: str, now: float, stamps=()):
+        """피드를 받았음을 기록하고 새로 본 발행 시각을 합친다"""
+        entry = self.feeds.setdefault(url, {"stamps": []})
+        entry["last_fetch"] = now
+        if stamps:
+            merged = sorted(set(entry["stamps"]).union(t for t in stamps if t is not None))
+            entry["stamps"] = merged[-SCHEDULE_HISTORY:]
+
+
+def _synthetic_history(months: int, seed: int = 0):
+    """
+    months개월치 발행 시각 (초, 0부터) - 첫 실행에서 지난 항목이 보이도록 90일 전부터 만든다
+    - arxiv: 평일 낮에 시간당 8건 정도 몰아서
+    - news: 하루 12건 정도 고르게
+    - weekly: 7일 ± 12시간마다
+    - rare: 평균 60일에 한 번 (블로그)
+    - bursty: 몇 주 조용하다가 며칠 동안 하루 몇 건
+    """
+    import random
+    rng = random.Random(seed)
+    end = months * 30 * 86400
+    begin = -90 * 86400
+    history = {}
+
+    def poisson(rate_per_sec, start=begin, stop=end):
+        t, out = start, []
+        while True:
+            t += rng.expovariate(rate_per_sec)
+            if t >= stop:
+                return out
+            out.append(t)
+
+    arxiv = []
+    for day in range(begin // 86400, months * 30):
+        if day % 7 < 5:
+            arxiv += poisson(8 / 3600, day * 86400 + 9 * 3600, day * 86400 + 18 * 3600)
+    history["arxiv"] = arxiv
+    history["news"] = poisson(12 / 86400)
+    history["weekly"] = [w * 7 * 86400 + rng.uniform(-43200, 43200) for w in range(begin // (7 * 86400), months * 30 // 7)]
+    history["rare"] = poisson(1 / (60 * 86400))
+    bursty, t = [], float(begin)
+    while t < end:
+        t += rng.uniform(14, 40) * 86400
+        bursty += poisson(4 / 86400, t, min(end, t + rng.uniform(2, 5) * 86400))
+    history["bursty"] = bursty
+    return {name: sorted(x for x in stamps if x < end) for name, stamps in history.items()}, end
+
+
+def test_scheduler(months: int = 6, period: float = 3600):
+    """
+    가짜 시계로 months개월 동안 매시간 cron 실행을 흉내 낸다.
+    피드는 최근 30건만 보여 주고, 받을 때마다 새 발행 시각을 스케줄러에 알려 준다.
+    고정 매시간 받기와 비교해 받은 횟수와 새 항목을 알아채기까지의 지연을 본다.
+    """
+    import bisect
+    history, end = _synthetic_history(months)
+    feeds = [{"name": name, "url": f"https://{name}.example/feed"} for name in history]
+    # 덮어쓰기: 고정 간격
+    feeds.append({"name": "fixed", "url": "https://fixed.example/feed", "poll_interval_hours": 24})
+    history["fixed"] = history["news"]
+
+    sched = FeedScheduler(path=os.devnull)
+    fetches = {f["name"]: [] for f in feeds}
+    runs = 0
+    now = 0.0
+    while now < end:
+        now += period
+        runs += 1
+        due = sched.due(feeds, now)
+        sched.avoided += len(feeds) - len(due)
+        for f in due:
+            stamps = history[f["name"]]
+            visible = stamps[max(0, bisect.bisect_right(stamps, now) - 30):bisect.bisect_right(stamps, now)]
+            sched.record(f["url"], now, visible)
+            fetches[f["name"]].append(now)
+
+    staleness = SCHEDULE_MAX_STALENESS_HOURS * 3600
+    print(f"[TEST] {months} months of hourly runs, {len(feeds)} feeds: "
+          f"{sum(map(len, fetches.values()))} fetches instead of {runs * len(feeds)} "
+          f"({sched.avoided} avoided, {sched.avoided / (runs * len(feeds)):.0%})")
+    for f in feeds:
+        times = fetches[f["name"]]
+        delays = []
+        for t in history[f["name"]]:
+            if t <= 0:
+                continue
+            i = bisect.bisect_left(times, t)
+            if i < len(times):
+                delays.append(times[i] - t)
+        delays.sort()
+        p95 = delays[int(0.95 * (len(delays) - 1))] if delays else 0
+        print(f"[TEST]   {f['name']:<7} {len(delays):>6} items, {len(times):>5} fetches, "
+              f"delay mean {sum(delays) / max(1, len(delays)) / 60:6.1f} min, p95 {p95 / 60:6.1f} min, "
+              f"max {max(delays, default=0) / 3600:5.1f} h")
+        limit = 24 * 3600 if f.get("poll_interval_hours") else staleness
+        # 최대 지연 = 간격 상한 + cron 한 주기
+        assert max(delays, default=0) <= limit + period, f["name"]
+
+    assert sched.avoided >= 0.5 * runs * len(feeds)
+    # 자주 올라오는 피드는 매번 받는다
+    assert len(fetches["arxiv"]) >= 0.3 * runs
+    assert len(fetches["rare"]) <= runs * period / staleness + 10
+    assert abs(len(fetches["fixed"]) - runs / 24) <= 2
+    print("[INFO] Scheduler test passed")
+
+
+if __name__ == "__main__":
+    test_scheduler()
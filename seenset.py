@@ -0,0 +1,244 @@
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from operator import eq
+
+# 추가된 ID가 이만큼 쌓이면 정렬 배열로 병합한다
+_MERGE_THRESHOLD = 65_536
+
+# 병합할 때 한 번에 int list로 정렬하는 ID 수 (값 범위 구간 하나의 평균 크기)
+_PART = 65_536
+
+
+class SeenSet:
+    """
+    entry_id(16자리 hex = 64비트 digest)를 위한 압축 집합.
+
+    정렬된 array('Q')에 ID당 8바이트로 보관하고 이진 탐색으로 멤버십을 확인한다.
+    (str set은 ID당 약 70~100바이트)
+    새로 add된 ID는 작은 int set에 모아 두었다가 일정 개수가 넘으면 병합한다.
+
+    set과 같은 add / in / len / | / update / 순회(hex 문자열)를 지원하며,
+    로드 이후 추가되어 아직 저장되지 않은 ID를 added로 돌려준다.
+    """
+
+    __slots__ = ("_base", "_pending", "_unsaved")
+
+    def __init__(self, ids=()):
+        self._base = array("Q")
+        self._pending = set()
+        self._unsaved = set()
+        if ids:
+            self._base = _sorted_unique(int(x, 16) for x in ids)
+
+    @classmethod
+    def from_digest_bytes(cls, chunks):
+        """
+        빅엔디언 8바이트 digest 바이트열들로 만든다 (seen 로그 블록 그대로).
+        각 블록이 정렬되어 있어 블록을 그대로 병합한다.
+        """
+        runs = []
+        for raw in chunks:
+            run = array("Q", raw)
+            if sys.byteorder == "little":
+                run.byteswap()
+            runs.append(run)
+        s = cls()
+        s._base = _merge_sorted(runs)
+        return s
+
+    def __contains__(self, item):
+        try:
+            v = int(item, 16)
+        except (TypeError, ValueError):
+            return False
+        if v in self._pending:
+            return True
+        base = self._base
+        i = bisect_left(base, v)
+        return i < len(base) and base[i] == v
+
+    def __len__(self):
+        return len(self._base) + len(self._pending)
+
+    def __iter__(self):
+        for v in self._base:
+            yield f"{v:016x}"
+        for v in self._pending:
+            yield f"{v:016x}"
+
+    def __or__(self, other):
+        if not isinstance(other, SeenSet):
+            other = SeenSet(other)
+        merged = SeenSet()
+        merged._base = _merge_sorted([
+            self._base, array("Q", sorted(self._pending)),
+            other._base, array("Q", sorted(other._pending)),
+        ])
+        merged._unsaved = self._unsaved | other._unsaved
+        return merged
+
+    def add(self, item):
+        if item in self:
+            return
+        v = int(item, 16)
+        self._pending.add(v)
+        self._unsaved.add(v)
+        if len(self._pending) >= _MERGE_THRESHOLD:
+            self._merge()
+
+    def update(self, *iterables):
+        for it in iterables:
+            for item in it:
+                self.add(item)
+
+    @property
+    def added(self):
+        """로드(또는 마지막 저장) 이후 추가된 ID (hex 문자열 set)"""
+        return {f"{v:016x}" for v in self._unsaved}
+
+    def mark_saved(self):
+        self._unsaved = set()
+
+    def nbytes(self):
+        """ID 저장에 쓰는 대략적인 메모리 (바이트)"""
+        return self._base.itemsize * len(self._base) + sys.getsizeof(self._pending)
+
+    def _merge(self):
+        self._base = _merge_sorted([self._base, array("Q", sorted(self._pending))])
+        self._pending = set()
+
+
+def _sorted_unique(values):
+    """정렬되지 않은 값들을 _PART개씩 정렬한 뒤 병합한다 (전체 int list를 만들지 않는다)"""
+    arr = values if isinstance(values, array) else array("Q", values)
+    return _merge_sorted([array("Q", sorted(arr[i:i + _PART])) for i in range(0, len(arr), _PART)])
+
+
+def _merge_sorted(runs):
+    """
+    정렬된 array들을 중복 없는 정렬 array 하나로 합친다.
+
+    값 범위를 구간으로 나눠 구간마다 각 run에서 그 구간에 속하는 조각(bisect)만 모아 정렬한다.
+    int list는 구간 하나(평균 _PART개)만큼만 만들므로 최대 메모리는 입력 + 출력 + 구간 하나다.
+    (sorted(list)는 ID당 약 50바이트를 더 쓴다)
+    정렬되지 않은 run(손상된 블록)이 있으면 정렬해서 다시 합친다.
+    """
+    total = sum(map(len, runs))
+    parts = max(1, total // _PART)
+    step = -(-(1 << 64) // parts)
+    out = array("Q")
+    starts = [0] * len(runs)
+    for p in range(parts):
+        lo, hi = p * step, min((p + 1) * step, 1 << 64)
+        part = []
+        for j, run in enumerate(runs):
+            end = bisect_left(run, hi, starts[j])
+            part.extend(run[starts[j]:end])
+            starts[j] = end
+        if not part:
+            continue
+        part.sort()
+        if part[0] < lo or part[-1] >= hi:
+            joined = array("Q")
+            for run in runs:
+                joined.extend(run)
+            return _sorted_unique(joined)
+        if any(map(eq, part, islice(part, 1, None))):
+            # 중복은 드물다 - 발견한 구간만 다시 만든다
+            part = sorted(set(part))
+        out.fromlist(part)
+    return out
+
+
+def test_seenset():
+    """멤버십, add 후 병합, 합집합, 블록 병합(중복/정렬되지 않은 블록) 확인"""
+    import random
+
+    rng = random.Random(1)
+    ids = sorted({f"{rng.getrandbits(64):016x}" for _ in range(3 * _PART)})
+    half = len(ids) // 2
+
+    s = SeenSet(ids[:half])
+    assert len(s) == half and ids[0] in s and ids[-1] not in s
+    assert "not-hex" not in s and None not in s
+    s.add(ids[0])
+    assert not s.added
+
+    # 병합 기준을 넘기면 정렬 배열로 합쳐지고, 저장 전까지 added에 남는다
+    s.update(ids[half:])
+    assert not s._pending or len(s._pending) < _MERGE_THRESHOLD
+    assert len(s) == len(ids) and all(x in s for x in ids[::97])
+    assert s.added == set(ids[half:])
+    assert list(s._base) == sorted(s._base)
+    s.mark_saved()
+    assert not s.added
+
+    # 겹치는 두 집합의 합집합
+    a, b = SeenSet(ids[:half + 10]), SeenSet(ids[half - 10:])
+    a.add("ffffffffffffffff")
+    u = a | b
+    assert len(u) == len(ids) + 1 and "ffffffffffffffff" in u and u.added == {"ffffffffffffffff"}
+    assert sorted(u) == sorted(ids + ["ffffffffffffffff"])
+
+    # seen 로그 블록: 블록마다 정렬, 블록 사이에 중복, 값 범위 양 끝
+    edges = ["0000000000000000", "ffffffffffffffff"]
+    blocks = [ids[i::3] for i in range(3)] + [ids[::50] + edges]
+    raw = [bytes.fromhex("".join(sorted(block))) for block in blocks]
+    loaded = SeenSet.from_digest_bytes(raw)
+    assert list(loaded) == sorted(set(ids + edges))
+
+    # 정렬되지 않은 블록 (손상)도 빠짐없이 읽는다
+    shuffled = ids[:]
+    rng.shuffle(shuffled)
+    loaded = SeenSet.from_digest_bytes([bytes.fromhex("".join(shuffled))])
+    assert list(loaded) == ids
+    assert len(SeenSet.from_digest_bytes([])) == 0
+    print("[INFO] SeenSet test passed")
+
+
+def benchmark_seenset(sizes=(1_000_000, 3_000_000), lookups: int = 200_000):
+    """기존 str set과 SeenSet의 메모리, 멤버십 확인 속도를 비교한다."""
+    import random, time, tracemalloc
+
+    rng = random.Random(0)
+    for n in sizes:
+        ids = [f"{rng.getrandbits(64):016x}" for _ in range(n)]
+        probes = rng.sample(ids, lookups // 2) + [f"{rng.getrandbits(64):016x}" for _ in range(lookups // 2)]
+
+        # str set은 집합 테이블 + 문자열 객체 자체를 모두 센다
+        tracemalloc.start()
+        plain = set(ids)
+        plain_mem = tracemalloc.get_traced_memory()[0] + sum(sys.getsizeof(x) for x in ids)
+        tracemalloc.stop()
+
+        # seen 로그처럼 실행마다 정렬된 블록 여러 개 (시간당 1블록, 이틀치)
+        blocks = 48
+        raw = [bytes.fromhex("".join(sorted(ids[i::blocks]))) for i in range(blocks)]
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        compact = SeenSet.from_digest_bytes(raw)
+        load_t = time.perf_counter() - t0
+        compact_mem, load_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del raw
+
+        t0 = time.perf_counter()
+        hits_plain = sum(1 for p in probes if p in plain)
+        plain_t = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        hits_compact = sum(1 for p in probes if p in compact)
+        compact_t = time.perf_counter() - t0
+        assert hits_plain == hits_compact and len(compact) == len(plain)
+
+        print(f"[BENCH] {n} IDs")
+        print(f"[BENCH]   set[str] : {plain_mem / n:.1f} B/ID, {plain_t / lookups * 1e6:.2f} us/lookup")
+        print(f"[BENCH]   SeenSet  : {compact_mem / n:.1f} B/ID, {compact_t / lookups * 1e6:.2f} us/lookup, "
+              f"load from {blocks} blocks peak {load_peak / n:.1f} B/ID ({load_t:.2f}s with tracemalloc)")
+        del plain, compact, ids
+
+
+if __name__ == "__main__":
+    test_seenset()
+    benchmark_seenset()
@@ -1,15 +1,29 @@
-import os, json, datetime as dt
-from utils import now_kst, start_of_today_kst
+import os, sys, json, glob, struct, datetime as dt
+from utils import now_kst
+from seenset import SeenSet
+from bloom import BloomRing, LongHorizonSeen, SEEN_BLOOM_DAYS
+import metrics
 
-def _path(date_str=None):
-    """날짜별 seen 파일 경로 반환"""
-    if date_str is None:
-        date_str = now_kst().strftime("%Y-%m-%d")
-    os.makedirs("data", exist_ok=True)
-    return f"data/seen-{date_str}.json"
+DATA_DIR = "data"
+
+# seen 저장소: append-only 블록 로그
+#   블록 = 헤더(<II: KST 날짜 서수(1970-01-01 기준 일수), ID 개수) + ID 개수 × 8바이트 digest
+#   digest는 entry_id(16자리 hex)를 그대로 바이트로 바꾼 값(빅엔디언 uint64)이다.
+# 실행마다 새로 본 ID만 블록 하나로 덧붙이고, 보존 기간이 지난 블록은 하루 한 번 압축 시 제거한다.
+SEEN_LOG_PATH = os.path.join(DATA_DIR, "seen.bin")
+
+# seen ID 보존 기간 (일) - 이 기간 안에 본 항목은 다시 알리지 않는다 (기본: 오늘과 어제, JSON 저장소와 같음)
+SEEN_RETENTION_DAYS = int(os.getenv("SEEN_RETENTION_DAYS", "2"))
+
+_HEADER = struct.Struct("<II")
+_EPOCH = dt.date(1970, 1, 1)
+
+
+def _today_ordinal():
+    return (now_kst().date() - _EPOCH).days
 
 def _load_file(path):
-    """단일 seen 파일을 읽어 set으로 반환"""
+    """단일 seen JSON 파일을 읽어 set으로 반환"""
     if not os.path.exists(path):
         return set()
     try:
@@ -20,31 +34,388 @@ def _load_file(path):
         print(f"[WARN] Failed to load seen file {path}: {e}")
         return set()
 
+def _scan_blocks(f):
+    """
+    로그의 블록 목록 [(day, offset, count), ...]과 마지막 온전한 블록의 끝 위치를 반환한다.
+    실행 도중 종료되어 잘린 마지막 블록은 무시한다.
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    blocks = []
+    pos = 0
+    while pos + _HEADER.size <= size:
+        f.seek(pos)
+        day, count = _HEADER.unpack(f.read(_HEADER.size))
+        end = pos + _HEADER.size + count * 8
+        if end > size:
+            break
+        blocks.append((day, pos + _HEADER.size, count))
+        pos = end
+    return blocks, pos
+
+def _pack(day, ids):
+    ids = sorted(ids)
+    return _HEADER.pack(day, len(ids)) + bytes.fromhex("".join(ids))
+
+def _read_block(f, offset, count):
+    f.seek(offset)
+    return f.read(count * 8)
+
+def _window_start(retention_days=None):
+    days = SEEN_RETENTION_DAYS if retention_days is None else retention_days
+    return _today_ordinal() - max(1, days) + 1
+
+def migrate_json_history(retention_days=None):
+    """
+    기존 data/seen-YYYY-MM-DD.json 기록을 seen 로그로 옮긴다 (1회성).
+    ID마다 마지막으로 나타난 날짜를 기록해 기존과 같은 기간 동안 seen으로 유지한다.
+    seen 로그를 다 쓴 뒤 옮긴(또는 보존 기간이 지난) JSON 파일을 지운다.
+
+    Returns:
+        옮긴 ID 수
+    """
+    files = sorted(glob.glob(os.path.join(DATA_DIR, "seen-*.json")))
+    if not files:
+        return 0
+
+    window_start = _window_start(retention_days)
+    last_day = {}
+    migrated = []
+    for path in files:
+        date_str = os.path.basename(path)[len("seen-"):-len(".json")]
+        try:
+            day = (dt.date.fromisoformat(date_str) - _EPOCH).days
+        except ValueError:
+            continue
+        migrated.append(path)
+        if day < window_start:
+            continue
+        for x in _load_file(path):
+            last_day[x] = day
+
+    by_day = {}
+    for x, day in last_day.items():
+        by_day.setdefault(day, []).append(x)
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp = SEEN_LOG_PATH + ".tmp"
+    with open(tmp, "wb") as f:
+        for day in sorted(by_day):
+            f.write(_pack(day, by_day[day]))
+    os.replace(tmp, SEEN_LOG_PATH)
+
+    # seen 로그가 자리를 잡은 뒤에만 지운다 (중간에 죽으면 다음 실행이 다시 옮긴다)
+    for path in migrated:
+        os.remove(path)
+    print(f"[INFO] Migrated {len(last_day)} seen IDs from {len(migrated)} JSON files to {SEEN_LOG_PATH} "
+          f"(JSON files removed)")
+    return len(last_day)
+
+def _load_bloom(exact):
+    """
+    장기 Bloom 필터를 열어 exact 집합과 묶는다.
+    필터가 새로 만들어졌으면 seen 로그의 블록으로 날짜별 슬롯을 채운다.
+    필터 기간이 보존 기간보다 짧으면 필터가 최근 항목을 놓치므로 보존 기간 이상으로 맞춘다.
+    """
+    days = max(SEEN_BLOOM_DAYS, SEEN_RETENTION_DAYS)
+    bloom = BloomRing(days=days)
+    today = _today_ordinal()
+    if bloom.created and os.path.exists(SEEN_LOG_PATH):
+        seeded = 0
+        with open(SEEN_LOG_PATH, "rb") as f:
+            blocks, _ = _scan_blocks(f)
+            for day, offset, count in blocks:
+                if day > today - days:
+                    h = _read_block(f, offset, count).hex()
+                    for i in range(0, len(h), 16):
+                        bloom.add(h[i:i + 16], day)
+                    seeded += count
+        bloom.flush()
+        print(f"[INFO] Seeded bloom filter with {seeded} IDs")
+    return LongHorizonSeen(exact, bloom, _today_ordinal)
+
+@metrics.timed("load_seen", event=True)
 def load_seen():
     """
-    오늘과 어제의 seen 파일을 모두 읽어서 합친다.
-    
-    이유: seen 파일이 날짜별로 저장되는데, HOURLY_CHECK가 자정 직후에 실행되면
-    어제의 seen 파일만 있고 오늘의 파일은 없다. 이 경우 어제 이미 본 항목이
-    오늘 다시 "신규"로 보여질 수 있다. 어제 파일을 포함하여 이를 방지한다.
+    보존 기간(SEEN_RETENTION_DAYS) 안의 seen ID를 모두 읽어 SeenSet으로 반환한다.
+    로그가 아직 없으면 기존 JSON 기록을 먼저 마이그레이션한다.
+    SEEN_BLOOM_DAYS가 설정되어 있으면 장기 Bloom 필터와 묶은 LongHorizonSeen을 반환한다.
     """
-    today = now_kst().strftime("%Y-%m-%d")
-    yesterday = (now_kst() - dt.timedelta(days=1)).strftime("%Y-%m-%d")
+    if not os.path.exists(SEEN_LOG_PATH):
+        migrate_json_history()
+    if not os.path.exists(SEEN_LOG_PATH):
+        print("[INFO] Loaded seen: 0 items (no history)")
+        return _load_bloom(SeenSet()) if SEEN_BLOOM_DAYS > 0 else SeenSet()
+
+    window_start = _window_start()
+    chunks = []
+    with open(SEEN_LOG_PATH, "rb") as f:
+        blocks, _ = _scan_blocks(f)
+        for day, offset, count in blocks:
+            if day >= window_start:
+                chunks.append(_read_block(f, offset, count))
+    blocks_read = len(chunks)
+
+    seen = SeenSet.from_digest_bytes(chunks)
+    print(f"[INFO] Loaded seen: {len(seen)} items from {blocks_read} blocks (last {SEEN_RETENTION_DAYS} days)")
+    return _load_bloom(seen) if SEEN_BLOOM_DAYS > 0 else seen
+
+def _compact(f, blocks, window_start):
+    """보존 기간이 지난 블록을 제거해 로그를 다시 쓴다."""
+    tmp = SEEN_LOG_PATH + ".tmp"
+    kept = 0
+    with open(tmp, "wb") as out:
+        for day, offset, count in blocks:
+            if day < window_start:
+                continue
+            f.seek(offset - _HEADER.size)
+            out.write(f.read(_HEADER.size + count * 8))
+            kept += count
+    os.replace(tmp, SEEN_LOG_PATH)
+    print(f"[INFO] Compacted seen log: kept {kept} IDs")
 
-    today_seen = _load_file(_path(today))
-    yesterday_seen = _load_file(_path(yesterday))
+@metrics.timed("save_seen", event=True)
+def save_seen(seen):
+    """
+    새로 본 ID만 오늘 날짜 블록으로 seen 로그 끝에 덧붙인다.
+    SeenSet이 아니면 로그에 없는 ID를 계산해 덧붙인다.
 
-    merged = today_seen | yesterday_seen
+    Returns:
+        기록한 바이트 수
+    """
+    if isinstance(seen, LongHorizonSeen):
+        # 필터를 먼저 기록한다 - 중간에 실패해도 다음 실행이 같은 항목을 새 항목으로 보지 않는다
+        today = _today_ordinal()
+        for x in seen.exact.added:
+            seen.bloom.add(x, today)
+        seen.bloom.flush()
+        if seen.long_horizon_hits:
+            print(f"[INFO] Long-horizon dedup: {seen.long_horizon_hits} items seen before the retention window")
+        return save_seen(seen.exact)
 
-    if yesterday_seen:
-        print(f"[INFO] Loaded seen: today={len(today_seen)}, yesterday={len(yesterday_seen)}, merged={len(merged)}")
+    if isinstance(seen, SeenSet):
+        new_ids = seen.added
     else:
-        print(f"[INFO] Loaded seen: {len(today_seen)} items (today only)")
+        existing = load_seen()
+        if isinstance(existing, LongHorizonSeen):
+            existing = existing.exact
+        new_ids = {x for x in seen if x not in existing}
 
-    return merged
+    os.makedirs(DATA_DIR, exist_ok=True)
+    window_start = _window_start()
+    written = 0
 
-def save_seen(seen):
-    """오늘 날짜의 seen 파일에 저장"""
-    p = _path()
-    with open(p, "w", encoding="utf-8") as f:
-        json.dump(sorted(list(seen)), f, ensure_ascii=False, indent=2)
\ No newline at end of file
+    with open(SEEN_LOG_PATH, "a+b") as f:
+        blocks, valid_end = _scan_blocks(f)
+        if any(day < window_start for day, _, _ in blocks):
+            _compact(f, blocks, window_start)
+        elif new_ids:
+            # 이전 실행이 블록을 쓰다 중단되었으면 잘린 부분을 버린다
+            f.truncate(valid_end)
+
+    if new_ids:
+        block = _pack(_today_ordinal(), new_ids)
+        with open(SEEN_LOG_PATH, "ab") as f:
+            f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        written = len(block)
+
+    if isinstance(seen, SeenSet):
+        seen.mark_saved()
+    print(f"[INFO] Appended {len(new_ids)} seen IDs ({written} bytes)")
+    return written
+
+FEED_CACHE_PATH = os.path.join(DATA_DIR, "feed-cache.json")
+
+def load_feed_cache():
+    """피드별 HTTP 검증자(ETag, Last-Modified, 본문 해시) 캐시를 읽는다"""
+    if not os.path.exists(FEED_CACHE_PATH):
+        return {}
+    try:
+        with open(FEED_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"[WARN] Failed to load feed cache {FEED_CACHE_PATH}: {e}")
+        return {}
+
+def save_feed_cache(cache):
+    """피드 검증자 캐시 저장 - seen 저장 이후에 호출해야 한다"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(FEED_CACHE_PATH, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+FEED_CURSOR_PATH = os.path.join(DATA_DIR, "feed-cursors.json")
+
+def load_feed_cursors():
+    """
+    피드별 커서를 읽는다
+    {url: {"newest": 가장 최근 발행 시각(epoch), "ids": 처리한 항목 ID (최근 순),
+           "backlog": 상한 때문에 아직 처리하지 못한 항목 수,
+           "future": 미래 날짜라 넘긴 항목 중 가장 이른 발행 시각 (있을 때만)}}
+    """
+    if not os.path.exists(FEED_CURSOR_PATH):
+        return {}
+    try:
+        with open(FEED_CURSOR_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"[WARN] Failed to load feed cursors {FEED_CURSOR_PATH}: {e}")
+        return {}
+
+def save_feed_cursors(cursors):
+    """피드 커서 저장 - 검증자 캐시와 마찬가지로 seen 저장 이후에 호출해야 한다"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp = FEED_CURSOR_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cursors, f, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp, FEED_CURSOR_PATH)
+
+
+def test_seen_log():
+    """잘린 마지막 블록 복구와 JSON 기록 마이그레이션 확인"""
+    import tempfile
+    global DATA_DIR, SEEN_LOG_PATH
+
+    saved_paths = DATA_DIR, SEEN_LOG_PATH
+    today = now_kst().date()
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            DATA_DIR = tmp
+            SEEN_LOG_PATH = os.path.join(tmp, "seen.bin")
+
+            # 기존 JSON 기록: 보존 기간 밖의 파일은 버리고, 여러 날에 나온 ID는 마지막 날짜로 옮긴다
+            history = {
+                today - dt.timedelta(days=5): ["00000000000000aa"],
+                today - dt.timedelta(days=1): ["00000000000000bb", "00000000000000cc"],
+                today: ["00000000000000cc", "00000000000000dd"],
+            }
+            for day, ids in history.items():
+                with open(os.path.join(tmp, f"seen-{day.isoformat()}.json"), "w", encoding="utf-8") as f:
+                    json.dump(ids, f)
+            seen = load_seen()  # seen.bin이 없으면 자동으로 옮긴다
+            assert sorted(seen) == ["00000000000000bb", "00000000000000cc", "00000000000000dd"], sorted(seen)
+            assert not glob.glob(os.path.join(tmp, "seen-*.json")), "migrated JSON files should be removed"
+            with open(SEEN_LOG_PATH, "rb") as f:
+                blocks, end = _scan_blocks(f)
+            assert [(day, count) for day, _, count in blocks] == [(_today_ordinal() - 1, 1), (_today_ordinal(), 2)]
+            assert end == os.path.getsize(SEEN_LOG_PATH)
+
+            # 블록을 쓰다 죽은 실행: 헤더는 3개라고 했지만 ID는 하나 반만 썼다
+            with open(SEEN_LOG_PATH, "ab") as f:
+                f.write(_HEADER.pack(_today_ordinal(), 3) + bytes.fromhex("00000000000000ee0000"))
+            seen = load_seen()
+            assert len(seen) == 3 and "00000000000000ee" not in seen
+
+            # 다음 저장이 잘린 부분을 잘라 내고 새 블록을 온전하게 덧붙인다
+            seen.add("00000000000000ff")
+            save_seen(seen)
+            with open(SEEN_LOG_PATH, "rb") as f:
+                blocks, end = _scan_blocks(f)
+            assert end == os.path.getsize(SEEN_LOG_PATH) and len(blocks) == 3
+            assert sorted(load_seen()) == ["00000000000000bb", "00000000000000cc", "00000000000000dd", "00000000000000ff"]
+        finally:
+            DATA_DIR, SEEN_LOG_PATH = saved_paths
+    print("[INFO] Seen log test passed")
+
+
+def test_long_horizon_seen():
+    """Bloom 필터와 묶은 seen: add 직후/저장 후 멤버십, 자정을 넘긴 뒤 새 날짜 슬롯 확인 (가짜 시계)"""
+    import tempfile
+    global SEEN_BLOOM_DAYS, _today_ordinal
+
+    saved = SEEN_BLOOM_DAYS, _today_ordinal, os.getcwd()
+    day = [20000]
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            os.chdir(tmp)
+            SEEN_BLOOM_DAYS = 7
+            _today_ordinal = lambda: day[0]
+
+            seen = load_seen()
+            assert isinstance(seen, LongHorizonSeen)
+            x = "00000000000000a1"
+            assert x not in seen
+            seen.add(x)
+            assert x in seen  # 저장 전에도
+            save_seen(seen)
+            assert x in seen
+
+            # 자정이 지나고 (다시 읽지 않은 상주 모드) 새 날짜 슬롯에만 있는 ID도 본 것으로 판단한다
+            day[0] += 1
+            y = "00000000000000b2"
+            seen.bloom.add(y, day[0])
+            assert y in seen and seen.long_horizon_hits == 1
+            seen.add("00000000000000c3")
+            save_seen(seen)
+            assert x in seen and "00000000000000c3" in seen
+            assert "00000000000000d4" not in seen
+
+            # 다시 읽으면 두 날짜 블록이 모두 보존 기간 안이다
+            seen.bloom.close()
+            seen = load_seen()
+            assert x in seen.exact and "00000000000000c3" in seen.exact
+            seen.bloom.close()
+        finally:
+            SEEN_BLOOM_DAYS, _today_ordinal, cwd = saved
+            os.chdir(cwd)
+    print("[INFO] Long-horizon seen test passed")
+
+
+def benchmark_seen_store(n_ids: int = 1_000_000, new_per_run: int = 300):
+    """
+    n_ids개의 기록이 있을 때 기존 JSON 방식과 seen 로그의
+    load/save 시간과 실행당 기록 바이트를 비교한다.
+    """
+    import random, tempfile, time
+    global DATA_DIR, SEEN_LOG_PATH
+
+    rng = random.Random(0)
+    history = [f"{rng.getrandbits(64):016x}" for _ in range(n_ids)]
+    fresh = [f"{rng.getrandbits(64):016x}" for _ in range(new_per_run)]
+    saved_paths = DATA_DIR, SEEN_LOG_PATH
+
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            # 기존 방식: 병합된 전체 집합을 정렬된 들여쓰기 JSON으로 다시 쓰기
+            json_path = os.path.join(tmp, "seen.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(sorted(history), f, indent=2)
+            t0 = time.perf_counter()
+            old = _load_file(json_path)
+            old_load = time.perf_counter() - t0
+            old.update(fresh)
+            t0 = time.perf_counter()
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(sorted(list(old)), f, ensure_ascii=False, indent=2)
+            old_save = time.perf_counter() - t0
+            old_bytes = os.path.getsize(json_path)
+
+            # seen 로그
+            DATA_DIR = tmp
+            SEEN_LOG_PATH = os.path.join(tmp, "seen.bin")
+            with open(SEEN_LOG_PATH, "wb") as f:
+                f.write(_pack(_today_ordinal(), history))
+            t0 = time.perf_counter()
+            seen = load_seen()
+            new_load = time.perf_counter() - t0
+            for x in fresh:
+                seen.add(x)
+            t0 = time.perf_counter()
+            new_bytes = save_seen(seen)
+            new_save = time.perf_counter() - t0
+        finally:
+            DATA_DIR, SEEN_LOG_PATH = saved_paths
+
+    print(f"[BENCH] {n_ids} IDs, {new_per_run} new per run")
+    print(f"[BENCH] JSON : load {old_load:.3f}s, save {old_save:.3f}s, {old_bytes} bytes written")
+    print(f"[BENCH] log  : load {new_load:.3f}s, save {new_save:.4f}s, {new_bytes} bytes written")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["migrate"]:
+        migrate_json_history()
+    else:
+        test_seen_log()
+        test_long_horizon_seen()
+        benchmark_seen_store()
@@ -0,0 +1,97 @@
+import os, json, time, hashlib, threading
+from typing import Optional, Tuple
+
+SUMMARY_CACHE_PATH = os.path.join("data", "summary-cache.json")
+
+# 캐시 항목 유효 기간 (일)과 최대 항목 수 (넘으면 오래 안 쓴 것부터 제거)
+SUMMARY_CACHE_TTL_DAYS = float(os.getenv("SUMMARY_CACHE_TTL_DAYS", "7"))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "5000"))
+
+
+class SummaryCache:
+    def __init__(self, path: str = SUMMARY_CACHE_PATH, ttl_days: float = SUMMARY_CACHE_TTL_DAYS,
+                 max_entries: int = SUMMARY_CACHE_MAX_ENTRIES, clock=time.time):
+        """
+        Gemini 요약 결과 디스크 캐시 (내용 주소 방식)
+
+        키는 모델 이름 + 프롬프트 템플릿 + 정리된 제목/초록의 해시라서
+        HOURLY_CHECK에서 요약한 항목을 다음 날 DAILY_SUMMARY나 다른 피드의 같은 기사가 재사용한다.
+        TTL이 지난 항목은 읽을 때 무시하고, 저장할 때 TTL/LRU 기준으로 정리한다.
+
+        Args:
+            path: 캐시 파일 경로
+            ttl_days: 항목 유효 기간 (일)
+            max_entries: 최대 항목 수
+        """
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        # 실행 journal (journal.py) - 넣는 요약을 바로 기록해 실행이 죽어도 다시 요청하지 않게 한다
+        self.journal = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"[WARN] Failed to load summary cache {self.path}: {e}")
+            return {}
+
+    @staticmethod
+    def key(model_name: str, template: str, title: str, summary: str) -> str:
+        h = hashlib.sha256()
+        for part in (model_name, template, title, summary):
+            h.update(part.encode("utf-8"))
+            h.update(b"\x00")
+        return h.hexdigest()[:32]
+
+    def get(self, key: str) -> Optional[Tuple[str, bool]]:
+        """(summary_ko, has_summary) 또는 None"""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry["t"] > self.ttl:
+                self.misses += 1
+                return None
+            # 사용 시각만 바꾼다 - 읽기만 한 실행은 캐시 파일을 다시 쓰지 않는다 (다른 변경과 함께 저장된다)
+            entry["a"] = now
+            self.hits += 1
+            return entry["ko"], entry["has"]
+
+    def put(self, key: str, summary_ko: str, has_summary: bool):
+        now = self.clock()
+        with self._lock:
+            self._entries[key] = {"ko": summary_ko, "has": has_summary, "t": now, "a": now}
+            self._dirty = True
+        if self.journal is not None:
+            self.journal.record_summary(key, summary_ko, has_summary)
+
+    def save(self):
+        """만료 항목을 지우고 최대 항목 수를 넘으면 오래 안 쓴 것부터 제거한 뒤 저장한다."""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = self.clock()
+            live = {k: e for k, e in self._entries.items() if now - e["t"] <= self.ttl}
+            if len(live) > self.max_entries:
+                recent = sorted(live.items(), key=lambda kv: kv[1]["a"], reverse=True)[:self.max_entries]
+                live = dict(recent)
+            self._entries = live
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(live, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+    def __len__(self):
+        return len(self._entries)
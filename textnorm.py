@@ -0,0 +1,201 @@
+import re, html, time
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# 한 번의 정규식 스캔으로 나누는 토큰
+# - skip: script/style 블록과 주석 (내용까지 통째로 버림)
+# - tag:  그 밖의 태그 (공백으로 바꿈). 글자/!/?//로 시작해야 태그로 본다 ("a < b"는 그대로)
+# - ent:  문자 참조 (&amp; &#8217; &#x2019; &hellip ...)
+# - text: 태그/참조가 아닌 글자 묶음
+_TOKEN_RE = re.compile(
+    r"(?P<skip><(script|style)\b[^>]*>.*?</\2\s*>|<!--.*?-->)"
+    r"|(?P<tag></?[A-Za-z!?][^>]*>)"
+    r"|(?P<ent>&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);?)"
+    r"|(?P<text>[^<&]+)"
+    r"|(?P<char>[<&])",
+    re.S | re.I,
+)
+
+
+@lru_cache(maxsize=4096)
+def _decode_entity(ref: str) -> str:
+    # HTML5 명명 참조 전체와 숫자 참조 (잘못된 코드 포인트 처리 포함)
+    return html.unescape(ref)
+
+
+def truncate_html(text: str, limit: Optional[int] = None) -> Tuple[str, bool]:
+    """
+    HTML 초록을 한 번 훑으며 평문으로 바꾼다.
+    태그 제거, script/style 내용 제거, 모든 HTML5 문자 참조 복원, 연속 공백을 한 칸으로 정리한다.
+
+    limit이 주어지면 결과가 limit 글자를 넘는 순간 스캔을 멈춘다
+    (긴 초록 전체를 정리한 뒤 자르는 것과 같은 결과).
+
+    Returns:
+        (정리한 글 (최대 limit 글자), 잘렸는지 여부)
+    """
+    if not text:
+        return "", False
+
+    parts = []
+    size = 0
+    pending_space = False
+    for m in _TOKEN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind == "skip" or kind == "tag":
+            pending_space = True
+            continue
+        chunk = m.group(kind)
+        if kind == "ent":
+            chunk = _decode_entity(chunk)
+
+        # 덩어리 안의 공백 정리 (앞뒤 공백은 다음 글자가 나올 때 한 칸으로)
+        if chunk[:1].isspace():
+            pending_space = True
+        words = chunk.split()
+        if not words:
+            continue
+        piece = " ".join(words)
+        if pending_space and parts:
+            parts.append(" ")
+            size += 1
+        parts.append(piece)
+        size += len(piece)
+        pending_space = chunk[-1:].isspace()
+
+        if limit is not None and size > limit:
+            return "".join(parts)[:limit], True
+
+    return "".join(parts), False
+
+
+def clean_html(text: str) -> str:
+    """HTML 초록을 평문으로 (truncate_html 참고)"""
+    return truncate_html(text)[0]
+
+
+def _legacy_clean_html(text: str) -> str:
+    """기존 GeminiSummarizer._clean_html (벤치마크 비교용)"""
+    if not text:
+        return ""
+    text = re.sub(r'<[^>]+>', ' ', text)
+    for entity, char in {
+        '&amp;': '&', '&lt;': '<', '&gt;': '>', '&quot;': '"', '&#39;': "'", '&apos;': "'",
+        '&nbsp;': ' ', '&#8217;': '’', '&#8216;': '‘', '&#8220;': '“',
+        '&#8221;': '”', '&#8230;': '…',
+    }.items():
+        text = text.replace(entity, char)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _sample_abstracts(n: int = 200, seed: int = 0):
+    """
+    큰 초록 모음
+    - arXiv: 긴 평문 + 수식 기호, &lt; &gt; &amp; 같은 참조가 섞인 초록 (수 KB)
+    - VentureBeat: <p>/<a>/<img>/<figure>, 인라인 <script>/<style>, 다양한 명명/숫자 참조가 섞인 본문 (수십 KB)
+    """
+    import random
+    rng = random.Random(seed)
+    words = ("model language training agent reasoning benchmark scaling inference dataset transformer "
+             "attention alignment policy reward evaluation retrieval latency throughput").split()
+
+    def sentence(k=18):
+        return " ".join(rng.choice(words) for _ in range(k)).capitalize() + "."
+
+    samples = []
+    for i in range(n):
+        if i % 2 == 0:
+            body = " ".join(
+                sentence() + rng.choice([" We show $O(n \\log n)$ &lt; baseline &amp; prior work.",
+                                         " Accuracy improves by 3&#x2013;5%&nbsp;on average.", ""])
+                for _ in range(40))
+            samples.append(("arxiv", f"<p>{body}</p>"))
+        else:
+            paras = []
+            for j in range(60):
+                paras.append(
+                    f"<p>{sentence()} <a href=\"https://venturebeat.com/{i}/{j}\">link&hellip;</a> "
+                    f"&ldquo;{sentence(8)}&rdquo; &mdash; {sentence(10)} &#8217;s &copy; 2024</p>")
+                if j % 15 == 0:
+                    paras.append('<figure><img src="x.png" alt="chart"/><figcaption>Chart</figcaption></figure>')
+                if j % 20 == 0:
+                    paras.append("<script>window.dataLayer = window.dataLayer || []; if (a < b) { track('x'); }</script>")
+                    paras.append("<style>.vb-ad { display: none; } p > a { color: red; }</style>")
+            samples.append(("venturebeat", "".join(paras)))
+    return samples
+
+
+def benchmark_clean(limit: int = 1500, repeat: int = 5):
+    """
+    기존 정리(정규식 태그 제거 + 12번의 replace + 공백 정규식 후 자르기)와
+    한 번 스캔 + 스트리밍 자르기를 같은 초록 모음으로 비교한다.
+    """
+    samples = _sample_abstracts()
+    total_kb = sum(len(t) for _, t in samples) / 1024
+    print(f"[INFO] {len(samples)} abstracts, {total_kb:.0f} KB total")
+
+    def legacy():
+        out = []
+        for _, t in samples:
+            s = _legacy_clean_html(t)
+            out.append(s[:limit] + "..." if len(s) > limit else s)
+        return out
+
+    def full():
+        return [clean_html(t) for _, t in samples]
+
+    def streaming():
+        out = []
+        for _, t in samples:
+            s, cut = truncate_html(t, limit)
+            out.append(s + "..." if cut else s)
+        return out
+
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        return min(times)
+
+    t_legacy, t_full, t_stream = best(legacy), best(full), best(streaming)
+    print(f"[INFO] legacy clean + cut:       {t_legacy * 1e3:7.1f} ms")
+    print(f"[INFO] single pass (full text):  {t_full * 1e3:7.1f} ms")
+    print(f"[INFO] single pass + stop at {limit}: {t_stream * 1e3:7.1f} ms ({t_legacy / t_stream:.1f}x)")
+
+    # 기존 방식이 놓치던 참조/스크립트 확인
+    leftovers = sum(1 for s in legacy() if "&hellip;" in s or "&mdash;" in s or "dataLayer" in s)
+    remaining = sum(1 for s in streaming() if "&hellip;" in s or "&mdash;" in s or "dataLayer" in s)
+    print(f"[INFO] Abstracts with undecoded entities or script text: legacy {leftovers}, new {remaining}")
+    return t_legacy, t_stream
+
+
+def test_clean_html():
+    cases = [
+        ("<p>Hello&nbsp;<b>world</b></p>", "Hello world"),
+        ("A &amp; B &lt;tag&gt; &quot;q&quot; &#39;s &apos;", "A & B <tag> \"q\" 's '"),
+        ("It&#8217;s &#x2014; &hellip; &eacute;t&eacute; &rarr; &copy", "It’s — … été → ©"),
+        ("<script type='x'>var a = '<p>';</script>Text<style>p{}</style> more", "Text more"),
+        ("<!-- comment <b> -->keep", "keep"),
+        ("a < b and c > d", "a < b and c > d"),
+        ("  lots   of\n\n whitespace\t", "lots of whitespace"),
+        ("x&unknown;y &", "x&unknown;y &"),
+        ("", ""),
+    ]
+    for raw, expected in cases:
+        got = clean_html(raw)
+        assert got == expected, (raw, got, expected)
+
+    # 스트리밍 자르기는 전체 정리 후 자르기와 같아야 한다
+    for _, text in _sample_abstracts(20):
+        full = clean_html(text)
+        for limit in (0, 1, 50, 1500, len(full) - 1, len(full), len(full) + 5):
+            cut, truncated = truncate_html(text, limit)
+            assert cut == full[:limit] and truncated == (len(full) > limit), limit
+    print("[INFO] HTML cleaning test passed")
+
+
+if __name__ == "__main__":
+    test_clean_html()
+    benchmark_clean()
@@ -1,46 +1,267 @@
-import datetime as dt
+import re, time, calendar, datetime as dt
+from email.utils import parsedate_tz
 from dateutil import parser as dp
 import pytz
+import metrics
+from newsitem import NewsItem, make_id
 
 TZ = pytz.timezone("Asia/Seoul")
 
+# 피드별로 마지막으로 성공한 날짜 형식 ("struct" | "rfc822" | "iso" | "dateutil")
+# 같은 피드의 항목은 거의 항상 같은 형식이므로 다음 항목은 그 파서부터 시도한다
+DATE_FORMATS = {}
+
+# ISO 8601 (Atom, JSON Feed 등): 2024-05-01T12:34:56.789+09:00 / 2024-05-01 12:34Z
+_ISO_RE = re.compile(
+    r"\s*(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,]\d+)?)?)?"
+    r"\s*(Z|z|[+-]\d{2}(?::?\d{2})?)?\s*$"
+)
+
 def now_kst():
     return dt.datetime.now(TZ)
 
-def start_of_today_kst():
-    n = now_kst()
+def start_of_today_kst(now=None):
+    n = now or now_kst()
     return TZ.localize(dt.datetime(n.year, n.month, n.day, 0, 0, 0))
 
-def normalize_entry(raw, source_name):
-    """공통 필드 정규화 - 타임존 처리 개선"""
-    title = getattr(raw, "title", "").strip()
-    link = getattr(raw, "link", "").strip()
+def _from_struct(parsed):
+    """feedparser의 *_parsed (UTC 기준 struct_time)"""
+    if not parsed:
+        return None
+    return dt.datetime.fromtimestamp(calendar.timegm(parsed), TZ)
+
+def _from_rfc822(text):
+    """RFC 822 (RSS pubDate): Wed, 01 May 2024 12:34:56 +0000"""
+    parts = parsedate_tz(text)
+    if parts is None:
+        return None
+    # 시간대가 없으면 UTC로 간주
+    return dt.datetime.fromtimestamp(calendar.timegm(parts[:9]) - (parts[9] or 0), TZ)
+
+def _from_iso(text):
+    m = _ISO_RE.match(text)
+    if m is None:
+        return None
+    y, mo, d, h, mi, s, tz = m.groups()
+    offset = 0
+    if tz and tz not in ("Z", "z"):
+        sign = -1 if tz[0] == "-" else 1
+        digits = tz[1:].replace(":", "")
+        offset = sign * (int(digits[:2]) * 3600 + int(digits[2:4] or 0) * 60)
+    ts = calendar.timegm((int(y), int(mo), int(d), int(h or 0), int(mi or 0), int(s or 0), 0, 0, 0))
+    return dt.datetime.fromtimestamp(ts - offset, TZ)
+
+def _from_dateutil(text):
+    # dateutil.parser로 파싱 (가장 느리지만 형식이 가장 자유로움)
+    published_dt = dp.parse(text)
+
+    # UTC로 간주하고 KST로 변환 (대부분의 RSS는 UTC 또는 명시적 timezone)
+    if published_dt.tzinfo is None:
+        # timezone 정보가 없으면 UTC로 간주
+        published_dt = pytz.UTC.localize(published_dt)
+
+    # KST로 변환
+    return published_dt.astimezone(TZ)
+
+_TEXT_PARSERS = {"rfc822": _from_rfc822, "iso": _from_iso, "dateutil": _from_dateutil}
+
+def parse_date(text, parsed=None, source_name=None):
+    """
+    발행 시각을 KST datetime으로 변환 (실패하면 None)
+
+    feedparser가 이미 계산한 struct_time(parsed)이 있으면 그것을 쓰고,
+    없으면 문자열을 피드별로 기억한 형식 → RFC 822 → ISO 8601 → dateutil 순으로 시도한다.
+    """
+    try:
+        value = _from_struct(parsed)
+        if value is not None:
+            if source_name is not None:
+                DATE_FORMATS[source_name] = "struct"
+            return value
+    except (ValueError, OverflowError, TypeError):
+        pass
+
+    if not text:
+        return None
+
+    remembered = DATE_FORMATS.get(source_name)
+    order = ("rfc822", "iso", "dateutil")
+    if remembered in _TEXT_PARSERS:
+        order = (remembered,) + tuple(f for f in order if f != remembered)
+
+    error = None
+    for fmt in order:
+        try:
+            value = _TEXT_PARSERS[fmt](text)
+        except (ValueError, OverflowError, TypeError) as e:
+            error = e
+            continue
+        if value is not None:
+            if source_name is not None:
+                DATE_FORMATS[source_name] = fmt
+            return value
+
+    print(f"[WARN] Failed to parse date '{text}': {error or 'unknown format'}")
+    return None
+
+def entry_datetime(raw, source_name=None):
+    """항목의 발행 시각 (published 우선, 없으면 updated)"""
+    published = getattr(raw, "published", None)
+    if published or getattr(raw, "published_parsed", None):
+        return parse_date(published, getattr(raw, "published_parsed", None), source_name)
+    return parse_date(getattr(raw, "updated", None), getattr(raw, "updated_parsed", None), source_name)
+
+def entry_id(e):
+    # {"link", "title", "published"} dict의 ID (NewsItem.id와 같은 값)
+    return make_id(e.get("link"), e.get("title", ""), e.get("published"))
+
+def raw_entry_id(raw):
+    """정규화 전 피드 항목(feedparser 또는 feedscan.FeedEntry)의 ID (normalize_entry 후 NewsItem.id와 같은 값)"""
+    return make_id(getattr(raw, "link", "").strip(), getattr(raw, "title", "").strip(),
+                   getattr(raw, "published", None))
+
+@metrics.timed("normalize_entry")
+def normalize_entry(raw, source_name, window=None, ts=None, id=None):
+    """
+    피드 항목을 NewsItem으로 정규화 - 타임존 처리 개선
+
+    Args:
+        raw: feedparser 항목 (또는 feedscan.FeedEntry)
+        source_name: 피드 이름
+        window: (시작, 끝) KST datetime. 주어지면 날짜가 이 범위 밖인 항목은
+            다른 필드를 만들기 전에 None을 반환한다 (날짜 없는 항목은 그대로 통과).
+        ts: 이미 계산한 발행 시각 (epoch 초, feedscan.select_entries). 주어지면 날짜를 다시 파싱하지 않는다
+        id: 이미 계산한 항목 ID (raw_entry_id)
+    """
+    if ts is None:
+        published_dt = entry_datetime(raw, source_name)
+        ts = published_dt.timestamp() if published_dt is not None else None
+    if window is not None and ts is not None and not (window[0].timestamp() <= ts <= window[1].timestamp()):
+        return None
+
+    # 초록(summary 또는 description)은 HTML 그대로 넘기고 처음 읽을 때 정리한다 (NewsItem.summary)
+    return NewsItem(
+        source_name,
+        getattr(raw, "title", "").strip(),
+        getattr(raw, "link", "").strip(),
+        getattr(raw, "published", None),
+        ts,
+        getattr(raw, "summary", "") or getattr(raw, "description", ""),
+        id,
+    )
+
+
+def _legacy_normalize(raw, source_name):
+    """기존 정규화 (벤치마크 비교용): 모든 항목에서 dateutil 파싱"""
     published = getattr(raw, "published", None)
     published_dt = None
-    
     if published:
         try:
-            # dateutil.parser로 파싱
             published_dt = dp.parse(published)
-            
-            # UTC로 간주하고 KST로 변환 (대부분의 RSS는 UTC 또는 명시적 timezone)
             if published_dt.tzinfo is None:
-                # timezone 정보가 없으면 UTC로 간주
                 published_dt = pytz.UTC.localize(published_dt)
-            
-            # KST로 변환
             published_dt = published_dt.astimezone(TZ)
-            
-        except Exception as e:
-            print(f"[WARN] Failed to parse date '{published}': {e}")
+        except Exception:
             published_dt = None
-    
-    e = {
+    return {
         "source": source_name,
-        "title": title,
-        "link": link,
+        "title": getattr(raw, "title", "").strip(),
+        "link": getattr(raw, "link", "").strip(),
         "published": published,
         "published_dt": published_dt,
         "published_parsed": getattr(raw, "published_parsed", None)
     }
-    return e
+
+def _sample_corpus(n_per_feed: int = 400):
+    """
+    실제 피드에서 보이는 날짜 형식을 섞은 항목 모음 (feedparser로 파싱한 결과)
+    - RSS pubDate (RFC 822, +0000 / GMT / -0500)
+    - Atom published/updated (ISO 8601, Z / +09:00 / 소수 초)
+    - updated만 있는 Atom 항목
+    """
+    import feedparser
+    from email.utils import format_datetime
+
+    base = dt.datetime(2024, 5, 1, 12, 0, tzinfo=dt.timezone.utc)
+    stamps = [base - dt.timedelta(minutes=37 * i) for i in range(n_per_feed)]
+
+    def rss(fmt):
+        items = "".join(
+            f"<item><title>t{i}</title><link>https://r.example/{i}</link><pubDate>{fmt(s)}</pubDate></item>"
+            for i, s in enumerate(stamps))
+        return f'<?xml version="1.0"?><rss version="2.0"><channel><title>r</title>{items}</channel></rss>'
+
+    def atom(tag, fmt):
+        items = "".join(
+            f"<entry><title>t{i}</title><link href='https://a.example/{i}'/><{tag}>{fmt(s)}</{tag}></entry>"
+            for i, s in enumerate(stamps))
+        return f'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom"><title>a</title>{items}</feed>'
+
+    kst = dt.timezone(dt.timedelta(hours=9))
+    feeds = {
+        "rss-utc": rss(lambda s: format_datetime(s)),
+        "rss-gmt": rss(lambda s: format_datetime(s, usegmt=True)),
+        "rss-est": rss(lambda s: format_datetime(s.astimezone(dt.timezone(dt.timedelta(hours=-5))))),
+        "atom-z": atom("published", lambda s: s.strftime("%Y-%m-%dT%H:%M:%SZ")),
+        "atom-kst": atom("published", lambda s: s.astimezone(kst).isoformat(timespec="milliseconds")),
+        "atom-updated": atom("updated", lambda s: s.isoformat()),
+    }
+    return [(name, e) for name, xml in feeds.items() for e in feedparser.parse(xml).entries]
+
+def benchmark_normalize(n_per_feed: int = 400, repeat: int = 5):
+    """
+    기존 정규화(dateutil, 전 항목 정규화 후 필터)와 빠른 경로(struct_time/RFC 822/ISO,
+    기간 밖 항목 조기 제외)를 같은 항목 모음으로 비교한다.
+    """
+    corpus = _sample_corpus(n_per_feed)
+    end = TZ.localize(dt.datetime(2024, 5, 1, 21, 0))
+    window = (end - dt.timedelta(days=1), end)
+    print(f"[INFO] Corpus: {len(corpus)} entries from {len(set(n for n, _ in corpus))} feeds")
+
+    def legacy():
+        items = [_legacy_normalize(raw, name) for name, raw in corpus]
+        return [e for e in items if e["published_dt"] and window[0] <= e["published_dt"] <= window[1]]
+
+    def fast_all():
+        return [normalize_entry(raw, name) for name, raw in corpus]
+
+    def fast_window():
+        items = (normalize_entry(raw, name, window) for name, raw in corpus)
+        return [e for e in items if e is not None and e.ts is not None]
+
+    def strings_only():
+        DATE_FORMATS.clear()
+        return [parse_date(getattr(raw, "published", None) or raw.get("updated"), None, name)
+                for name, raw in corpus]
+
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = fn()
+            times.append(time.perf_counter() - t0)
+        return min(times), out
+
+    t_legacy, kept_legacy = best(legacy)
+    t_all, all_items = best(fast_all)
+    t_window, kept_fast = best(fast_window)
+    t_strings, parsed = best(strings_only)
+
+    # 같은 시각으로 해석했는지 확인 (updated만 있는 항목은 기존 방식에서 날짜가 없었음)
+    legacy_items = [_legacy_normalize(raw, name) for name, raw in corpus]
+    mismatch = sum(1 for a, b in zip(legacy_items, all_items)
+                   if a["published_dt"] is not None and a["published_dt"] != b.published_dt)
+    mismatch += sum(1 for a, b in zip(legacy_items, parsed)
+                    if a["published_dt"] is not None and a["published_dt"] != b)
+
+    n = len(corpus)
+    print(f"[INFO] legacy (dateutil + filter):   {t_legacy * 1e6 / n:7.1f} us/entry, kept {len(kept_legacy)}")
+    print(f"[INFO] fast path (all entries):      {t_all * 1e6 / n:7.1f} us/entry")
+    print(f"[INFO] fast path + early reject:     {t_window * 1e6 / n:7.1f} us/entry, kept {len(kept_fast)}")
+    print(f"[INFO] string parsers only (memo):   {t_strings * 1e6 / n:7.1f} us/entry")
+    print(f"[INFO] Speedup: {t_legacy / t_window:.1f}x, date mismatches vs dateutil: {mismatch}")
+    return t_legacy, t_window, mismatch
+
+
+if __name__ == "__main__":
+    benchmark_normalize()